@@ -17,7 +17,7 @@
 
 #============= enthought library imports  ==========================
 from traits.api import HasTraits, Instance, \
-    Float, Str, List, Property
+    Float, Str, List, Property, Bool
 from traitsui.api import View, Item
 #============= standard library imports  ==========================
 import numpy as np
@@ -33,6 +33,11 @@ from pyface.file_dialog import FileDialog
 from pyface.constant import OK
 
 from pychron.viewable import Viewable
+from pychron.managers.data_managers.wide_frame import column_name
+from pychron.core.helpers.csv_loader import load_csv_array
+from pychron.bakeout.bakeout_repack import read_bakeout_csv_header
+from pychron.core.time_series.lod import LODPyramid, load_pyramids, \
+    save_pyramids
 from collections import namedtuple
 
 # DISPLAYSIZE = GetDisplaySize()
@@ -77,6 +82,13 @@ class BakeoutGraphViewer(Viewable):
 
     path = Str
 
+    # memory map large csv files from a .npy sidecar
+    use_csv_cache = Bool(True)
+
+    # [((plotid, series, x, y), LODPyramid),]
+    _lods = List
+    _lod_updating = False
+
 #    export_button = Button('Export CSV')
 
 #    def _export_button_fired(self):
@@ -158,6 +170,12 @@ class BakeoutGraphViewer(Viewable):
         datagrps = []
         attrs = []
         ib = [0, 0, 0]
+
+        cols = None
+        if dm.is_wide():
+            # one read per channel
+            cols = dm.read_wide()
+
         for ci in controllers:
 
             attrs_i = dict(name=ci._v_name)
@@ -167,52 +185,51 @@ class BakeoutGraphViewer(Viewable):
                 attrs_i[ai] = getattr(ci._v_attrs, ai)
             attrs.append(attrs_i)
             data = []
+            if cols is not None:
+                for i, ti in enumerate(['temp', 'heat', 'pressure']):
+                    ys = cols.get(column_name(ci._v_name, ti))
+                    if ys is None:
+                        continue
+                    if i == 0:
+                        data.append(cols['time'])
+                    data.append(ys)
+                    ib[i] = 1
+
+                if data:
+                    datagrps.append(data)
+                continue
+
             for i, ti in enumerate(['temp', 'heat']):
-                try:
-                    table = getattr(ci, ti)
-                except Exception, _:
+                r = dm.read_columns(ci, ti)
+                if r is None:
                     continue
-                xs = [x['time'] for x in table]
-#                    print 'xs', xs
-                ys = [x['value'] for x in table]
+
                 if i == 0:
-                    data.append(xs)
-                data.append(ys)
+                    data.append(r['time'])
+                data.append(r['value'])
                 ib[i] = 1
-#                    print 'bakeout_manager._bakeout_h5_parser', e
 
             if data:
                 datagrps.append(data)
 
         names = [ci._v_name for ci in controllers]
         nseries = len(controllers) * sum(ib)
+        # everything has been read into memory
+        dm.close_file()
         return names, nseries, ib, np.array(datagrps), path, attrs
 
     def _bakeout_csv_parser(self, path):
         attrs = None
-        with open(path, 'r') as f:
-#            reader = csv.reader(open(path, 'r'))
-            reader = csv.reader(f)
-
-            # first line is the include bits
-            l = reader.next()
-            l[0] = (l[0])[1:]
-#
-            ib = map(int, l)
-
-            # second line is a header
-            header = reader.next()
-            header[0] = (header[0])[1:]
-            nseries = len(header) / (sum(ib) + 1)
-            names = [(header[(1 + sum(ib)) * i])[:-5] for i in range(nseries)]
+        names, ib, nseries = read_bakeout_csv_header(path)
 
 #            average load time for 2MB file =0.42 s (n=10)
 #            data = np.loadtxt(f, delimiter=',')
 
 #            average load time for 2MB file = 0.19 s (n=10)
-            data = np.array([r for r in reader], dtype=float)
+#            data = np.array([r for r in reader], dtype=float)
 
-            data = np.array_split(data, nseries, axis=1)
+        data = load_csv_array(path, skiprows=2, cache=self.use_csv_cache)
+        data = np.array_split(data, nseries, axis=1)
         return (names, nseries, ib, data, path, attrs)
 
     def load(self, path):
@@ -333,56 +350,77 @@ class BakeoutGraphViewer(Viewable):
                     graph.set_series_label(name, series=i,
                                            plotid=plotids[j])
 
-        ma0 = -1
-        mi0 = 1e8
-        ma1 = -1
-        mi1 = 1e8
-        ma2 = -1
-        mi2 = 1e8
-#        print data
+        # (plotid, series, x, y) for every trace
+        traces = []
         for (i, da) in enumerate(data):
 
             if transpose_data:
                 da = np.transpose(da)
 
             x = da[0]
-            if include_bits[0]:
-                y = da[1]
-                ma0 = max(ma0, max(y))
-                mi0 = min(mi0, min(y))
-                graph.set_data(x, series=i, axis=0, plotid=plotids[0])
-                graph.set_data(da[1], series=i, axis=1,
-                               plotid=plotids[0])
-                graph.set_y_limits(mi0, ma0, pad='0.1',
-                                   plotid=plotids[0])
-
-            if include_bits[1]:
-                y = da[2]
-                ma1 = max(ma1, max(y))
-                mi1 = min(mi1, min(y))
-                graph.set_data(x, series=i, axis=0, plotid=plotids[1])
-                graph.set_data(y, series=i, axis=1, plotid=plotids[1])
-                graph.set_y_limits(mi1, ma1, pad='0.1',
-                                   plotid=plotids[1])
-
-            if include_bits[2]:
-                y = da[3]
-                ma2 = max(ma2, max(y))
-                mi2 = min(mi2, min(y))
-                graph.set_data(x, series=i, axis=0, plotid=plotids[2])
-                graph.set_data(y, series=i, axis=1, plotid=plotids[2])
-                graph.set_y_limits(mi2, ma2, pad='0.1',
-                                   plotid=plotids[2])
-
-                # prevent multiple pressure plots
-
-                include_bits[2] = False
-
-        graph.set_x_limits(min(x), max(x))
+            for j in range(3):
+                if include_bits[j]:
+                    traces.append((plotids[j], i, x, da[j + 1]))
+
+            # prevent multiple pressure plots
+            include_bits[2] = False
+
+        self._lods = self._load_lods(path, traces)
+
+        limits = dict()
+        for (pid, i, _, _), lod in self._lods:
+            ma, mi = limits.get(pid, (-1, 1e8))
+            limits[pid] = (max(ma, lod.ymax), min(mi, lod.ymin))
+
+        for pid, (ma, mi) in limits.iteritems():
+            graph.set_y_limits(mi, ma, pad='0.1', plotid=pid)
+
+        xs = [lod.x for _, lod in self._lods if len(lod.x)]
+        if xs:
+            x0 = min([xi[0] for xi in xs])
+            x1 = max([xi[-1] for xi in xs])
+            graph.set_x_limits(x0, x1)
+            self._update_lods(graph, x0, x1)
+
+        for p in graph.plots:
+            p.index_range.on_trait_change(self._index_range_changed, 'updated')
+
 #        (name, _ext) = os.path.splitext(name)
 #        graph.set_title(name)
         return graph
 
+    def _load_lods(self, path, traces):
+        '''
+            return a list of (trace, LODPyramid).
+            use the sidecar if it is current else build and save it
+        '''
+        series = [(x, y) for _, _, x, y in traces]
+        lods = load_pyramids(path, series)
+        if lods is None:
+            lods = [LODPyramid(x, y) for x, y in series]
+            save_pyramids(path, lods)
+        return zip(traces, lods)
+
+    def _index_range_changed(self, obj, name, old, new):
+        if self._lod_updating:
+            return
+        self._update_lods(self.graph, obj.low, obj.high)
+
+    def _update_lods(self, graph, x0, x1):
+        '''
+            show the level of each trace that matches the x range and
+            the plot width. about two points per pixel
+        '''
+        self._lod_updating = True
+        try:
+            for (pid, i, _, _), lod in self._lods:
+                npoints = 2 * max(200, int(graph.plots[pid].width))
+                x, y = lod.select(x0, x1, npoints)
+                graph.set_data(x, series=i, axis=0, plotid=pid)
+                graph.set_data(y, series=i, axis=1, plotid=pid)
+        finally:
+            self._lod_updating = False
+
 #    def new_controller(self, name):
 #        bc = BakeoutParameters(name=name)
 #        self.bakeouts.append(bc)
@@ -20,14 +20,14 @@ from traits.api import Instance, Bool, Button, Event, \
     Float, Str, Property, List, on_trait_change, Dict, Any, cached_property
 
 #============= standard library imports  ==========================
-from numpy import hstack
+from numpy import hstack, nan
 import os
 import time
 from ConfigParser import NoSectionError
 #============= local library imports  ==========================
 from pychron.managers.manager import Manager
 from pychron.hardware.bakeout_controller import BakeoutController
-from pychron.hardware.core.communicators.scheduler import CommunicationScheduler
+from pychron.hardware.core.communicators.scheduler import ModbusBusScheduler
 from pychron.paths import paths
 from pychron.graph.time_series_graph import TimeSeriesStackedGraph, \
     TimeSeriesStreamStackedGraph
@@ -38,18 +38,30 @@ from pychron.graph.graph import Graph
 from pychron.hardware.core.core_device import CoreDevice
 from pychron.hardware.gauges.granville_phillips.micro_ion_controller import MicroIonController
 from pychron.managers.data_managers.data_manager import DataManager
+from pychron.managers.data_managers.wide_frame import column_name, SAMPLES_TABLE
+from pychron.bakeout.bakeout_repack import repack_bakeout, remove_frame, \
+    REPACK_EXTS
 from pychron.core.helpers.archiver import Archiver
+from pychron.bakeout.bakeout_summary import summarize_bakeout, summarize_csv, \
+    summarize_h5
+from pychron.managers.data_managers.journal import Journal, JOURNAL_EXT, \
+    find_journals, read_journal, replay_journal
 from pychron.database.adapters.bakeout_adapter import BakeoutAdapter
 from pychron.database.data_warehouse import DataWarehouse
 import datetime
 from pychron.bakeout.classifier import Classifier
 from pychron.utils import get_display_size
-from Queue import Queue
 from pychron.core.ui.gui import invoke_in_main_thread
+from pychron.core.helpers.sampling_clock import SamplingClock, monotonic
+from pychron.core.helpers.ring_buffer import RingBufferGroup
 
 BATCH_SET_BAUDRATE = False
 BAUDRATE = '38400'
 
+# sample buffer columns
+TIME, TEMP, HEAT, PRESSURE, LATENCY = range(5)
+SAMPLE_COLUMNS = 5
+
 
 class BakeoutManager(Manager):
 
@@ -111,13 +123,25 @@ class BakeoutManager(Manager):
     database = Any
     _suppress_commit = False
 
-    force_program = True
+    force_program = False
+    # h5 layout. 'tables' a temp/heat table per controller,
+    # 'wide' one table with a shared time column. see wide_frame
+    h5_layout = 'tables'
+    # repack frames older than this many days. 0 disables
+    repack_days = 90
+    # journal h5 rows so a crash does not lose the run
+    use_journal = True
+    _journal = None
+    _bus_scheduler = None
+    _sampling_clock = None
+    _sample_buffers = None
 
     def find_bakeout(self):
         db = self.database
         if db.connect():
 #            db.selector.load_last()
-            db.selector.load_recent()
+            # page through the whole history instead of this month
+            db.selector.load_paged()
             self.open_view(db.selector)
 
     def open_latest_bake(self):
@@ -142,19 +166,35 @@ class BakeoutManager(Manager):
                                                            style='h5')
 
         self._current_data_path = cp = self.data_manager.get_current_path()
+        self._open_journal(controllers, cp)
 #        self._add_bakeout_to_db(controllers, cp)
     def destroy(self):
+        if self._sampling_clock is not None:
+            self._sampling_clock.stop()
+
         cs = self._get_controllers()
         for c in cs:
             c.stop_timer()
-        
+
+        if self._bus_scheduler is not None:
+            self._bus_scheduler.stop()
+
+        # write any buffered rows
+        dm = self.data_manager
+        if dm is not None:
+            dm.flush()
+
     def activate(self):
-        self.data_queue = Queue()
         from threading import Thread
         t = Thread(target=self._graph_thread)
         t.setDaemon(True)
         t.start()
 
+        # recover crashed runs then archive and repack old frames
+        t = Thread(target=self._maintenance, name='bakeout_maintenance')
+        t.setDaemon(True)
+        t.start()
+
         self.reset_general_scan()
 
     def reset_general_scan(self):
@@ -170,12 +210,26 @@ class BakeoutManager(Manager):
         for c in cs:
             c.stop_timer()
 
-        # delay to allow threads to exit
-        time.sleep(0.5)
-
-        for i, c in enumerate(cs):
-        # reset the general timers
-            c.start_timer()
+        '''
+            one clock polls every controller per tick so the samples
+            from each zone share the same scheduled time
+        '''
+        clock = self._sampling_clock
+        if clock is not None:
+            clock.stop()
+
+        # keep twice the scan window
+        capacity = max(1024, int(2 * self.scan_window * 60 / self.update_interval))
+        self._sample_buffers = RingBufferGroup(self._get_controller_names(),
+                                               capacity, SAMPLE_COLUMNS)
+
+        if clock is None:
+            clock = SamplingClock(self.update_interval, self._sample_controllers,
+                                  name='bakeout_sampling_clock')
+            self._sampling_clock = clock
+        else:
+            clock.period = self.update_interval
+        clock.start()
 
     def load(self, *args, **kw):
         app = self.application
@@ -215,37 +269,28 @@ class BakeoutManager(Manager):
     def _load_controllers(self):
         '''
         '''
-        scheduler = CommunicationScheduler()
-        program = False
-        cnt = 0
+        scheduler = ModbusBusScheduler(name='bakeout_bus')
+        self._bus_scheduler = scheduler
         for bc in self._get_controllers():
 #            bc.on_trait_change(self.update_active, 'active')
             # set the communicators scheduler
             # used to synchronize access to port
             if bc.load():
+                comm = bc._communicator
+                if comm is not None and comm.baudrate:
+                    scheduler.baudrate = comm.baudrate
                 bc.set_scheduler(scheduler)
 
                 if bc.open():
                     '''
-                        on first controller check to see if
-                        memory block programming is required
-
-                        if it is apply to all subsequent controllers
+                        each controller verifies its assembly definition
+                        addresses and only reprograms them if they differ.
+                        force_program always rewrites them
                     '''
-                    if not self.force_program:
-                        if cnt == 0:
-                            if not bc.is_programmed():
-                                program = True
-                            m1 = 'Watlow controllers require programming. Programming automatically'
-                            m2 = 'Watlow controllers are properly programmed'
-                            self.info(m1 if program else m2)
-                    else:
-                        program = True
-
-                    bc.program_memory_blocks = program
+                    bc.program_memory_blocks = True
+                    bc.force_program_memory_blocks = self.force_program
 
                     bc.initialize()
-                    cnt += 1
 
         return True
 
@@ -290,11 +335,122 @@ class BakeoutManager(Manager):
                                                            )
                 getattr(self, section).trait_set(**kw)
 
+    def _maintenance(self):
+        self._recover_journals()
+        self._backfill_summaries()
+        self._clean_archive()
+
+    #===============================================================================
+    # journal
+    #===============================================================================
+    def _get_journal_dir(self):
+        return os.path.join(paths.bakeout_db_root, '.journals')
+
+    def _open_journal(self, controllers, frame):
+        self._close_journal(remove=False)
+        if not self.use_journal or not frame:
+            return
+
+        root = self._get_journal_dir()
+        if not os.path.isdir(root):
+            os.makedirs(root)
+
+        name = os.path.splitext(os.path.basename(frame))[0]
+        attrs = dict((ci.name, self._controller_attrs(ci)) for ci in controllers)
+        self._journal = Journal(os.path.join(root, name + JOURNAL_EXT), frame,
+                                [ci.name for ci in controllers],
+                                layout=self.h5_layout, attrs=attrs,
+                                pressure=self.include_pressure)
+
+        # the journal makes the rows durable. flush the frame less often
+        self.data_manager.max_unflushed_time = 300
+
+    def _close_journal(self, remove=True):
+        '''
+            remove the journal once its frame has been closed
+        '''
+        journal, self._journal = self._journal, None
+        if journal is not None:
+            journal.close(remove=remove)
+
+    def _recover_journals(self):
+        current = self._journal.path if self._journal is not None else None
+        for p in find_journals(self._get_journal_dir()):
+            if p == current:
+                continue
+
+            try:
+                header, records = read_journal(p)
+                frame = header['frame']
+                self.info('recovering {} from journal'.format(frame))
+                n = replay_journal(p)
+                self.info('added {} rows to {}'.format(n, frame))
+                self._add_recovered_to_db(frame, header, records)
+            except Exception, e:
+                self.warning('failed replaying journal {}. {}'.format(p, e))
+                continue
+
+            os.remove(p)
+
+    def _add_recovered_to_db(self, frame, header, records):
+        '''
+            the run crashed before it was saved. add it so it can be opened
+            from the database
+        '''
+        db = self.database
+        if db is None or not db.connect() or db.has_path(frame):
+            return
+
+        attrs = header.get('attrs', dict())
+        with db.session_ctx():
+            b = db.add_bakeout()
+            ts = records['time'][0] if len(records) else os.path.getmtime(frame)
+            b.timestamp = datetime.datetime.fromtimestamp(ts)
+            db.add_path(b, frame)
+            for name in header['keys']:
+                a = attrs.get(name, dict())
+                db.add_controller(b, name=name, script=a.get('script'),
+                                  setpoint=a.get('setpoint'),
+                                  duration=a.get('duration'))
+
     def _clean_archive(self):
-        root = os.path.join(paths.data_dir, 'bakeouts')
-        self.info('cleaning bakeout data directory {}'.format(root))
-        a = Archiver(root=root, archive_days=14, archive_months=8)
-        a.clean(spawn_process=False)
+        for root in (os.path.join(paths.data_dir, 'bakeouts'),
+                     paths.bakeout_db_root):
+            if not root or not os.path.isdir(root):
+                continue
+
+            self.info('cleaning bakeout data directory {}'.format(root))
+            a = Archiver(root=root, archive_days=14, archive_months=8,
+                         repack_days=self.repack_days,
+                         repack_func=self._repack_frame,
+                         repack_exts=list(REPACK_EXTS))
+            a.clean(spawn_process=False)
+
+    def _repack_frame(self, src):
+        '''
+            repack src into a compressed wide frame and point the database
+            record at it. src is removed only once the record is updated
+        '''
+        dst = repack_bakeout(src)
+        if not dst:
+            return
+
+        db = self.database
+        if db is None or not db.connect():
+            self.warning('no bakeout database. not repacking {}'.format(src))
+            remove_frame(dst)
+            return
+
+        try:
+            n = db.move_path(src, dst)
+        except Exception, e:
+            self.warning('failed updating database path for {}. {}'.format(src, e))
+            remove_frame(dst)
+            return
+
+        self.debug('repacked {} -> {}. {} record(s) updated'.format(src, dst, n))
+        remove_frame(src)
+        return dst
 #===============================================================================
 # graph
 #===============================================================================
@@ -306,104 +462,118 @@ class BakeoutManager(Manager):
         if self.include_heat:
             self.graph.new_series(plotid=self.plotids[1])
 
-    def _do_graph(self, data):
-#         self.debug('do graph {}'.format(len(data)))
+    def _do_graph(self, buffers, start, stop):
+        '''
+            graph and record the committed rows [start, stop) of buffers
+        '''
         g = self.graph
         temp_id = self.plotids[0]
         heat_id = self.plotids[1]
         include_temp = self.include_temp
         include_heat = self.include_heat
 
-        buf_x = []
-#         for ci, (_name, i, pi, hi) in enumerate(self.data_buffer):
-        n = len(data)
-        kwargs = dict(track_y=False, pad=0.05)
-        for ci, (_name, i, pi, hi) in enumerate(data):
-            track_x = ci == n - 1
-            kwargs['track_x'] = track_x
-            kwargs['series'] = i
-            if include_temp:
-                kwargs['plotid'] = temp_id
-                nx = g.record(pi, **kwargs)
-
-            if include_heat:
-                kwargs['plotid'] = heat_id
-                kwargs['x'] = nx
-                kwargs['track_x'] = False if include_temp else track_x
-                g.record(hi, **kwargs)
-
-            buf_x.append(nx)
+        # zero copy views of each controller's new rows
+        views = [(name, self.graph_info[name]['id'], buffers.get(name, start, stop))
+                 for name in self._get_controller_names()
+                    if name in self.graph_info]
+        if not views:
+            return
 
-        try:
-            g.update_y_limits(plotid=temp_id)
-        except IndexError:
-            pass
+        for ri in xrange(len(views[0][2])):
+            values = []
+            for (_name, i, v) in views:
+                row = v[ri]
+                if include_temp:
+                    values.append((temp_id, i, row[TEMP]))
+                if include_heat:
+                    values.append((heat_id, i, row[HEAT]))
 
-        try:
-            g.update_y_limits(plotid=heat_id)
-        except IndexError:
-            pass
+            # all controllers share the scheduled time of the tick
+            nx = row[TIME]
+            g.record_row(nx, values, pad=0.05)
 
-        if self.include_pressure:
-            self._get_pressure(nx)
+            if self.include_pressure:
+                self._get_pressure(nx, row[PRESSURE])
 
         if self.active:
-            self._write_data(data, buf_x)
+            self._write_data(views)
 
-#         self.data_buffer = []
-#         self.data_buffer_x = []
-#         self.data_count_flag = 0
 #===============================================================================
 # datamanager
 #===============================================================================
-    def _write_data(self, buf, buf_x):
+    def _write_data(self, views):
+        '''
+            views: list of (name, graph id, rows)
+        '''
         if isinstance(self.data_manager, CSVDataManager):
-            self._write_csv_data(buf, buf_x)
+            self._write_csv_data(views)
         else:
-            self._write_h5_data(buf, buf_x)
+            self._write_h5_data(views)
 
-    def _write_h5_data(self, buf, buf_x):
+    def _write_h5_data(self, views):
+        '''
+            rows are buffered by the data manager's table recorders and
+            written in chunks
+        '''
         dm = self.data_manager
-        for ((name, _, pi, hp), xi) in zip(buf, buf_x):
-
-            for (ti, di) in [('temp', pi), ('heat', hp)]:
-                table = dm.get_table(ti, name)
-                if table is not None:
-                    row = table.row
-                    row['time'] = xi
-                    row['value'] = di
-                    row.append()
-                    table.flush()
-
-    def _write_csv_data(self, buf, buf_x):
-        ns = sum(map(int, [self.include_heat,
-                           self.include_pressure, self.include_temp])) + 1
-        container = [0, ] * ns * self._nactivated_controllers
+        journal = self._journal
+        if journal is not None:
+            for name, _, v in views:
+                journal.extend(name, v[:, [TIME, TEMP, HEAT, PRESSURE, LATENCY]])
+            journal.sync()
+
+        if dm.is_wide():
+            channels = [('temp', TEMP), ('heat', HEAT), ('latency', LATENCY)]
+            if self.include_pressure:
+                channels.append(('pressure', PRESSURE))
+
+            # every controller shares the tick time
+            cols = dict(time=views[0][2][:, TIME])
+            for name, _, v in views:
+                for (ti, ci) in channels:
+                    cols[column_name(name, ti)] = v[:, ci]
+            dm.record_rows(SAMPLES_TABLE, '/', **cols)
+            return
 
-        for (sub, x) in zip(buf, buf_x):
-            s = 1
-            (_, pid, pi, hp) = sub
+        for name, _, v in views:
+            for (ti, ci) in [('temp', TEMP), ('heat', HEAT)]:
+                dm.record_rows(ti, name, time=v[:, TIME], value=v[:, ci],
+                               latency=v[:, LATENCY])
+            if self.include_pressure:
+                dm.record_rows('pressure', name, time=v[:, TIME],
+                               value=v[:, PRESSURE])
 
-            ind = pid * ns
-            container[ind] = x
+    def _write_csv_data(self, views):
+        ns = sum(map(int, [self.include_heat,
+                           self.include_pressure, self.include_temp])) + 1
+        nc = max(self._nactivated_controllers, len(views))
+
+        for ri in xrange(len(views[0][2])):
+            container = [0, ] * ns * nc
+            for (_, pid, v) in views:
+                row = v[ri]
+                s = 1
+                x = row[TIME]
+                ind = pid * ns
+                container[ind] = x
 
-            if self.include_temp:
-                container[ind + s] = pi
-                s += 1
+                if self.include_temp:
+                    container[ind + s] = row[TEMP]
+                    s += 1
 
-            if self.include_heat:
-                container[ind + s] = hp
-                s += 1
+                if self.include_heat:
+                    container[ind + s] = row[HEAT]
+                    s += 1
 
-            if self.include_pressure:
-                container[ind + s] = self._pressure
+                if self.include_pressure:
+                    container[ind + s] = row[PRESSURE]
 
-        for i in range(self._nactivated_controllers):
-            ind = i * ns
-            if container[ind] < 0.001:
-                container[ind] = x
+            for i in range(nc):
+                ind = i * ns
+                if container[ind] < 0.001:
+                    container[ind] = x
 
-        self.data_manager.write_to_frame(container)
+            self.data_manager.write_to_frame(container)
 
 #===============================================================================
 # classifier
@@ -434,12 +604,22 @@ class BakeoutManager(Manager):
 
         # use only the first 10 minutes of data
         npts = 10 * 60 / float(self.update_interval)
+        if dm.is_wide():
+            cols = dm.read_wide(stop=int(npts))
+            for ci in controllers:
+                name = ci._v_name
+                gxs.append(cols['time'])
+                gys.append(cols[column_name(name, 'temp')])
+                gps.append(cols[column_name(name, 'heat')])
+            return gxs, gys, gps
+
+        npts = int(npts)
         for ci in controllers:
-            temptable = ci.temp[:npts]
-            heattable = ci.heat[:npts]
-            gxs.append([x['time'] for x in temptable])
-            gys.append([x['value'] for x in temptable])
-            gps.append([x['value'] for x in heattable])
+            temp = dm.read_columns(ci, 'temp', stop=npts)
+            heat = dm.read_columns(ci, 'heat', fields=('value',), stop=npts)
+            gxs.append(temp['time'])
+            gys.append(temp['value'])
+            gps.append(heat['value'])
         return gxs, gys, gps
 #===============================================================================
 # database
@@ -460,6 +640,7 @@ class BakeoutManager(Manager):
                 
         if self.data_manager is not None:
             self.data_manager.close_file()
+        self._close_journal()
     
 #    def _db_rollback(self):
 #        self.info('rolling back')
@@ -480,9 +661,74 @@ class BakeoutManager(Manager):
             db.add_path(b, path)
     
             # add to ControllerTable
-            for c in controllers:
-                db.add_controller(b, name=c.name, script=c.script,
-                                  setpoint=c.setpoint, duration=c.duration)
+            dbcs = [db.add_controller(b, name=c.name, script=c.script,
+                                      setpoint=c.setpoint, duration=c.duration)
+                    for c in controllers]
+
+            self._add_summaries_to_db(b, dbcs, self._summarize_current())
+
+    def _summarize_current(self):
+        '''
+            summarize the run being saved. the frame is still open
+        '''
+        dm = self.data_manager
+        if dm is None:
+            return dict()
+
+        setpoints = dict((c.name, c.setpoint) for c in self._get_controllers())
+        try:
+            dm.flush()
+            if isinstance(dm, CSVDataManager):
+                return summarize_csv(dm.get_current_path(), setpoints)
+            else:
+                return summarize_h5(dm, setpoints)
+        except Exception, e:
+            self.warning('failed summarizing bakeout. {}'.format(e))
+            return dict()
+
+    def _add_summaries_to_db(self, b, dbcontrollers, summaries):
+        '''
+            controllers without data get an empty summary so the
+            backfill does not try them again
+        '''
+        db = self.database
+        for c in dbcontrollers:
+            if c.summary is None:
+                db.add_controller_summary(b, c, **summaries.get(c.name, dict(nsamples=0)))
+
+    def _backfill_summaries(self):
+        '''
+            summarize bakeouts saved before summaries were recorded
+        '''
+        db = self.database
+        if db is None or not db.connect():
+            return
+
+        n = 0
+        # page down by id so a bakeout whose summaries fail to commit is
+        # not fetched again
+        before = None
+        while 1:
+            with db.session_ctx():
+                bs = db.get_unsummarized_bakeouts(before=before)
+                if not bs:
+                    break
+
+                before = min(b.id for b in bs)
+                for b in bs:
+                    summaries = dict()
+                    p = b.path and os.path.join(b.path.root, b.path.filename)
+                    if p and os.path.isfile(p):
+                        setpoints = dict((c.name, c.setpoint) for c in b.controllers)
+                        try:
+                            summaries = summarize_bakeout(p, setpoints)
+                        except Exception, e:
+                            self.warning('failed summarizing {}. {}'.format(p, e))
+
+                    self._add_summaries_to_db(b, b.controllers, summaries)
+                    n += 1
+        if n:
+            self.info('summarized {} bakeouts'.format(n))
 #===============================================================================
 # handlers
 #===============================================================================
@@ -511,6 +757,9 @@ class BakeoutManager(Manager):
                 ci._timer.set_interval(v)
             ci.update_interval = v
 
+        if self._sampling_clock is not None:
+            self._sampling_clock.set_period(v)
+
         self.graph.set_scan_delay(v)
 
         dl = self.scan_window * 60 / v
@@ -557,6 +806,7 @@ class BakeoutManager(Manager):
 
             if self.data_manager is not None:
                 self.data_manager.close_file()
+            self._close_journal()
 
     @on_trait_change('include_+')
     def _toggle_graphs(self):
@@ -564,26 +814,80 @@ class BakeoutManager(Manager):
         self.reset_general_scan()
 
     def _graph_thread(self):
-        dq = self.data_queue
-        n = len(self._get_controller_names())
+        '''
+            wakes when the sampling clock commits a complete row for every
+            controller and hands the new row range to the gui
+        '''
+        buffers = None
+        consumed = 0
         while 1:
-            while dq.qsize() < n:
-                time.sleep(0.1)
-
-            data = [dq.get() for _ in range(n)]
-            invoke_in_main_thread(self._do_graph,data)
+            if self._sample_buffers is not buffers:
+                buffers = self._sample_buffers
+                consumed = 0
+                if buffers is None:
+                    time.sleep(0.5)
+                    continue
 
-    @on_trait_change('bakeout+:process_value_flag')
-    def _update_graph_temperature(self, obj, name, old, new,):
-        try:
-            pid = self.graph_info[obj.name]['id']
-        except KeyError:
-            return
+            n = buffers.wait(consumed, timeout=1)
+            if n > consumed:
+                # skip anything that has already been overwritten
+                start = max(consumed, n - buffers.capacity)
+                invoke_in_main_thread(self._do_graph, buffers, start, n)
+                consumed = n
 
-        pv = getattr(obj, 'process_value')
-        hp = getattr(obj, 'heat_power_value')
+    def _sample_controllers(self, tick, scheduled):
+        '''
+            called by the sampling clock. queue a read for every controller
+            before waiting on any so the whole bus is polled in one batch.
 
-        self.data_queue.put((obj.name, pid, pv, hp))
+            one row of (time, temp, heat, pressure, latency) is written to
+            each controller's ring buffer and the rows committed together
+        '''
+        buffers = self._sample_buffers
+        cs = self._get_controllers()
+        st = monotonic()
+        # how late the clock started this tick
+        lag = max(0, time.time() - scheduled)
+        arrived = dict()
+
+        # a failing controller gets a nan row so the other controllers keep
+        # sampling and the buffers stay aligned
+        trs = []
+        for c in cs:
+            try:
+                c.pre_sample()
+                tr = c.queue_temp_and_power()
+                tr.add_done_callback(lambda _, n=c.name: arrived.setdefault(n, monotonic()))
+            except Exception, e:
+                self.warning('{} sample request failed. {}'.format(c.name, e))
+                tr = None
+            trs.append((c, tr))
+
+        pressure = nan
+        if self.include_pressure:
+            try:
+                pressure = self._read_pressure()
+            except Exception, e:
+                self.warning('pressure read failed. {}'.format(e))
+            if pressure is None:
+                pressure = nan
+
+        timeout = self.update_interval + len(cs)
+        for c, tr in trs:
+            temp, heat = nan, nan
+            if tr is not None:
+                try:
+                    tr.result(timeout)
+                    c.post_sample()
+                    temp, heat = c.process_value, c.heat_power_value
+                except Exception, e:
+                    self.warning('{} sample failed. {}'.format(c.name, e))
+
+            # latency from the scheduled time to when this reply arrived
+            latency = lag + arrived.get(c.name, monotonic()) - st
+            buffers.write(c.name, (scheduled, temp, heat, pressure, latency))
+
+        buffers.commit()
 
 #==============================================================================
 # Button handlers
@@ -716,25 +1020,44 @@ class BakeoutManager(Manager):
             # set the header in for the data file
             dm.write_to_frame(header)
         else:
+            # sample times are s since epoch
+            dm.set_run_start()
+
+            # size the chunks for a day of samples
+            expectedrows = int(24 * 3600 / self.update_interval)
+            wide = self.h5_layout == 'wide'
+            if wide:
+                channels = ['temp', 'heat', 'latency']
+                if self.include_pressure:
+                    channels.append('pressure')
+                dm.new_wide_table([ci.name for ci in controllers], channels,
+                                  expectedrows=expectedrows)
+
             for ci in controllers:
                 cgrp = dm.new_group(ci.name)
-                dm.new_table(cgrp, 'temp')
-                dm.new_table(cgrp, 'heat')
-                if self.include_pressure:
-                    dm.new_table(cgrp, 'pressure')
+                if not wide:
+                    for ti in ('temp', 'heat'):
+                        dm.new_table(cgrp, ti, table_style='EpochSample',
+                                     append_heavy=True, expectedrows=expectedrows)
+                    if self.include_pressure:
+                        dm.new_table(cgrp, 'pressure', table_style='Epoch')
+
+                for attr, v in self._controller_attrs(ci).iteritems():
+                    dm.set_group_attribute(cgrp, attr, v)
+        return dm
 
-                for attr in ['script', 'setpoint',
-                             'duration', 'max_output']:
-                    dm.set_group_attribute(cgrp, attr, getattr(ci, attr))
+    def _controller_attrs(self, ci):
+        attrs = dict((attr, getattr(ci, attr)) for attr in
+                     ['script', 'setpoint', 'duration', 'max_output'])
 
-                if ci.script != '---':
-                    p = os.path.join(paths.scripts_dir, 'bakeout', ci.script)
-                    with open(p, 'r') as f:
-                        txt = f.read()
-                else:
-                    txt = ''
-                dm.set_group_attribute(cgrp, 'script_text', txt)
-        return dm
+        if ci.script != '---':
+            p = os.path.join(paths.scripts_dir, 'bakeout', ci.script)
+            with open(p, 'r') as f:
+                txt = f.read()
+        else:
+            txt = ''
+        attrs['script_text'] = txt
+        return attrs
 
     def _graph_factory(
         self,
@@ -850,13 +1173,15 @@ class BakeoutManager(Manager):
 #==============================================================================
 # Pressure
 #==============================================================================
-    def _get_pressure(self, x):
+    def _read_pressure(self):
         if self.gauge_controller:
             pressure = self.gauge_controller.get_ion_pressure()
         else:
             import random
             pressure = random.randint(0, 10)
+        return pressure
 
+    def _get_pressure(self, x, pressure):
         self._pressure = pressure
         self.graph.record(
             pressure,
@@ -0,0 +1,178 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import csv
+from numpy import empty, nan, array_equal
+from tables import openFile
+#============= local library imports  ==========================
+from pychron.core.helpers.csv_loader import load_csv_array, clear_cache
+from pychron.core.time_series.lod import lod_path
+from pychron.managers.data_managers.wide_frame import convert_to_wide, \
+    create_wide_table, column_name, is_wide, get_tables_channels, \
+    MisalignedFrameError
+
+'''
+    repack old bakeout frames into compressed wide row hdf5 files.
+
+    <name>.txt or <name>.h5 -> <name>.arch.h5
+
+    the repacked file is read by BakeoutGraphViewer like any other wide
+    frame
+'''
+
+REPACK_SUFFIX = '.arch.h5'
+REPACK_EXTS = ('.h5', '.hdf5', '.txt', '.csv')
+CHANNELS = ('temp', 'heat', 'pressure')
+
+# controller attributes expected by BakeoutGraphViewer
+DEFAULT_ATTRS = dict(script='', setpoint=0.0, duration=0.0,
+                     max_output=0.0, script_text='')
+
+
+def is_repacked(p):
+    return p.endswith(REPACK_SUFFIX)
+
+
+def repacked_path(p):
+    return os.path.splitext(p)[0] + REPACK_SUFFIX
+
+
+def read_bakeout_csv_header(path):
+    '''
+        return names, include bits and nseries of a bakeout csv file.
+
+        line 1 #include bits (temp, heat, pressure)
+        line 2 #header. time column of each controller is <name>_time
+    '''
+    with open(path, 'r') as f:
+        reader = csv.reader(f)
+
+        l = reader.next()
+        l[0] = (l[0])[1:]
+        ib = map(int, l)
+
+        header = reader.next()
+        header[0] = (header[0])[1:]
+        nseries = len(header) / (sum(ib) + 1)
+        names = [(header[(1 + sum(ib)) * i])[:-5] for i in range(nseries)]
+    return names, ib, nseries
+
+
+def repack_bakeout(src, complevel=9):
+    '''
+        write a repacked copy of src. src is not removed.
+
+        returns the path of the copy or None if src is already compact or
+        holds data the wide layout cannot e.g. controllers with different
+        sample times
+    '''
+    if is_repacked(src):
+        return
+
+    ext = os.path.splitext(src)[1]
+    if ext not in REPACK_EXTS:
+        return
+
+    dst = repacked_path(src)
+    tmp = dst + '.tmp'
+    try:
+        if ext in ('.h5', '.hdf5'):
+            f = openFile(src, 'r')
+            try:
+                if is_wide(f):
+                    return
+                channels, other = get_tables_channels(f)
+            finally:
+                f.close()
+
+            if other:
+                # src would be removed once repacked
+                return
+
+            convert_to_wide(src, tmp, channels=channels,
+                            complevel=complevel)
+        else:
+            _csv_to_wide(src, tmp, complevel)
+
+        os.rename(tmp, dst)
+        return dst
+    except MisalignedFrameError:
+        # src is kept as is
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+    except Exception:
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        raise
+
+
+def remove_frame(p):
+    '''
+        remove p and its cache sidecars
+    '''
+    clear_cache(p)
+    for pi in (p, lod_path(p)):
+        if os.path.isfile(pi):
+            os.remove(pi)
+
+
+def _csv_to_wide(src, dst, complevel):
+    names, ib, nseries = read_bakeout_csv_header(src)
+    channels = [c for c, b in zip(CHANNELS, ib) if b]
+    data = load_csv_array(src, skiprows=2)
+
+    # one block of time + channels per controller
+    w = len(channels) + 1
+    if len(data):
+        if data.shape[1] < len(names) * w:
+            raise MisalignedFrameError('{} has missing columns'.format(src))
+
+        times = data[:, 0]
+        for i, name in enumerate(names):
+            block = data[:, i * w:(i + 1) * w]
+            # rows of a controller that was not running are written as 0
+            if not array_equal(block[:, 0], times) and block.any():
+                raise MisalignedFrameError('{} time column differs from '
+                                           'the first controller'.format(name))
+
+    f = openFile(dst, 'w')
+    try:
+        tab = create_wide_table(f, names, channels,
+                                expectedrows=max(1, len(data)),
+                                complevel=complevel)
+        if len(data):
+            rows = empty(len(data), dtype=tab.dtype)
+            rows['time'] = data[:, 0]
+            for i, name in enumerate(names):
+                empty_block = not data[:, i * w:(i + 1) * w].any()
+                for j, c in enumerate(channels):
+                    col = column_name(name, c)
+                    rows[col] = nan if empty_block else data[:, i * w + j + 1]
+
+            tab.append(rows)
+
+        for name in names:
+            g = f.createGroup(f.root, name)
+            for k, v in DEFAULT_ATTRS.iteritems():
+                setattr(g._v_attrs, k, v)
+        f.flush()
+    finally:
+        f.close()
+
+#============= EOF =============================================
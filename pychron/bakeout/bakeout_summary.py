@@ -0,0 +1,186 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import numpy as np
+#============= local library imports  ==========================
+from pychron.core.helpers.csv_loader import load_csv_array
+from pychron.bakeout.bakeout_repack import read_bakeout_csv_header
+from pychron.managers.data_managers.wide_frame import column_name
+
+'''
+    per controller run statistics stored in ControllerSummaryTable so
+    bakeouts can be queried without opening their data files.
+
+    temperatures in C, times in hours, heat-up rate in C/hour
+'''
+
+# a sample within this many C of the setpoint counts as at setpoint
+SETPOINT_TOLERANCE = 5.0
+
+SUMMARY_FIELDS = ('max_temp', 'mean_temp', 'time_at_setpoint', 'max_power',
+                  'heatup_rate', 'final_pressure', 'nsamples', 'run_duration')
+
+
+def controller_summary(t, temp, heat=None, pressure=None, setpoint=None,
+                       tolerance=SETPOINT_TOLERANCE):
+    '''
+        t: sample times in s. returns a dict of SUMMARY_FIELDS.
+        fields that cannot be computed are None
+    '''
+    t = np.asarray(t, dtype=float)
+    temp = np.asarray(temp, dtype=float)
+    d = dict.fromkeys(SUMMARY_FIELDS)
+
+    ok = np.isfinite(temp) & np.isfinite(t)
+    t, temp = t[ok], temp[ok]
+    n = len(t)
+    d['nsamples'] = n
+    if not n:
+        return d
+
+    d['max_temp'] = float(temp.max())
+    d['mean_temp'] = float(temp.mean())
+    d['run_duration'] = (t[-1] - t[0]) / 3600.
+
+    if heat is not None:
+        heat = np.asarray(heat, dtype=float)
+        heat = heat[np.isfinite(heat)]
+        if len(heat):
+            d['max_power'] = float(heat.max())
+
+    if pressure is not None:
+        pressure = np.asarray(pressure, dtype=float)
+        pressure = pressure[np.isfinite(pressure)]
+        if len(pressure):
+            d['final_pressure'] = float(pressure[-1])
+
+    # time to reach the setpoint, or the max temp if it was never reached
+    target = d['max_temp']
+    if setpoint:
+        dt = np.diff(t)
+        at = np.abs(temp[:-1] - setpoint) <= tolerance
+        d['time_at_setpoint'] = float(dt[at].sum()) / 3600.
+        target = min(target, setpoint - tolerance)
+
+    i = np.argmax(temp >= target)
+    if t[i] > t[0]:
+        d['heatup_rate'] = (temp[i] - temp[0]) / (t[i] - t[0]) * 3600.
+
+    return d
+
+
+def summarize_bakeout(path, setpoints=None):
+    '''
+        return dict of controller name: summary for a bakeout data file.
+
+        setpoints: dict of controller name: setpoint. csv files do not
+        store the setpoint. h5 files fall back to the group attributes
+    '''
+    if setpoints is None:
+        setpoints = dict()
+
+    ext = os.path.splitext(path)[1]
+    if ext in ('.h5', '.hdf5'):
+        from pychron.managers.data_managers.h5_data_manager import H5DataManager
+
+        dm = H5DataManager()
+        dm.open_data(path)
+        try:
+            return summarize_h5(dm, setpoints)
+        finally:
+            dm.close_file()
+    else:
+        return summarize_csv(path, setpoints)
+
+
+def summarize_h5(dm, setpoints=None):
+    '''
+        dm: H5DataManager with an open bakeout frame
+    '''
+    if setpoints is None:
+        setpoints = dict()
+
+    attrs = dict((g._v_name, g._v_attrs) for g in dm.get_groups())
+
+    def get_setpoint(name):
+        sp = setpoints.get(name)
+        if sp is None and name in attrs:
+            sp = getattr(attrs[name], 'setpoint', None)
+        return sp
+
+    summaries = dict()
+    if dm.is_wide():
+        keys, _ = dm.get_wide_keys()
+        cols = dm.read_wide()
+        t = cols['time']
+        for k in keys:
+            temp = cols.get(column_name(k, 'temp'))
+            if temp is None:
+                continue
+            summaries[k] = controller_summary(t, temp,
+                                              cols.get(column_name(k, 'heat')),
+                                              cols.get(column_name(k, 'pressure')),
+                                              get_setpoint(k))
+        return summaries
+
+    for name in attrs:
+        temp = dm.read_columns(name, 'temp')
+        if temp is None:
+            continue
+
+        heat = dm.read_columns(name, 'heat', fields=('value',))
+        pressure = dm.read_columns(name, 'pressure', fields=('value',))
+        summaries[name] = controller_summary(temp['time'], temp['value'],
+                                             heat and heat['value'],
+                                             pressure and pressure['value'],
+                                             get_setpoint(name))
+    return summaries
+
+
+def summarize_csv(path, setpoints=None):
+    if setpoints is None:
+        setpoints = dict()
+
+    names, ib, _ = read_bakeout_csv_header(path)
+    channels = [c for c, b in zip(('temp', 'heat', 'pressure'), ib) if b]
+    if 'temp' not in channels:
+        return dict()
+
+    data = load_csv_array(path, skiprows=2)
+    # one block of time + channels per controller
+    w = len(channels) + 1
+
+    def column(i, c):
+        if c in channels:
+            k = i * w + channels.index(c) + 1
+            if k < data.shape[1]:
+                return data[:, k]
+
+    summaries = dict()
+    for i, name in enumerate(names):
+        if i * w >= data.shape[1]:
+            break
+        summaries[name] = controller_summary(data[:, i * w],
+                                             column(i, 'temp'),
+                                             column(i, 'heat'),
+                                             column(i, 'pressure'),
+                                             setpoints.get(name))
+    return summaries
+
+#============= EOF =============================================
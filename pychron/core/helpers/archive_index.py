@@ -0,0 +1,301 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import time
+import sqlite3
+from threading import Thread, Lock
+#============= local library imports  ==========================
+
+'''
+    on disk index of the files below a root directory.
+
+    the index lives in <root>/.archive_index.sqlite and is kept current by
+    DataWarehouse.build_warehouse and the data managers (frames are added
+    when created and updated when closed). Archiver queries the index
+    instead of listing and stat-ing every file.
+
+    reconcile walks the tree once to pick up files added or removed
+    outside the app. run it in the background with reconcile_async
+'''
+
+INDEX_NAME = '.archive_index.sqlite'
+ARCHIVE_DIR = 'archive'
+
+SCHEMA = ('''CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime REAL,
+                size INTEGER,
+                archived INTEGER DEFAULT 0)''',
+          'CREATE INDEX IF NOT EXISTS files_parent_mtime ON files (parent, mtime)',
+          '''CREATE TABLE IF NOT EXISTS archives (
+                year INTEGER,
+                month INTEGER,
+                PRIMARY KEY (year, month))''',
+          '''CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT)''')
+
+
+class ArchiveIndex(object):
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, INDEX_NAME)
+        self._reconcile_lock = Lock()
+        with self._connect() as conn:
+            for s in SCHEMA:
+                conn.execute(s)
+
+    def relpath(self, p):
+        return os.path.relpath(os.path.abspath(p), self.root)
+
+    #===============================================================================
+    # files
+    #===============================================================================
+    def add(self, p):
+        '''
+            add or update p. p is absolute or relative to root
+        '''
+        rp = self.relpath(os.path.join(self.root, p))
+        ap = os.path.join(self.root, rp)
+        try:
+            st = os.stat(ap)
+            mtime, size = st.st_mtime, st.st_size
+        except OSError:
+            mtime, size = time.time(), 0
+
+        with self._connect() as conn:
+            self._upsert(conn, rp, mtime, size)
+
+    def remove(self, p):
+        rp = self.relpath(os.path.join(self.root, p))
+        with self._connect() as conn:
+            conn.execute('DELETE FROM files WHERE path=?', (rp,))
+
+    def files_older_than(self, t, parent='', archived=False):
+        '''
+            return paths in parent with mtime < t (s since epoch).
+            parent=None or archived=None matches any
+        '''
+        sql = 'SELECT path FROM files WHERE mtime<?'
+        args = [t]
+        if parent is not None:
+            sql += ' AND parent=?'
+            args.append(parent)
+        if archived is not None:
+            sql += ' AND archived=?'
+            args.append(int(archived))
+
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute(sql, args)]
+
+    def move(self, src, dst, archived=True):
+        src = self.relpath(os.path.join(self.root, src))
+        dst = self.relpath(os.path.join(self.root, dst))
+        with self._connect() as conn:
+            conn.execute('UPDATE files SET path=?, parent=?, archived=? '
+                         'WHERE path=?',
+                         (dst, os.path.dirname(dst), int(archived), src))
+
+    #===============================================================================
+    # archives
+    #===============================================================================
+    def add_archive(self, year, month):
+        with self._connect() as conn:
+            conn.execute('INSERT OR IGNORE INTO archives (year, month) '
+                         'VALUES (?,?)', (year, month))
+
+    def get_archives(self):
+        '''
+            return list of (year, month). month is 1-12
+        '''
+        with self._connect() as conn:
+            return list(conn.execute('SELECT year, month FROM archives '
+                                     'ORDER BY year, month'))
+
+    def remove_archive(self, year, month, dirname):
+        '''
+            dirname: path of the month directory relative to root
+        '''
+        with self._connect() as conn:
+            conn.execute('DELETE FROM archives WHERE year=? AND month=?',
+                         (year, month))
+            conn.execute('DELETE FROM files WHERE parent=? OR parent LIKE ?',
+                         (dirname, os.path.join(dirname, '%')))
+
+    #===============================================================================
+    # reconcile
+    #===============================================================================
+    def needs_reconcile(self):
+        return self._get_meta('reconciled') is None
+
+    def reconcile(self, archive_names=None):
+        '''
+            sync the index with the files on disk.
+
+            archive_names: list of month directory names used to
+            recognize archive/<year>/<month>
+        '''
+        if not self._reconcile_lock.acquire(False):
+            return
+
+        try:
+            found = dict()
+            archives = set()
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                rd = os.path.relpath(dirpath, self.root)
+                if rd == '.':
+                    rd = ''
+
+                parts = rd.split(os.sep)
+                if len(parts) == 3 and parts[0] == ARCHIVE_DIR and archive_names:
+                    try:
+                        archives.add((int(parts[1]),
+                                      archive_names.index(parts[2]) + 1))
+                    except ValueError:
+                        pass
+
+                for f in filenames:
+                    if f.startswith('.'):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(dirpath, f))
+                    except OSError:
+                        continue
+                    found[os.path.join(rd, f)] = (st.st_mtime, st.st_size)
+
+            with self._connect() as conn:
+                indexed = dict((r[0], (r[1], r[2])) for r in
+                               conn.execute('SELECT path, mtime, size FROM files'))
+
+                for rp in set(indexed) - set(found):
+                    conn.execute('DELETE FROM files WHERE path=?', (rp,))
+
+                for rp, v in found.iteritems():
+                    if indexed.get(rp) != v:
+                        self._upsert(conn, rp, *v)
+
+                if archive_names:
+                    conn.execute('DELETE FROM archives')
+                    conn.executemany('INSERT INTO archives (year, month) VALUES (?,?)',
+                                     list(archives))
+
+                self._set_meta(conn, 'reconciled', str(time.time()))
+        finally:
+            self._reconcile_lock.release()
+
+    def reconcile_async(self, archive_names=None):
+        t = Thread(target=self.reconcile, args=(archive_names,),
+                   name='archive_reconcile')
+        t.setDaemon(True)
+        t.start()
+        return t
+
+    #===============================================================================
+    # private
+    #===============================================================================
+    def _connect(self):
+        # a connection per call. the index is shared by threads and processes
+        return _Connection(self.path)
+
+    def _upsert(self, conn, rp, mtime, size):
+        parent = os.path.dirname(rp)
+        archived = int(parent.split(os.sep)[0] == ARCHIVE_DIR)
+        conn.execute('INSERT OR REPLACE INTO files (path, parent, mtime, size, archived) '
+                     'VALUES (?,?,?,?,?)', (rp, parent, mtime, size, archived))
+
+    def _get_meta(self, key):
+        with self._connect() as conn:
+            r = conn.execute('SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+            return r[0] if r else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?,?)',
+                     (key, value))
+
+
+class _Connection(object):
+    '''
+        commit on success, rollback on error, always close
+    '''
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=10)
+
+    def __enter__(self):
+        return self._conn
+
+    def __exit__(self, exc_type, *args):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self._conn.close()
+
+
+_indexes = dict()
+_indexes_lock = Lock()
+
+
+def get_archive_index(root):
+    '''
+        return the index for root. it is created if needed
+    '''
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        try:
+            return _indexes[root]
+        except KeyError:
+            idx = _indexes[root] = ArchiveIndex(root)
+            return idx
+
+
+def find_archive_index(p):
+    '''
+        return the index of the deepest indexed root containing p or None.
+        only roots opened with get_archive_index are considered
+    '''
+    p = os.path.abspath(p)
+    with _indexes_lock:
+        roots = [r for r in _indexes if p.startswith(r + os.sep)]
+        if roots:
+            return _indexes[max(roots, key=len)]
+
+
+def index_file(p):
+    idx = find_archive_index(p)
+    if idx is not None:
+        try:
+            idx.add(p)
+        except sqlite3.Error:
+            pass
+
+
+def unindex_file(p):
+    idx = find_archive_index(p)
+    if idx is not None:
+        try:
+            idx.remove(p)
+        except sqlite3.Error:
+            pass
+
+#============= EOF =============================================
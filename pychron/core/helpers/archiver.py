@@ -22,13 +22,15 @@ from multiprocessing.process import Process
         - move to archive
     2. remove archive directories older than X
 '''
-from traits.api import Range, Bool, Str
+from traits.api import Range, Bool, Str, Any, List
 import os
+import time
 import shutil
 from datetime import datetime, timedelta
 
 
 from pychron.loggable import Loggable
+from pychron.core.helpers.archive_index import get_archive_index
 
 MONTH_NAMES = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', \
                'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
@@ -41,6 +43,15 @@ class Archiver(Loggable):
     archive_months = Range(0, 12, 1)
     clean_archives = Bool(True)
     root = Str
+    # query an ArchiveIndex instead of listing root
+    use_index = Bool(True)
+
+    # repack files older than repack_days anywhere below root.
+    # repack_func(path) returns the path of the repacked file or None
+    # and is responsible for removing the original. 0 disables
+    repack_days = Range(0, 3650, 0)
+    repack_func = Any
+    repack_exts = List
 
 #     logger = None
 # #     use_logger_display = False
@@ -60,16 +71,21 @@ class Archiver(Loggable):
 
     def clean(self, spawn_process=True):
         if spawn_process:
-            p = Process(target=self._clean)
+            # already in the background. reconcile in the process
+            p = Process(target=self._clean, args=(False,))
             p.start()
         else:
             self._clean()
 
-    def _clean(self):
+    def _clean(self, reconcile_async=True):
         root = self.root
         if not root:
             return
 
+        if self.use_index and os.path.isdir(root):
+            self._clean_indexed(root, reconcile_async)
+            return
+
         archive_date = datetime.today() - timedelta(
                                                     days=self.archive_days,
                                                     hours=self.archive_hours
@@ -94,6 +110,113 @@ class Archiver(Loggable):
             self._clean_archive(root)
         self.info('Archive cleaning complete')
 
+    def _clean_indexed(self, root, reconcile_async):
+        index = get_archive_index(root)
+        if index.needs_reconcile():
+            self.info('building archive index for {}'.format(root))
+            index.reconcile(MONTH_NAMES)
+
+        archive_date = datetime.today() - timedelta(days=self.archive_days,
+                                                    hours=self.archive_hours)
+        self.info('Files older than {} will be archived'.format(archive_date))
+
+        ts = time.mktime(archive_date.timetuple())
+        cnt = 0
+        for p in index.files_older_than(ts):
+            rp = os.path.join(root, p)
+            # the index may be stale. check the candidate before moving it
+            try:
+                mt = os.stat(rp).st_mtime
+            except OSError:
+                index.remove(p)
+                continue
+
+            if mt >= ts:
+                index.add(p)
+                continue
+
+            dst = self._archive(root, p)
+            if dst:
+                index.move(p, dst)
+                cnt += 1
+
+        if cnt > 0:
+            self.info('Archived {} files'.format(cnt))
+
+        if self.repack_func is not None and self.repack_days:
+            self._repack_indexed(root, index)
+
+        if self.clean_archives:
+            self._clean_indexed_archive(root, index)
+
+        # pick up files added or removed outside the app
+        if reconcile_async:
+            index.reconcile_async(MONTH_NAMES)
+        else:
+            index.reconcile(MONTH_NAMES)
+
+        self.info('Archive cleaning complete')
+
+    def _repack_indexed(self, root, index):
+        repack_date = datetime.today() - timedelta(days=self.repack_days)
+        self.info('Files older than {} will be repacked'.format(repack_date))
+
+        ts = time.mktime(repack_date.timetuple())
+        exts = self.repack_exts
+        cnt = 0
+        for p in index.files_older_than(ts, parent=None, archived=None):
+            if exts and os.path.splitext(p)[1] not in exts:
+                continue
+
+            src = os.path.join(root, p)
+            try:
+                mt = os.stat(src).st_mtime
+            except OSError:
+                index.remove(p)
+                continue
+
+            if mt >= ts:
+                # still being written
+                index.add(p)
+                continue
+
+            try:
+                dst = self.repack_func(src)
+            except Exception, e:
+                self.warning('Repacking {} failed. {}'.format(p, e))
+                continue
+
+            if dst:
+                index.remove(p)
+                index.add(dst)
+                cnt += 1
+
+        if cnt > 0:
+            self.info('Repacked {} files'.format(cnt))
+
+    def _clean_indexed_archive(self, root, index):
+        self.info('Archives older than {} months will be deleted'.format(self.archive_months))
+        arch = os.path.join(root, 'archive')
+        rdate = datetime.today() - timedelta(days=self.archive_months * 30)
+
+        archives = index.get_archives()
+        for year, month in archives:
+            if rdate > datetime(year=year, month=month, day=1):
+                month_dir = MONTH_NAMES[month - 1]
+                self.info('Deleting archive {}/{}'.format(year, month_dir))
+                march = os.path.join(arch, str(year), month_dir)
+                if os.path.isdir(march):
+                    shutil.rmtree(march)
+                index.remove_archive(year, month, os.path.relpath(march, root))
+
+        # remove empty year archives
+        remaining = set((y for y, _ in index.get_archives()))
+        for year in set((y for y, _ in archives)) - remaining:
+            yarch = os.path.join(arch, str(year))
+            if os.path.isdir(yarch) and not os.listdir(yarch):
+                self.info('Deleting empty year archive {}'.format(year))
+                os.rmdir(yarch)
+
     def _get_files(self, root):
         return [p for p in os.listdir(root)
                 if not p.startswith('.') and os.path.isfile(os.path.join(root, p))]
@@ -147,6 +270,11 @@ class Archiver(Loggable):
         except Exception, e:
             self.warning('Archiving failed')
             self.warning(e)
+            return
+
+        if self.use_index:
+            get_archive_index(root).add_archive(year, today.month)
+        return os.path.relpath(dst, root)
 
 if __name__ == '__main__':
     from pychron.core.helpers.logger_setup import logging_setup
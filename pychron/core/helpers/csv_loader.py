@@ -0,0 +1,313 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import json
+import warnings
+import numpy as np
+#============= local library imports  ==========================
+
+'''
+    fast loading of large numeric csv files.
+
+    lines are parsed chunk_rows at a time with one numpy call per chunk
+    straight into a preallocated array. only the requested columns and
+    rows (start:stop:step) are kept. reading stops at stop.
+
+    lines that do not parse as numbers fall back to a per field parse
+    where bad or missing fields are nan.
+
+    with cache=True the full table is saved to a <path>.npy sidecar and
+    later loads memory map it. the sidecar is rebuilt when the size or
+    mtime of the csv file changes
+'''
+
+CHUNK_ROWS = 65536
+CACHE_EXT = '.npy'
+CACHE_KEY_EXT = '.npy.json'
+
+
+def load_csv_array(path, columns=None, start=0, stop=None, step=1,
+                   skiprows=0, delimiter=',', comments='#',
+                   chunk_rows=CHUNK_ROWS, cache=False):
+    '''
+        return an array (nrows, ncols) of rows start:stop:step and the
+        given columns (list of indices) of path.
+
+        blank lines are ignored
+    '''
+    if cache:
+        key = _cache_key(path, skiprows, delimiter, comments)
+        data = _read_cache(path, key)
+        if data is None:
+            data = load_csv_array(path, skiprows=skiprows,
+                                  delimiter=delimiter, comments=comments,
+                                  chunk_rows=chunk_rows)
+            _write_cache(path, key, data)
+        return _select(data, columns, start, stop, step)
+
+    with open(path, 'U') as fp:
+        _skip(fp, skiprows)
+        loader = _Loader(columns, start, stop, step, delimiter,
+                         _estimate_rows(path, start, stop, step))
+        for chunk in _iter_chunks(fp, chunk_rows, delimiter, comments):
+            if chunk is not None and not loader.add(chunk):
+                break
+        return loader.result()
+
+
+def load_csv_groups(path, columns=None, start=0, stop=None, step=1,
+                    skiprows=0, delimiter=',', comments='#',
+                    chunk_rows=CHUNK_ROWS):
+    '''
+        same as load_csv_array but blocks separated by blank lines are
+        returned as a list of arrays. start:stop:step applies to each block
+    '''
+    groups = []
+    with open(path, 'U') as fp:
+        _skip(fp, skiprows)
+        loader = None
+        done = False
+        for chunk in _iter_chunks(fp, chunk_rows, delimiter, comments):
+            if chunk is None:
+                if loader is not None:
+                    groups.append(loader.result())
+                loader = None
+                done = False
+                continue
+
+            if done:
+                continue
+
+            if loader is None:
+                loader = _Loader(columns, start, stop, step, delimiter, len(chunk))
+            done = not loader.add(chunk)
+
+        if loader is not None:
+            groups.append(loader.result())
+    return groups
+
+
+def clear_cache(path):
+    for ext in (CACHE_EXT, CACHE_KEY_EXT):
+        try:
+            os.remove(path + ext)
+        except OSError:
+            pass
+
+
+#===============================================================================
+# private
+#===============================================================================
+class _Loader(object):
+    '''
+        parse chunks of lines and collect the selected rows and columns
+        in an array that is grown by doubling
+    '''
+
+    def __init__(self, columns, start, stop, step, delimiter, capacity):
+        self.columns = columns
+        self.start = start or 0
+        self.stop = stop
+        self.step = step or 1
+        self.delimiter = delimiter
+
+        self._capacity = max(1, capacity)
+        self._data = None
+        self._n = 0
+        self._idx = 0
+        self._ncols = None
+
+    def add(self, lines):
+        '''
+            returns False once stop has been reached
+        '''
+        if self._ncols is None:
+            self._ncols = len(_split(lines[0], self.delimiter))
+
+        idx, k = self._idx, len(lines)
+        self._idx += k
+
+        start, stop, step = self.start, self.stop, self.step
+        if stop is not None and idx >= stop:
+            return False
+
+        # first selected row in this chunk
+        first = max(start, idx)
+        first = start + -(-(first - start) // step) * step
+        hi = k if stop is None else min(k, stop - idx)
+        if first - idx < hi:
+            a = _parse_chunk(lines[:hi], self.delimiter, self._ncols)
+            a = a[first - idx:hi:step]
+            if self.columns is not None:
+                a = a[:, self.columns]
+            self._append(a)
+
+        return stop is None or self._idx < stop
+
+    def result(self):
+        if self._data is None:
+            ncols = len(self.columns) if self.columns is not None else (self._ncols or 0)
+            return np.empty((0, ncols))
+
+        data = self._data[:self._n]
+        # a view would keep an oversized buffer alive
+        if len(self._data) > self._n + self._n // 4:
+            data = data.copy()
+        return data
+
+    def _append(self, a):
+        n = len(a)
+        if self._data is None:
+            self._data = np.empty((max(self._capacity, n), a.shape[1]))
+        elif self._n + n > len(self._data):
+            data = np.empty((max(2 * len(self._data), self._n + n), a.shape[1]))
+            data[:self._n] = self._data[:self._n]
+            self._data = data
+
+        self._data[self._n:self._n + n] = a
+        self._n += n
+
+
+def _skip(fp, n):
+    for _ in xrange(n):
+        if not fp.readline():
+            break
+
+
+def _split(line, delimiter):
+    if delimiter is None or not delimiter.strip():
+        return line.split()
+    return line.split(delimiter)
+
+
+def _iter_chunks(fp, chunk_rows, delimiter, comments):
+    '''
+        yield lists of data lines. None marks a blank line
+    '''
+    blank = ' \t\r\n' + (delimiter or '')
+    chunk = []
+    for line in fp:
+        s = line.strip()
+        if not s.strip(blank):
+            if chunk:
+                yield chunk
+                chunk = []
+            yield None
+            continue
+
+        if comments and s.startswith(comments):
+            continue
+
+        chunk.append(s)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def _parse_chunk(lines, delimiter, ncols):
+    text = '\n'.join(lines)
+    if delimiter and delimiter.strip():
+        text = text.replace(delimiter, ' ')
+
+    with warnings.catch_warnings():
+        # newer numpy warns when fromstring stops at a bad value
+        warnings.simplefilter('ignore')
+        try:
+            a = np.fromstring(text, sep=' ')
+        except ValueError:
+            a = None
+
+    if a is not None and a.size == len(lines) * ncols:
+        return a.reshape(len(lines), ncols)
+
+    return _parse_lines(lines, delimiter, ncols)
+
+
+def _parse_lines(lines, delimiter, ncols):
+    a = np.empty((len(lines), ncols))
+    a.fill(np.nan)
+    for i, l in enumerate(lines):
+        for j, v in enumerate(_split(l, delimiter)[:ncols]):
+            try:
+                a[i, j] = float(v)
+            except ValueError:
+                pass
+    return a
+
+
+def _estimate_rows(path, start, stop, step):
+    '''
+        guess the number of selected rows from the file size. assumes
+        ~32 bytes/row. never more than start:stop:step selects
+    '''
+    start = start or 0
+    step = step or 1
+    try:
+        n = max(1024, int(os.path.getsize(path) / 32))
+    except OSError:
+        n = 1024
+
+    if stop is not None:
+        n = min(n, stop)
+    return max(1, -(-(n - start) // step))
+
+
+def _select(data, columns, start, stop, step):
+    data = data[start:stop:step]
+    if columns is not None:
+        data = data[:, columns]
+    return data
+
+
+def _cache_key(path, skiprows, delimiter, comments):
+    st = os.stat(path)
+    return dict(size=st.st_size, mtime=st.st_mtime,
+                skiprows=skiprows, delimiter=delimiter, comments=comments)
+
+
+def _read_cache(path, key):
+    try:
+        with open(path + CACHE_KEY_EXT, 'r') as fp:
+            if json.load(fp) != key:
+                return
+        return np.load(path + CACHE_EXT, mmap_mode='r')
+    except (IOError, OSError, ValueError):
+        pass
+
+
+def _write_cache(path, key, data):
+    p = path + CACHE_EXT
+    tmp = p + '.tmp'
+    try:
+        with open(tmp, 'wb') as fp:
+            np.save(fp, data)
+        os.rename(tmp, p)
+        with open(path + CACHE_KEY_EXT, 'w') as fp:
+            json.dump(key, fp)
+    except (IOError, OSError):
+        # read only directory. just skip the cache
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+#============= EOF =============================================
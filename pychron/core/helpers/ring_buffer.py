@@ -0,0 +1,216 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+from threading import Condition
+from collections import deque
+from numpy import empty, nan, vstack
+#============= local library imports  ==========================
+
+
+class RingBuffer(object):
+    '''
+        fixed capacity, preallocated 2D ring buffer.
+
+        rows are addressed by their absolute index (0 for the first row
+        ever appended). only the last ``capacity`` rows are retained.
+
+        one writer thread, any number of readers. the count is bumped
+        after the row is written so readers never see a partial row
+    '''
+
+    def __init__(self, capacity, ncols, dtype=float):
+        self.capacity = capacity
+        self.ncols = ncols
+        self._data = empty((capacity, ncols), dtype=dtype)
+        self._data.fill(nan)
+        self._count = 0
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def first(self):
+        '''
+            absolute index of the oldest retained row
+        '''
+        return max(0, self._count - self.capacity)
+
+    def append(self, row):
+        self._data[self._count % self.capacity] = row
+        self._count += 1
+
+    def segments(self, start, stop=None):
+        '''
+            return the rows [start, stop) as one or two views into the buffer
+            (two if the range wraps). start is clipped to the oldest retained row
+        '''
+        if stop is None:
+            stop = self._count
+
+        start = max(start, self.first)
+        stop = min(stop, self._count)
+        if stop <= start:
+            return (self._data[:0],)
+
+        cap = self.capacity
+        i, j = start % cap, stop % cap
+        if i < j or j == 0:
+            return (self._data[i:j or cap],)
+        return self._data[i:], self._data[:j]
+
+    def get(self, start, stop=None):
+        '''
+            return rows [start, stop). a view unless the range wraps
+        '''
+        segs = self.segments(start, stop)
+        if len(segs) == 1:
+            return segs[0]
+        return vstack(segs)
+
+    def latest(self, n):
+        return self.get(self._count - n)
+
+
+class MirroredRingBuffer(object):
+    '''
+        1D ring buffer whose last ``window`` values are always available
+        as one contiguous view, with running min/max over that window.
+
+        each value is written twice, at i and i + capacity, so the window
+        never wraps. append is O(1) and min/max are amortized O(1) using
+        monotonic deques.
+
+        capacity is window + slack so a view handed out earlier stays
+        intact for slack more appends
+    '''
+
+    def __init__(self, window, dtype=float, slack=64):
+        self.window = window
+        self.capacity = cap = window + max(1, slack)
+        self._data = empty(2 * cap, dtype=dtype)
+        self._count = 0
+        self._maxq = deque()
+        self._minq = deque()
+
+    def __len__(self):
+        return min(self._count, self.window)
+
+    @property
+    def count(self):
+        return self._count
+
+    def extend(self, vs):
+        for v in vs:
+            self.append(v)
+
+    def append(self, v):
+        i = self._count
+        j = i % self.capacity
+        self._data[j] = v
+        self._data[j + self.capacity] = v
+        self._count = i + 1
+
+        if v == v:
+            # skip nan so it does not poison the extrema
+            maxq, minq = self._maxq, self._minq
+            while maxq and maxq[-1][1] <= v:
+                maxq.pop()
+            maxq.append((i, v))
+            while minq and minq[-1][1] >= v:
+                minq.pop()
+            minq.append((i, v))
+
+        self._expire()
+
+    def view(self):
+        '''
+            contiguous, zero copy view of the window
+        '''
+        n = len(self)
+        s = (self._count - n) % self.capacity
+        return self._data[s:s + n]
+
+    @property
+    def max(self):
+        return self._maxq[0][1] if self._maxq else nan
+
+    @property
+    def min(self):
+        return self._minq[0][1] if self._minq else nan
+
+    def _expire(self):
+        first = self._count - self.window
+        for q in (self._maxq, self._minq):
+            while q and q[0][0] < first:
+                q.popleft()
+
+
+class RingBufferGroup(object):
+    '''
+        one RingBuffer per key, written a row at a time and committed
+        together. consumers block in wait() until a complete row is
+        committed.
+
+        keys not written before commit get a row of nan so every buffer
+        stays index aligned
+    '''
+
+    def __init__(self, keys, capacity, ncols, dtype=float):
+        self.capacity = capacity
+        self.ncols = ncols
+        self.buffers = dict((k, RingBuffer(capacity, ncols, dtype)) for k in keys)
+        self._committed = 0
+        self._cond = Condition()
+
+    @property
+    def committed(self):
+        return self._committed
+
+    def write(self, key, row):
+        buf = self.buffers[key]
+        if buf.count == self._committed:
+            buf.append(row)
+
+    def commit(self):
+        n = self._committed + 1
+        for buf in self.buffers.itervalues():
+            if buf.count < n:
+                buf.append(nan)
+
+        with self._cond:
+            self._committed = n
+            self._cond.notify_all()
+
+    def wait(self, after, timeout=None):
+        '''
+            block until more than ``after`` rows are committed.
+            returns the committed count
+        '''
+        with self._cond:
+            if self._committed <= after:
+                self._cond.wait(timeout)
+            return self._committed
+
+    def get(self, key, start, stop=None):
+        return self.buffers[key].get(start, stop)
+
+    def segments(self, key, start, stop=None):
+        return self.buffers[key].segments(start, stop)
+
+#============= EOF =============================================
@@ -0,0 +1,134 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import time
+import ctypes
+import ctypes.util
+from threading import Thread, Event
+#============= local library imports  ==========================
+
+
+def _get_monotonic():
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+
+    # CLOCK_MONOTONIC via librt on linux/darwin
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    try:
+        lib = ctypes.CDLL(ctypes.util.find_library('rt') or
+                          ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = lib.clock_gettime
+    except (OSError, AttributeError, TypeError):
+        return time.time
+
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+    CLOCK_MONOTONIC = 1 if not os.uname()[0] == 'Darwin' else 6
+
+    def monotonic():
+        t = timespec()
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.pointer(t)) != 0:
+            return time.time()
+        return t.tv_sec + t.tv_nsec * 1e-9
+
+    return monotonic
+
+monotonic = _get_monotonic()
+
+
+class SamplingClock(object):
+    '''
+        ticks on absolute deadlines start + n*period.
+
+        unlike Timer, the time spent in func does not push later ticks back,
+        so sampling stays phase aligned. if func overruns one or more
+        periods the missed ticks are skipped, not run back to back.
+
+        func is called with (tick, scheduled) where scheduled is the
+        wall clock time (s since epoch) of the deadline
+    '''
+
+    def __init__(self, period, func, name='sampling_clock'):
+        '''
+            period in seconds
+        '''
+        self.period = period
+        self.func = func
+        self.name = name
+        self.missed = 0
+
+        self._flag = Event()
+        self._thread = None
+
+    def start(self):
+        self.stop()
+        self._flag = Event()
+        t = Thread(target=self._run, args=(self._flag,), name=self.name)
+        t.setDaemon(True)
+        t.start()
+        self._thread = t
+
+    def stop(self):
+        self._flag.set()
+
+    def is_active(self):
+        return self._thread is not None and self._thread.isAlive() and \
+            not self._flag.is_set()
+
+    def set_period(self, v):
+        '''
+            takes effect on the next tick. phase is reset
+        '''
+        self.period = v
+        if self.is_active():
+            self.start()
+
+    def _run(self, flag):
+        period = self.period
+        # anchor the monotonic deadlines to wall clock time once
+        mono0 = monotonic()
+        wall0 = time.time()
+
+        tick = 0
+        while not flag.is_set():
+            deadline = mono0 + tick * period
+            dt = deadline - monotonic()
+            if dt > 0:
+                flag.wait(dt)
+                if flag.is_set():
+                    break
+
+            try:
+                self.func(tick, wall0 + tick * period)
+            except Exception:
+                # one bad tick must not stop the clock
+                import traceback
+
+                traceback.print_exc()
+
+            # catch up. run the latest overdue tick immediately and skip
+            # any that are more than a full period behind
+            late = monotonic() - (mono0 + (tick + 1) * period)
+            skip = int(late / period) if late > 0 else 0
+            if skip:
+                self.missed += skip
+            tick += 1 + skip
+
+#============= EOF =============================================
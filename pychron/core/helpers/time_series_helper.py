@@ -20,6 +20,7 @@
 
 #============= standard library imports ========================
 import struct
+import numpy as np
 #============= local library imports  ==========================
 def build_time_series_blob(ts, vs):
     '''
@@ -45,4 +46,22 @@ def parse_time_series_blob(blob):
         t.append(ti)
 
     return t, v
+
+def pack_time_series(ts, vs):
+    '''
+        pack times (float64, s since epoch) followed by values (float32).
+        unlike build_time_series_blob time keeps sub second precision
+    '''
+    ts = np.asarray(ts, dtype='<f8')
+    vs = np.asarray(vs, dtype='<f4')
+    return ts.tostring() + vs.tostring()
+
+def unpack_time_series(blob):
+    '''
+        return ts, vs arrays of a pack_time_series blob
+    '''
+    n = len(blob) // 12
+    ts = np.frombuffer(blob, dtype='<f8', count=n)
+    vs = np.frombuffer(blob, dtype='<f4', count=n, offset=8 * n)
+    return ts, vs
 #============= EOF ====================================
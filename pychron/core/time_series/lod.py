@@ -0,0 +1,208 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import json
+import numpy as np
+#============= local library imports  ==========================
+
+LOD_EXT = '.lod.npz'
+FIELDS = ('start', 'tmin', 'vmin', 'tmax', 'vmax')
+
+
+class LODPyramid(object):
+    '''
+        multi resolution min/max envelope of y(x). x must be increasing.
+
+        level 0 is the raw data. each level above combines ``base``
+        buckets of the level below and keeps the min and the max and
+        where they occur, so excursions are visible at every level.
+
+        use select to get the finest level that fits a pixel budget
+    '''
+
+    def __init__(self, x, y, base=4, min_buckets=512, levels=None):
+        self.x = x = np.asarray(x, dtype=float)
+        self.y = y = np.asarray(y, dtype=float)
+        self.base = base
+
+        # level 0 is the raw data. references, no copies
+        self.levels = [(x, x, y, x, y)]
+        if levels is None:
+            lv = self.levels[0]
+            while len(lv[0]) > min_buckets:
+                lv = _reduce(base, *lv)
+                self.levels.append(lv)
+        else:
+            self.levels.extend(levels)
+
+    @property
+    def ymin(self):
+        return np.nanmin(self.levels[-1][2]) if len(self.y) else np.nan
+
+    @property
+    def ymax(self):
+        return np.nanmax(self.levels[-1][4]) if len(self.y) else np.nan
+
+    def select(self, x0, x1, npoints):
+        '''
+            return x, y for [x0, x1] from the finest level with at most
+            npoints points in that range. one point either side is
+            included so lines reach the edges
+        '''
+        for k, lv in enumerate(self.levels):
+            i0, i1 = _bounds(lv[0], x0, x1)
+            n = i1 - i0 if k == 0 else 2 * (i1 - i0)
+            if n <= npoints:
+                break
+
+        return self.get_level(k, i0, i1)
+
+    def get_level(self, k, i0=0, i1=None):
+        if k == 0:
+            return self.x[i0:i1], self.y[i0:i1]
+
+        _, tmin, vmin, tmax, vmax = [a[i0:i1] for a in self.levels[k]]
+
+        # plot the min and max of each bucket in time order
+        first = tmin <= tmax
+        n = len(tmin)
+        xs = np.empty(2 * n)
+        ys = np.empty(2 * n)
+        xs[0::2] = np.where(first, tmin, tmax)
+        ys[0::2] = np.where(first, vmin, vmax)
+        xs[1::2] = np.where(first, tmax, tmin)
+        ys[1::2] = np.where(first, vmax, vmin)
+        return xs, ys
+
+    def to_arrays(self, prefix):
+        d = dict()
+        for k, lv in enumerate(self.levels[1:]):
+            for f, a in zip(FIELDS, lv):
+                d['{}__{}__{}'.format(prefix, k + 1, f)] = a
+        return d
+
+    @classmethod
+    def from_arrays(cls, x, y, arrays, prefix, base=4):
+        levels = []
+        k = 1
+        while '{}__{}__start'.format(prefix, k) in arrays:
+            levels.append(tuple(arrays['{}__{}__{}'.format(prefix, k, f)]
+                                for f in FIELDS))
+            k += 1
+        return cls(x, y, base=base, levels=levels)
+
+
+def lod_path(path):
+    return path + LOD_EXT
+
+
+def save_pyramids(path, pyramids):
+    '''
+        save a list of LODPyramids to the sidecar of data file path.
+        the sidecar is keyed by the size and mtime of path
+    '''
+    arrays = dict()
+    for i, pi in enumerate(pyramids):
+        arrays.update(pi.to_arrays('s{}'.format(i)))
+
+    base = pyramids[0].base if pyramids else 4
+    key = _file_key(path, len(pyramids), base)
+    arrays['meta'] = np.array(json.dumps(key))
+
+    p = lod_path(path)
+    tmp = p + '.tmp'
+    try:
+        with open(tmp, 'wb') as fp:
+            np.savez(fp, **arrays)
+        os.rename(tmp, p)
+    except (IOError, OSError):
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def load_pyramids(path, series, base=4):
+    '''
+        series: list of (x, y) in the order they were saved.
+        returns a list of LODPyramids or None if there is no valid sidecar
+    '''
+    p = lod_path(path)
+    if not os.path.isfile(p):
+        return
+
+    try:
+        arrays = np.load(p)
+        meta = json.loads(str(arrays['meta']))
+        if meta != _file_key(path, len(series), base):
+            return
+
+        return [LODPyramid.from_arrays(x, y, arrays, 's{}'.format(i), base=base)
+                for i, (x, y) in enumerate(series)]
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+
+
+#===============================================================================
+# private
+#===============================================================================
+def _file_key(path, n, base):
+    st = os.stat(path)
+    return dict(size=st.st_size, mtime=st.st_mtime, base=base, n=n)
+
+
+def _bounds(start, x0, x1):
+    n = len(start)
+    i0 = max(0, np.searchsorted(start, x0, 'right') - 1)
+    i1 = min(n, np.searchsorted(start, x1, 'right') + 1)
+    return i0, i1
+
+
+def _reduce(base, start, tmin, vmin, tmax, vmax):
+    '''
+        combine every ``base`` buckets into one
+    '''
+    n = len(start)
+    m = -(-n // base)
+    pad = m * base - n
+
+    def group(a, fill):
+        if pad:
+            a = np.concatenate((a, np.empty(pad)))
+            a[n:] = fill
+        return a.reshape(m, base)
+
+    # ignore nan. an all nan bucket gives nan
+    vn = group(np.where(np.isnan(vmin), np.inf, vmin), np.inf)
+    vx = group(np.where(np.isnan(vmax), -np.inf, vmax), -np.inf)
+
+    rows = np.arange(m)
+    imin = vn.argmin(axis=1)
+    imax = vx.argmax(axis=1)
+
+    nvmin = vn[rows, imin]
+    nvmax = vx[rows, imax]
+    nvmin[nvmin == np.inf] = np.nan
+    nvmax[nvmax == -np.inf] = np.nan
+
+    ntmin = group(tmin, np.nan)[rows, imin]
+    ntmax = group(tmax, np.nan)[rows, imax]
+    return start[::base], ntmin, nvmin, ntmax, nvmax
+
+#============= EOF =============================================
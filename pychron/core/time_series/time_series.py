@@ -57,6 +57,53 @@ def downsample_1d(data, factor=5, estimator=np.mean):
 #    r = np.real(np.fft.ifft(s * np.conjugate(s))) / np.var(x)
 #    return np.linspace(0, len(r) - 1, len(r)), r
 
+def align_series(t, ti, yi, method='previous', tolerance=None):
+    '''
+        resample the series ti, yi at the times t. ti must be increasing.
+
+        method
+            previous: last sample at or before t
+            nearest: closest sample
+
+        samples further than tolerance (s) from t, or with no previous sample,
+        are nan
+    '''
+    t = np.asarray(t, dtype=float)
+    ti = np.asarray(ti, dtype=float)
+    yi = np.asarray(yi, dtype=float)
+    n = len(ti)
+    if not n:
+        return np.empty(len(t)) * np.nan
+
+    idx = np.searchsorted(ti, t, side='right') - 1
+    if method == 'nearest':
+        prv = np.clip(idx, 0, n - 1)
+        nxt = np.clip(idx + 1, 0, n - 1)
+        use_next = (idx < 0) | (np.abs(ti[nxt] - t) < np.abs(t - ti[prv]))
+        idx = np.where(use_next, nxt, prv)
+
+    valid = idx >= 0
+    idx = np.clip(idx, 0, n - 1)
+    if tolerance is not None:
+        valid &= np.abs(ti[idx] - t) <= tolerance
+
+    return np.where(valid, yi[idx], np.nan)
+
+
+def join_on_time(t, series, method='previous', tolerance=None):
+    '''
+        join several series on the reference times t (e.g. bakeout,
+        gauge and device scans in s since epoch).
+
+        series: list of (ti, yi)
+        returns a 2D array (len(t), len(series))
+    '''
+    out = np.empty((len(t), len(series)))
+    for i, (ti, yi) in enumerate(series):
+        out[:, i] = align_series(t, ti, yi, method, tolerance)
+    return out
+
+
 def autocorrelation(x, nlags=100):
 #    from autocorr import autocorr
     from pychron.core.time_series import autocorr
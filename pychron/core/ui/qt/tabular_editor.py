@@ -15,7 +15,8 @@
 #===============================================================================
 
 #============= enthought library imports =======================
-from PySide.QtGui import QKeySequence, QDrag, QAbstractItemView, QTableView, QApplication
+from PySide.QtGui import QKeySequence, QDrag, QAbstractItemView, QTableView, QApplication, \
+    QHeaderView
 from PySide.QtGui import QFont, QFontMetrics
 
 from PySide import QtCore
@@ -71,6 +72,12 @@ class _myTableView(_TableView, ConsumerMixin):
 
             hheader.setFont(fnt)
 
+        if editor.factory.virtual:
+            # rows are fetched on demand. fixed row heights so the view
+            # never has to visit every row
+            vheader.setResizeMode(QHeaderView.Fixed)
+            self.setDragDropMode(QAbstractItemView.NoDragDrop)
+
     def super_keyPressEvent(self, event):
         """ Reimplemented to support edit, insert, and delete by keyboard.
         
@@ -147,6 +154,10 @@ class _myTableView(_TableView, ConsumerMixin):
                 editor.model.insertRow(idx, obj=paste_func(ci))
 
     def keyPressEvent(self, event):
+        if self._editor.factory.virtual and \
+                (event.matches(QKeySequence.Cut) or event.matches(QKeySequence.Paste)):
+            # read only
+            return
 
         if event.matches(QKeySequence.Copy):
             self._copy_cache = [self._editor.value[ci.row()] for ci in
@@ -346,6 +357,13 @@ class myTabularEditor(TabularEditor):
     col_widths = Str
 
     drag_external = Bool(False)
+
+    '''
+        the value is a read only sequence e.g. PagedResults that loads
+        rows as they are requested. only visible rows are requested
+    '''
+    virtual = Bool(False)
+
     def _get_klass(self):
         return _TabularEditor
 #============= EOF =============================================
@@ -19,7 +19,8 @@
 #============= local library imports  ==========================
 from pychron.database.core.database_adapter import PathDatabaseAdapter
 from pychron.database.migrate.manage_database import manage_database
-from pychron.database.orms.bakeout_orm import BakeoutTable, ControllerTable, BakeoutPathTable
+from pychron.database.orms.bakeout_orm import BakeoutTable, ControllerTable, BakeoutPathTable, \
+    ControllerSummaryTable
 from pychron.database.selectors.bakeout_selector import BakeoutDBSelector
 from pychron.paths import paths
 
@@ -38,6 +39,21 @@ class BakeoutAdapter(PathDatabaseAdapter):
 
     def get_bakeouts(self, **kw):
         return self._get_items(BakeoutTable, globals(), **kw)
+
+    def get_unsummarized_bakeouts(self, limit=50, before=None):
+        '''
+            return bakeouts with a controller that has no summary, newest
+            first. before: only bakeouts with id < before
+        '''
+        sess = self.get_session()
+        q = sess.query(BakeoutTable).join(ControllerTable)
+        q = q.outerjoin(ControllerSummaryTable,
+                        ControllerSummaryTable.controller_id == ControllerTable.id)
+        q = q.filter(ControllerSummaryTable.id == None)
+        if before is not None:
+            q = q.filter(BakeoutTable.id < before)
+        q = q.distinct().order_by(BakeoutTable.id.desc()).limit(limit)
+        return q.all()
 #=============================================================================
 #   adder
 #=============================================================================
@@ -52,6 +68,11 @@ class BakeoutAdapter(PathDatabaseAdapter):
         bakeout.controllers.append(c)
         return c
 
+    def add_controller_summary(self, bakeout, controller, **kw):
+        s = ControllerSummaryTable(bakeout_id=bakeout.id, **kw)
+        controller.summary = s
+        return s
+
 
 if __name__ == '__main__':
     db = BakeoutAdapter(name=paths.bakeout_db,
@@ -17,18 +17,37 @@
 # ETSConfig.toolkit = "qt4"
 #============= enthought library imports =======================
 #============= standard library imports ========================
-
+import time
+import datetime
+from threading import Lock
+import numpy as np
 #============= local library imports  ==========================
 from pychron.database.core.database_adapter import PathDatabaseAdapter
 from pychron.database.selectors.device_scan_selector import DeviceScanSelector
 from pychron.database.orms.hardware_orm import ScanTable, DeviceTable, \
-    ScanPathTable
+    ScanPathTable, ScanChunkTable, Base
+from pychron.core.helpers.time_series_helper import pack_time_series, \
+    unpack_time_series
 # from pychron.database.core.functions import delete_one
 
+# longest time span (s) of one ScanChunkTable row. range queries look this
+# far before their start
+CHUNK_SECONDS = 3600
+
+
 class DeviceScanAdapter(PathDatabaseAdapter):
     test_func = None
     selector_klass = DeviceScanSelector
     path_table = ScanPathTable
+
+    def __init__(self, *args, **kw):
+        super(DeviceScanAdapter, self).__init__(*args, **kw)
+        # scan threads of all devices write through one adapter
+        self._write_lock = Lock()
+
+    def initialize_database(self):
+        # add tables missing from older databases e.g. ScanChunkTable
+        self.create_all(Base.metadata)
 #==============================================================================
 #    getters
 #==============================================================================
@@ -44,6 +63,47 @@ class DeviceScanAdapter(PathDatabaseAdapter):
 
     def get_scans(self, **kw):
         return self._retrieve_items(ScanTable, **kw)
+
+    def get_samples(self, device, start=None, end=None):
+        '''
+            return times (s since epoch), values of device between start and
+            end (s since epoch or datetime) across all scans.
+
+            one indexed read of the (device_id, tmin) index
+        '''
+        start, end = _to_epoch(start), _to_epoch(end)
+        with self.session_ctx(commit=None) as sess:
+            did = self._get_device_id(device)
+            if did is None:
+                return np.array([]), np.array([])
+
+            q = sess.query(ScanChunkTable.blob)
+            q = q.filter(ScanChunkTable.device_id == did)
+            if start is not None:
+                q = q.filter(ScanChunkTable.tmin >= start - CHUNK_SECONDS)
+                q = q.filter(ScanChunkTable.tmax >= start)
+            if end is not None:
+                q = q.filter(ScanChunkTable.tmin <= end)
+            q = q.order_by(ScanChunkTable.tmin)
+            chunks = [unpack_time_series(r[0]) for r in q.all()]
+
+        if not chunks:
+            return np.array([]), np.array([])
+
+        ts = np.hstack([c[0] for c in chunks])
+        vs = np.hstack([c[1] for c in chunks])
+
+        # chunks of overlapping scans interleave
+        if len(ts) > 1 and (np.diff(ts) < 0).any():
+            idx = np.argsort(ts, kind='mergesort')
+            ts, vs = ts[idx], vs[idx]
+
+        mask = np.ones(len(ts), dtype=bool)
+        if start is not None:
+            mask &= ts >= start
+        if end is not None:
+            mask &= ts <= end
+        return ts[mask], vs[mask]
 #=============================================================================
 #   adder
 #=============================================================================
@@ -54,11 +114,76 @@ class DeviceScanAdapter(PathDatabaseAdapter):
             device.scans.append(b)
 
         return b
+
+    def add_samples(self, device, ts, vs, scan=None):
+        '''
+            store samples ts (s since epoch), vs of device. ts must be
+            increasing. samples are packed into rows of at most
+            CHUNK_SECONDS and written with one executemany.
+
+            writes are serialized. raises if the commit fails
+        '''
+        ts = np.asarray(ts, dtype=float)
+        vs = np.asarray(vs, dtype=float)
+        if not len(ts):
+            return
+
+        # commit=False rolls back unless the explicit commit below succeeds
+        with self._write_lock, self.session_ctx(commit=False) as sess:
+            did = self._get_device_id(device)
+            sid = scan if scan is None or isinstance(scan, (int, long)) else scan.id
+
+            # split where the span from the chunk start exceeds CHUNK_SECONDS
+            rows = []
+            i = 0
+            n = len(ts)
+            while i < n:
+                j = np.searchsorted(ts, ts[i] + CHUNK_SECONDS, side='left')
+                j = max(j, i + 1)
+                rows.append(dict(device_id=did, scan_id=sid,
+                                 tmin=float(ts[i]), tmax=float(ts[j - 1]),
+                                 n=j - i,
+                                 blob=pack_time_series(ts[i:j], vs[i:j])))
+                i = j
+
+            self._bulk_insert(ScanChunkTable, rows)
+            sess.commit()
+
+    def add_scans(self, device, paths, **kw):
+        '''
+            add a scan and its path for each of paths with one flush
+        '''
+        scans = []
+        for p in paths:
+            s = ScanTable(**kw)
+            self.add_path(s, p)
+            scans.append(s)
+
+        device = self.get_device(device)
+        if device:
+            device.scans.extend(scans)
+
+        self._add_items(scans)
+        return scans
 #
     def add_device(self, name, unique=True, **kw):
         c = DeviceTable(name=name, **kw)
         return self._add_unique(c, 'name', name)
 
+    def _get_device_id(self, device):
+        if isinstance(device, (int, long)):
+            return device
+
+        device = self.get_device(device)
+        if device is not None:
+            return device.id
+
+
+def _to_epoch(t):
+    if isinstance(t, datetime.datetime):
+        return time.mktime(t.timetuple()) + t.microsecond / 1e6
+    return t
+
 
 if __name__ == '__main__':
 
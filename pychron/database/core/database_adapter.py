@@ -17,11 +17,13 @@
 #=============enthought library imports=======================
 from traits.api import Password, Bool, Str, on_trait_change, Any, Property, cached_property
 #=============standard library imports ========================
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.exc import SQLAlchemyError, InvalidRequestError, StatementError, \
     DBAPIError
 import os
+from threading import local
 #=============local library imports  ==========================
 
 from pychron.loggable import Loggable
@@ -31,17 +33,34 @@ import weakref
 
 ATTR_KEYS = ['kind', 'username', 'host', 'name', 'password']
 
+# applied to every new sqlite connection.
+# WAL lets readers run while another connection writes and, with
+# synchronous=NORMAL, only syncs at checkpoints
+SQLITE_PRAGMAS = (('journal_mode', 'WAL'),
+                  ('synchronous', 'NORMAL'),
+                  ('mmap_size', 64 * 1024 * 1024),
+                  ('cache_size', -16000),
+                  ('temp_store', 'MEMORY'))
+
 
 class SessionCTX(object):
     _close_at_exit = True
     _commit = True
     _parent = None
+    _prev = None
+
+    def __init__(self, sess=None, commit=True, parent=None, reuse=False):
+        '''
+            commit: True commit, False rollback, None read only
 
-    def __init__(self, sess=None, commit=True, parent=None):
+            reuse: sess is a long lived (thread) session. end its
+            transaction at exit but do not close it
+        '''
         self._sess = sess
         self._commit = commit
         self._parent = parent
-        if sess:
+        self._reuse = reuse
+        if sess and not reuse:
             self._close_at_exit = False
 
     def __enter__(self):
@@ -49,6 +68,8 @@ class SessionCTX(object):
             if self._sess is None:
                 self._sess = self._parent.session_factory()
 
+            # sess and sess_stack belong to the calling thread
+            self._prev = self._parent.sess
             self._parent.sess_stack += 1
             self._parent.sess = self._sess
 
@@ -57,17 +78,30 @@ class SessionCTX(object):
     def __exit__(self, *args, **kw):
         if self._parent:
             self._parent.sess_stack -= 1
-            if not self._parent.sess_stack:
-                self._parent.sess = None
+            self._parent.sess = self._prev if self._parent.sess_stack else None
 
         #print 'exit',self._commit, self._close_at_exit, self._parent._sess_stack
         # self._sess.flush()
-        if self._close_at_exit:
+        if self._reuse:
+            # a read only (commit=None) transaction is committed too. it
+            # would otherwise hold its snapshot until the next use
+            try:
+                if self._commit is False:
+                    self._sess.rollback()
+                else:
+                    self._sess.commit()
+            except Exception, e:
+                if self._parent:
+                    self._parent.debug('commiting changes error:\n{}'.format(e))
+                self._sess.rollback()
+
+        elif self._close_at_exit:
             try:
                 #self._parent.debug('$%$%$%$%$%$%$%$ commit {}'.format(self._commit))
+                # commit=None just closes. loaded objects stay usable
                 if self._commit:
                     self._sess.commit()
-                else:
+                elif self._commit is False:
                     self._sess.rollback()
 
             except Exception, e:
@@ -81,10 +115,12 @@ class SessionCTX(object):
 
 class DatabaseAdapter(Loggable):
     """
+        sess and sess_stack are kept per thread so one adapter can be shared
+        by threads. each thread's session_ctx only sees its own session
     """
-    sess = None
-
-    sess_stack = 0
+    sess = Property
+    sess_stack = Property
+    _thread_state = None
 
     connected = Bool(False)
     kind = Str  # ('mysql')
@@ -96,6 +132,14 @@ class DatabaseAdapter(Loggable):
     selector_klass = Any
 
     session_factory = None
+    _scoped_session = None
+
+    # connections kept open per engine
+    pool_size = 5
+    # prepared statements cached per sqlite connection
+    sqlite_statement_cache = 256
+    # s a sqlite writer waits for a lock before raising
+    sqlite_busy_timeout = 30
 
     application = Any
 
@@ -111,6 +155,10 @@ class DatabaseAdapter(Loggable):
 
     path=Str
 
+    def __init__(self, *args, **kw):
+        super(DatabaseAdapter, self).__init__(*args, **kw)
+        self._thread_state = local()
+
     def create_all(self, metadata):
         if self.kind=='sqlite':
             with self.session_ctx() as sess:
@@ -121,6 +169,28 @@ class DatabaseAdapter(Loggable):
             sess = self.sess
         return SessionCTX(sess, parent=self, commit=commit)
 
+    def scoped_session_ctx(self, commit=True):
+        '''
+            like session_ctx but reuses one session per thread. objects
+            loaded in the session stay usable between calls. use for read
+            mostly paths e.g. selectors.
+
+            inside another context of the same thread its session is used
+        '''
+        sess = self.sess
+        if sess is not None:
+            return SessionCTX(sess, parent=self, commit=commit)
+
+        return SessionCTX(self._scoped_session(), parent=self, commit=commit,
+                          reuse=True)
+
+    def remove_scoped_session(self):
+        '''
+            close the session of the calling thread
+        '''
+        if self._scoped_session is not None:
+            self._scoped_session.remove()
+
     @property
     def enabled(self):
         return self.kind in ['mysql', 'sqlite']
@@ -155,10 +225,14 @@ class DatabaseAdapter(Loggable):
                 url = self.url
                 if url is not None:
                     self.info('connecting to database {}'.format(url))
-                    engine = create_engine(url, echo=False)
+                    engine = self._engine_factory(url)
                     #                     Session.configure(bind=engine)
 
                     self.session_factory = sessionmaker(bind=engine,autoflush=False)
+                    self.remove_scoped_session()
+                    self._scoped_session = scoped_session(sessionmaker(bind=engine,
+                                                                       autoflush=False,
+                                                                       expire_on_commit=False))
                     if test:
                         self.connected = self._test_db_connection()
                     else:
@@ -210,6 +284,18 @@ host= {}\nurl= {}'.format(self.name, self.username, self.host, self.url))
 
         return q.all()
 
+    def _get_sess(self):
+        return getattr(self._thread_state, 'sess', None)
+
+    def _set_sess(self, v):
+        self._thread_state.sess = v
+
+    def _get_sess_stack(self):
+        return getattr(self._thread_state, 'sess_stack', 0)
+
+    def _set_sess_stack(self, v):
+        self._thread_state.sess_stack = v
+
     @cached_property
     def _get_url(self):
         kind = self.kind
@@ -232,6 +318,22 @@ host= {}\nurl= {}'.format(self.name, self.username, self.host, self.url))
 
         return url
 
+    def _engine_factory(self, url):
+        if self.kind == 'sqlite':
+            # connections are shared by threads through the pool
+            engine = create_engine(url, echo=False,
+                                   poolclass=QueuePool,
+                                   pool_size=self.pool_size,
+                                   connect_args=dict(check_same_thread=False,
+                                                     timeout=self.sqlite_busy_timeout,
+                                                     cached_statements=self.sqlite_statement_cache))
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
+        else:
+            engine = create_engine(url, echo=False,
+                                   pool_size=self.pool_size,
+                                   pool_recycle=3600)
+        return engine
+
     def _import_mysql_driver(self):
         try:
             '''
@@ -343,13 +445,35 @@ host= {}\nurl= {}'.format(self.name, self.username, self.host, self.url))
         args['filename'] = n
         return args
 
-    def _delete_item(self, name, value):
-        sess = self.sess
-        if sess is None:
-            if self.session_factory:
-                sess = self.session_factory()
+    def _add_items(self, objs):
+        '''
+            add objs and flush once
+        '''
+        sess = self.get_session()
+        if sess:
+            sess.add_all(objs)
+            try:
+                sess.flush()
+            except SQLAlchemyError, e:
+                self.debug('add_items exception {}'.format(e))
+                sess.rollback()
+
+    def _bulk_insert(self, table, rows):
+        '''
+            insert rows (list of dicts) into table with one executemany.
+            no ORM objects are made so ids are not returned
+        '''
+        if not rows:
+            return
+
+        if hasattr(table, '__table__'):
+            table = table.__table__
 
-        with self.session_ctx(sess):
+        with self.session_ctx() as sess:
+            sess.execute(table.insert(), rows)
+
+    def _delete_item(self, name, value):
+        with self.session_ctx() as sess:
             func = getattr(self, 'get_{}'.format(name))
             item = func(value)
             if item:
@@ -360,12 +484,7 @@ host= {}\nurl= {}'.format(self.name, self.username, self.host, self.url))
                         filters=None,
                         limit=None, order=None):
 
-        sess = self.sess
-        if sess is None:
-            if self.session_factory:
-                sess = self.session_factory()
-
-        with self.session_ctx(sess):
+        with self.session_ctx(commit=None) as sess:
         #         print 'get items', sess, self.session_factory
         #         sess = self.get_session()
         #    if sess is not None:
@@ -397,21 +516,21 @@ host= {}\nurl= {}'.format(self.name, self.username, self.host, self.url))
             if not isinstance(value, (str, int, unicode, long, float)):
                 return value
 
-        sess = self.get_session()
-        if sess is None:
+        if self.session_factory is None:
             return
 
-        q = sess.query(table)
-        if value is not None:
-            q = q.filter(getattr(table, key) == value)
+        with self.session_ctx(commit=None) as sess:
+            q = sess.query(table)
+            if value is not None:
+                q = q.filter(getattr(table, key) == value)
 
-        try:
-            if order_by is not None:
-                q = q.order_by(order_by)
-            return q.first()
-        except SQLAlchemyError, e:
-            print e
-            return
+            try:
+                if order_by is not None:
+                    q = q.order_by(order_by)
+                return q.first()
+            except SQLAlchemyError, e:
+                print e
+                return
 
     def _query_all(self, q):
         try:
@@ -576,6 +695,13 @@ host= {}\nurl= {}'.format(self.name, self.username, self.host, self.url))
 #        p = sess.query(*query_args).all()
 #        return p
 
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    cur = dbapi_conn.cursor()
+    for k, v in SQLITE_PRAGMAS:
+        cur.execute('PRAGMA {}={}'.format(k, v))
+    cur.close()
+
+
 class PathDatabaseAdapter(DatabaseAdapter):
     path_table = None
 
@@ -587,5 +713,34 @@ class PathDatabaseAdapter(DatabaseAdapter):
         rec.path = p
         return p
 
+    def has_path(self, path):
+        if self.path_table is None:
+            raise NotImplementedError
+
+        with self.session_ctx() as sess:
+            q = sess.query(self.path_table)
+            q = q.filter_by(root=os.path.dirname(path),
+                            filename=os.path.basename(path))
+            return q.first() is not None
+
+    def move_path(self, src, dst):
+        '''
+            point every path record of src at dst.
+            returns the number of records updated
+        '''
+        if self.path_table is None:
+            raise NotImplementedError
+
+        kw = self._get_path_keywords(dst, dict())
+        with self.session_ctx() as sess:
+            q = sess.query(self.path_table)
+            q = q.filter_by(root=os.path.dirname(src),
+                            filename=os.path.basename(src))
+            ps = q.all()
+            for p in ps:
+                p.root = kw['root']
+                p.filename = kw['filename']
+            return len(ps)
+
 #============= EOF =============================================
 
@@ -21,10 +21,12 @@ from traitsui.api import View, Item, \
     HGroup, spring, ListEditor, InstanceEditor, Handler, VGroup, VSplit
 
 #============= standard library imports ========================
+from sqlalchemy import and_, or_
 #============= local library imports  ==========================
 from pychron.database.core.database_adapter import DatabaseAdapter
 
 from pychron.database.core.query import Query, compile_query
+from pychron.database.core.paged_results import PagedResults
 from pychron.viewable import Viewable
 
 from pychron.core.ui.tabular_editor import myTabularEditor
@@ -75,7 +77,14 @@ class SelectorHandler(Handler):
 
 class DatabaseSelector(Viewable, ColumnSorterMixin):
     records = List
-    num_records = Property(depends_on='records')
+    num_records = Property(depends_on='records, paged_records')
+
+    # show all results newest first and fetch pages as they are scrolled to.
+    # see load_paged
+    paged = Bool(False)
+    paged_records = Any
+    page_size = Int(100)
+    max_cached_pages = Int(8)
 
     search = Button
     dclick_recall_enabled = Bool(False)
@@ -130,6 +139,34 @@ class DatabaseSelector(Viewable, ColumnSorterMixin):
             self.scroll_to_row = len(self.records) - 1
             #         self.debug('scb= {}, scroll to row={}'.format(self.scroll_to_bottom, self.scroll_to_row))
 
+    def load_paged(self, queries=None):
+        '''
+            show every result of queries. rows are read page_size at a time
+            with keyset (timestamp, id) queries as the table is scrolled
+        '''
+        if queries is None:
+            queries = self.queries
+
+        db = self.db
+        with db.scoped_session_ctx(commit=None):
+            n, query_str = self._get_selector_records(queries=queries, count=True)
+
+        def fetch(after, offset, limit):
+            with db.scoped_session_ctx(commit=None):
+                dbs, _stmt = self._get_selector_records(queries=queries,
+                                                        limit=limit,
+                                                        after=after,
+                                                        offset=offset,
+                                                        keyset=True)
+                rs = [self._record_view_factory(di) for di in dbs]
+                return [ri for ri in rs if ri]
+
+        self.info('paged query {} returned {} records'.format(query_str, n))
+        self.paged = True
+        self.paged_records = PagedResults(fetch, n, self._record_key,
+                                          page_size=self.page_size,
+                                          max_pages=self.max_cached_pages)
+
     def table_add_query(self):
         self._add_query(add=False)
 
@@ -150,19 +187,19 @@ class DatabaseSelector(Viewable, ColumnSorterMixin):
             self.queries.remove(q)
 
     def load_recent(self, criterion='this month'):
-        with self.db.session_ctx():
+        with self.db.scoped_session_ctx(commit=None):
             dbs = self._get_recent(criterion)
             self.load_records(dbs, load=False)
 
     def load_last(self, n=200):
-        with self.db.session_ctx():
+        with self.db.scoped_session_ctx(commit=None):
             dbs, _stmt = self._get_selector_records(limit=n)
             self.load_records(dbs, load=False)
 
             #    def execute_query(self, filter_str=None):
 
     def execute_query(self, queries=None, load=True, use_filters=True):
-        with self.db.session_ctx():
+        with self.db.scoped_session_ctx(commit=None):
             dbs = self._execute_query(queries, use_filters=use_filters)
             self.load_records(dbs, load=load)
 
@@ -340,11 +377,31 @@ class DatabaseSelector(Viewable, ColumnSorterMixin):
     def _get_selector_records(self):
         pass
 
-    def _get_records(self, q, queries, limit, timestamp='timestamp'):
+    def _get_records(self, q, queries, limit, timestamp='timestamp',
+                     count=False, keyset=False, after=None, offset=None):
+        '''
+            count: return the number of matching records
+            keyset: return limit records newest first starting after the
+            (timestamp, id) key after, or at offset if after is None
+        '''
         if queries:
             q = self._assemble_query(q, queries, self.lookup)
 
+        if count:
+            return q.count(), compile_query(q)
+
         tattr = getattr(self.query_table, timestamp)
+        if keyset:
+            iattr = self.query_table.id
+            if after is not None:
+                t, i = after
+                q = q.filter(or_(tattr < t, and_(tattr == t, iattr < i)))
+            q = q.order_by(tattr.desc(), iattr.desc())
+            if after is None and offset:
+                q = q.offset(offset)
+            q = q.limit(limit)
+            return q.all(), compile_query(q)
+
         q = q.order_by(tattr.desc())
         if limit and limit > 0:
             q = q.limit(limit)
@@ -358,8 +415,12 @@ class DatabaseSelector(Viewable, ColumnSorterMixin):
     def _load_hook(self):
         pass
 
+    def _record_key(self, r):
+        return r.timestamp, r.record_id
+
     def _get_num_records(self):
-        return 'Number Results: {}'.format(len(self.records))
+        rs = self.paged_records if self.paged else self.records
+        return 'Number Results: {}'.format(len(rs) if rs else 0)
 
     #===============================================================================
     # handlers
@@ -380,7 +441,10 @@ class DatabaseSelector(Viewable, ColumnSorterMixin):
         self._open_selected()
 
     def _search_fired(self):
-        self.execute_query(load=False)
+        if self.paged:
+            self.load_paged()
+        else:
+            self.execute_query(load=False)
 
     #        if self.records:
     #            self.selected = self.records[-1:]
@@ -388,7 +452,8 @@ class DatabaseSelector(Viewable, ColumnSorterMixin):
     #            print self.records.index(self.selected[0])
 
     def _limit_changed(self):
-        self.execute_query(load=False)
+        if not self.paged:
+            self.execute_query(load=False)
 
     @on_trait_change('db.[name,host]')
     def _id_string_change(self):
@@ -443,6 +508,7 @@ class DatabaseSelector(Viewable, ColumnSorterMixin):
 
     def _view_factory(self):
         editor = myTabularEditor(adapter=self.tabular_adapter(),
+                                 virtual=self.paged,
                                  dclicked='object.dclicked',
                                  selected='object.selected',
                                  selected_row='object.selected_row',
@@ -460,7 +526,7 @@ class DatabaseSelector(Viewable, ColumnSorterMixin):
             VGroup(
                 CustomLabel('id_string', color='red'),
                 VSplit(
-                    Item('records',
+                    Item('paged_records' if self.paged else 'records',
                          style='custom',
                          editor=editor,
                          show_label=False,
@@ -0,0 +1,123 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+from collections import OrderedDict
+from threading import RLock
+#============= local library imports  ==========================
+
+
+class PagedResults(object):
+    '''
+        read only sequence of query results fetched a page at a time.
+
+        used as the value of a virtual myTabularEditor. the table only asks
+        for the visible rows so only the pages on screen are loaded.
+
+        fetch_page(after, offset, limit) returns a list of rows.
+            after: (timestamp, id) of the last row of the previous page.
+            the next page is read with a keyset query from there.
+            offset is only used when the previous page has not been read,
+            e.g. the scroll bar was dragged
+
+        key(row) returns the (timestamp, id) of a row
+
+        at most max_pages pages are kept. the least recently used page is
+        dropped first
+    '''
+
+    def __init__(self, fetch_page, count, key, page_size=100, max_pages=8):
+        self._fetch_page = fetch_page
+        self._count = count
+        self._key = key
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        self._pages = OrderedDict()
+        # page index: key of the last row of that page
+        self._last_keys = dict()
+        self._lock = RLock()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+
+        page = self.get_page(i // self.page_size)
+        try:
+            return page[i % self.page_size]
+        except IndexError:
+            # rows were deleted since the count
+            return None
+
+    def index(self, item):
+        '''
+            search the cached pages only
+        '''
+        with self._lock:
+            for k, page in self._pages.iteritems():
+                if item in page:
+                    return k * self.page_size + page.index(item)
+        raise ValueError(item)
+
+    def sort(self, *args, **kw):
+        '''
+            order is set by the query
+        '''
+        pass
+
+    def get_page(self, k):
+        with self._lock:
+            try:
+                page = self._pages.pop(k)
+            except KeyError:
+                page = self._load_page(k)
+
+            # most recently used last
+            self._pages[k] = page
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+            return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._last_keys.clear()
+
+    def _load_page(self, k):
+        after = self._last_keys.get(k - 1) if k else None
+        if k and after is None:
+            page = self._fetch_page(None, k * self.page_size, self.page_size)
+        else:
+            page = self._fetch_page(after, None, self.page_size)
+
+        if page:
+            self._last_keys[k] = self._key(page[-1])
+        return page
+
+#============= EOF =============================================
@@ -363,7 +363,10 @@ class VideoQuery(DateQuery):
 
 class BakeoutQuery(Query):
     __params__ = ['Run Date/Time',
-                  'Controller'
+                  'Controller',
+                  'Max Temp',
+                  'Run Duration (h)',
+                  'Time at Setpoint (h)'
     ]
 
 #============= EOF =============================================
@@ -20,6 +20,7 @@ import os
 from datetime import datetime
 
 from pychron.loggable import Loggable
+from pychron.core.helpers.archive_index import get_archive_index
 
 
 MONTH_NAMES = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', \
@@ -38,6 +39,7 @@ class DataWarehouse(Loggable):
                 
     '''
     root = None
+    index = None
     _current_dir = None
 
     def get_current_dir(self):
@@ -69,6 +71,9 @@ class DataWarehouse(Loggable):
         # create subdirectory for this month
         self._current_dir = self._create_subdirectories()
 
+        # data managers add their frames to the index of this root
+        self.index = get_archive_index(r)
+
     def _create_subdirectories(self):
 
         today = datetime.today()
@@ -0,0 +1,45 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+
+from sqlalchemy import *
+from migrate import *
+meta = MetaData()
+
+t = Table('ControllerSummaryTable', meta,
+              Column('id', Integer, primary_key=True),
+              Column('controller_id', Integer, index=True),
+              Column('bakeout_id', Integer, index=True),
+              Column('max_temp', Float, index=True),
+              Column('mean_temp', Float),
+              Column('time_at_setpoint', Float),
+              Column('max_power', Float),
+              Column('heatup_rate', Float),
+              Column('final_pressure', Float),
+              Column('nsamples', Integer),
+              Column('run_duration', Float, index=True),
+              )
+
+def upgrade(migrate_engine):
+    # Upgrade operations go here. Don't create your own engine; bind
+    # migrate_engine to your metadata
+    meta.bind = migrate_engine
+    t.create()
+
+def downgrade(migrate_engine):
+    # Operations to reverse the above upgrade go here.
+    meta.bind = migrate_engine
+    t.drop()
@@ -0,0 +1,42 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+
+from sqlalchemy import *
+from migrate import *
+
+# name, table, columns
+INDEXES = [('ix_BakeoutTable_timestamp_id', 'BakeoutTable', ('timestamp', 'id')),
+           ('ix_ControllerTable_bakeout_id', 'ControllerTable', ('bakeout_id',)),
+           ('ix_BakeoutPathTable_bakeout_id', 'BakeoutPathTable', ('bakeout_id',)),
+           ]
+
+def _indexes(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    for name, table, columns in INDEXES:
+        t = Table(table, meta, autoload=True)
+        yield Index(name, *[t.c[ci] for ci in columns])
+
+def upgrade(migrate_engine):
+    # Upgrade operations go here. Don't create your own engine; bind
+    # migrate_engine to your metadata
+    for idx in _indexes(migrate_engine):
+        idx.create()
+
+def downgrade(migrate_engine):
+    # Operations to reverse the above upgrade go here.
+    for idx in _indexes(migrate_engine):
+        idx.drop()
@@ -0,0 +1,45 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+
+from sqlalchemy import *
+from migrate import *
+meta = MetaData()
+
+t = Table('ScanChunkTable', meta,
+              Column('id', Integer, primary_key=True),
+              Column('device_id', Integer),
+              Column('scan_id', Integer),
+              Column('tmin', Float),
+              Column('tmax', Float),
+              Column('n', Integer),
+              Column('blob', BLOB),
+              )
+
+i = Index('ix_ScanChunkTable_device_tmin', t.c.device_id, t.c.tmin)
+
+def upgrade(migrate_engine):
+    # Upgrade operations go here. Don't create your own engine; bind
+    # migrate_engine to your metadata
+    meta.bind = migrate_engine
+    t.create()
+    i.create()
+
+def downgrade(migrate_engine):
+    # Operations to reverse the above upgrade go here.
+    meta.bind = migrate_engine
+    i.drop()
+    t.drop()
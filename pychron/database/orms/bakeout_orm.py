@@ -32,13 +32,31 @@ class BakeoutTable(Base, ResultsMixin):
     controllers = relationship('ControllerTable')
 
 class ControllerTable(Base, BaseMixin):
-    bakeout_id = Column(Integer, ForeignKey('BakeoutTable.id'))
+    bakeout_id = Column(Integer, ForeignKey('BakeoutTable.id'), index=True)
 
     name = Column(String(40))
     setpoint = Column(Float)
     duration = Column(Float)
     script = Column(String(40))
+    summary = relationship('ControllerSummaryTable', uselist=False)
+
+class ControllerSummaryTable(Base, BaseMixin):
+    '''
+        run statistics of a controller. see bakeout_summary
+    '''
+    controller_id = Column(Integer, ForeignKey('ControllerTable.id'), index=True)
+    # denormalized so bakeouts can be filtered without joining controllers
+    bakeout_id = Column(Integer, index=True)
+
+    max_temp = Column(Float, index=True)
+    mean_temp = Column(Float)
+    time_at_setpoint = Column(Float)
+    max_power = Column(Float)
+    heatup_rate = Column(Float)
+    final_pressure = Column(Float)
+    nsamples = Column(Integer)
+    run_duration = Column(Float, index=True)
 
 class BakeoutPathTable(Base, PathMixin):
-    bakeout_id = Column(Integer, ForeignKey('BakeoutTable.id'))
+    bakeout_id = Column(Integer, ForeignKey('BakeoutTable.id'), index=True)
 
@@ -18,7 +18,7 @@
 
 #=============standard library imports ========================
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, \
+from sqlalchemy import Column, Integer, String, Float, BLOB, Index, \
      ForeignKey, DateTime, func
 from sqlalchemy.orm import relationship
 
@@ -39,5 +39,19 @@ class ScanTable(Base, ResultsMixin):
     device_id = Column(Integer, ForeignKey('DeviceTable.id'))
     scan_timestamp = Column(DateTime, default=func.now())
 
+class ScanChunkTable(Base, BaseMixin):
+    '''
+        samples of a device packed with pack_time_series. tmin, tmax are
+        the first and last sample times (s since epoch)
+    '''
+    device_id = Column(Integer, ForeignKey('DeviceTable.id'))
+    scan_id = Column(Integer, ForeignKey('ScanTable.id'))
+    tmin = Column(Float)
+    tmax = Column(Float)
+    n = Column(Integer)
+    blob = Column(BLOB)
+
+    __table_args__ = (Index('ix_ScanChunkTable_device_tmin', 'device_id', 'tmin'),)
+
 #============= EOF =============================================
 
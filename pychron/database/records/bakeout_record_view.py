@@ -0,0 +1,65 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+#============= local library imports  ==========================
+
+
+class BakeoutRecordView(object):
+    '''
+        lightweight row of the bakeout selector. built from one projected
+        query row (id, timestamp, root, filename, controllers).
+
+        quacks like a BakeoutTable row so a BakeoutRecord can be made from
+        it when the row is opened
+    '''
+    __slots__ = ('id', 'timestamp', 'root', 'filename', 'controllers')
+
+    def __init__(self):
+        self.id = None
+        self.timestamp = None
+        self.root = None
+        self.filename = None
+        self.controllers = ''
+
+    def create(self, row):
+        self.id, self.timestamp, self.root, self.filename, cs = row
+        if cs:
+            self.controllers = ', '.join(sorted(cs.split(',')))
+        return True
+
+    @property
+    def record_id(self):
+        return self.id
+
+    @property
+    def path(self):
+        if self.root and self.filename:
+            return os.path.join(self.root, self.filename)
+
+    @property
+    def rundate(self):
+        if self.timestamp:
+            return self.timestamp.strftime('%Y-%m-%d')
+
+    @property
+    def runtime(self):
+        if self.timestamp:
+            return self.timestamp.strftime('%H:%M:%S')
+
+#============= EOF =============================================
@@ -26,8 +26,10 @@ class SQLiteRecord(DatabaseRecord):
 
     @cached_property
     def _get_path(self):
-        if self.dbrecord.path:
-            root = self.dbrecord.path.root
-            name = self.dbrecord.path.filename
-            return os.path.join(root, name)
+        p = self.dbrecord.path
+        if isinstance(p, basestring):
+            # record views carry the joined path
+            return p
+        elif p:
+            return os.path.join(p.root, p.filename)
 #============= EOF =============================================
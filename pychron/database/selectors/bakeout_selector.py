@@ -16,36 +16,62 @@
 
 #============= enthought library imports =======================
 #============= standard library imports ========================
+from sqlalchemy import func
 #============= local library imports  ==========================
-from pychron.database.orms.bakeout_orm import BakeoutTable
-from pychron.database.core.database_selector import DatabaseSelector
+from pychron.database.orms.bakeout_orm import BakeoutTable, BakeoutPathTable, \
+    ControllerTable, ControllerSummaryTable
+from pychron.database.core.database_selector import DatabaseSelector, \
+    BaseTabularAdapter
 from pychron.database.core.query import BakeoutQuery
 from pychron.database.records.bakeout_record import BakeoutRecord
+from pychron.database.records.bakeout_record_view import BakeoutRecordView
 
-#
 
-# class BakeoutTabularAdapter(TabularAdapter):
-#    columns = [('ID', 'record_id'),
-#               ('Timestamp', 'timestamp')
-#               ]
+class BakeoutTabularAdapter(BaseTabularAdapter):
+    columns = [('ID', 'record_id'),
+               ('Timestamp', 'timestamp'),
+               ('Controllers', 'controllers')]
+
 
 class BakeoutDBSelector(DatabaseSelector):
 
     query_table = BakeoutTable
     record_klass = BakeoutRecord
-    record_view_klass = BakeoutRecord
+    record_view_klass = BakeoutRecordView
     query_klass = BakeoutQuery
-#    tabular_adapter = BakeoutTabularAdapter
-    lookup = {'Run Date':([], BakeoutTable.timestamp), }
+    tabular_adapter = BakeoutTabularAdapter
+    # ControllerTable is always joined. see _get_selector_records
+    lookup = {'Run Date/Time': ([], BakeoutTable.timestamp),
+              'Controller': ([], ControllerTable.name),
+              'Max Temp': ([ControllerSummaryTable], ControllerSummaryTable.max_temp),
+              'Run Duration (h)': ([ControllerSummaryTable],
+                                   ControllerSummaryTable.run_duration),
+              'Time at Setpoint (h)': ([ControllerSummaryTable],
+                                       ControllerSummaryTable.time_at_setpoint)}
 
     dclick_recall_enabled = True
-#    def _record_factory(self, idn):
-#        return idn
+
+    def _record_factory(self, di):
+        # the full record is only made when a row is opened
+        if isinstance(di, BakeoutRecordView):
+            di = self.record_klass(_dbrecord=di)
+        return super(BakeoutDBSelector, self)._record_factory(di)
 
     def _get_selector_records(self, queries=None, limit=None, **kw):
+        '''
+            one query for the listed columns, path and controller names
+            of each bakeout
+        '''
         sess = self.db.get_session()
-        q = sess.query(self.query_table)
-        return self._get_records(q, queries, limit)
+        q = sess.query(BakeoutTable.id, BakeoutTable.timestamp,
+                       BakeoutPathTable.root, BakeoutPathTable.filename,
+                       func.group_concat(ControllerTable.name))
+        q = q.outerjoin(BakeoutPathTable,
+                        BakeoutPathTable.bakeout_id == BakeoutTable.id)
+        q = q.outerjoin(ControllerTable,
+                        ControllerTable.bakeout_id == BakeoutTable.id)
+        q = q.group_by(BakeoutTable.id)
+        return self._get_records(q, queries, limit, **kw)
 
 #============= EOF =============================================
 
@@ -19,10 +19,11 @@
 #============= local library imports  ==========================
 from pychron.database.core.database_selector import DatabaseSelector
 from pychron.database.orms.hardware_orm import ScanTable
-from pychron.database.core.query import compile_query, DeviceScanQuery
+from pychron.database.core.query import DeviceScanQuery
 from pychron.database.records.device_scan_record import DeviceScanRecord
 
 class DeviceScanSelector(DatabaseSelector):
+    query_table = ScanTable
     record_klass = DeviceScanRecord
     query_klass = DeviceScanQuery
     title = 'Device Scans'
@@ -30,11 +31,7 @@ class DeviceScanSelector(DatabaseSelector):
     def _get_selector_records(self, queries=None, limit=None, **kw):
         sess = self.db.get_session()
         q = sess.query(ScanTable)
-        lookup = dict()
-        q = self._assemble_query(q, queries, lookup)
-        records = q.all()
-
-        return records, compile_query(q)
+        return self._get_records(q, queries, limit, **kw)
 
 
 #============= EOF =============================================
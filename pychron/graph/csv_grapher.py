@@ -34,6 +34,7 @@ from pychron.pychron_constants import FIT_TYPES, NULL_STR, DELIMITERS
 from pychron.paths import paths
 from pychron.loggable import Loggable
 from pychron.core.time_series.time_series import smooth
+from pychron.core.helpers.csv_loader import load_csv_groups
 
 
 class DataSelector(HasTraits):
@@ -160,15 +161,16 @@ class CSVGrapher(Loggable):
             # gather data
             reader = csv.reader(fp)
             header = reader.next()
-            groups = self._parse_data(reader)
-            '''
-                groups= [data,]
-                data shape = nrow,ncols
-                
-            '''
-            data = groups[0]
-            x = data[0]
-            y = data[header.index(det)]
+
+        groups = self._parse_data(p, delimiter=',')
+        '''
+            groups= [data,]
+            data shape = ncols,nrows
+
+        '''
+        data = groups[0]
+        x = data[0]
+        y = data[header.index(det)]
 
         sy = smooth(y, window_len=120)  # , window='flat')
 
@@ -235,40 +237,21 @@ class CSVGrapher(Loggable):
                                                                          os.path.basename(self._path)
                 ))
 
-    def _parse_data(self, reader):
-        groups = []
-        while 1:
-            lines = []
-            for l in reader:
-                l = [li.strip() for li in l]
-                if not l or not any(l):
-                    data = np.array([map(float, l) for l in lines])
-                    data = data.transpose()
-                    groups.append(data)
-                    break
-                lines.append(l)
-            else:
-            #                print lines
-            #                for l in lines:
-            #                    print l
-            #                    print map(float, l)
-            #
-                data = np.array([map(float, l) for l in lines])
-                data = data.transpose()
-                groups.append(data)
-                break
-        return groups
+    def _parse_data(self, path, delimiter=None):
+        '''
+            return a list of (ncols, nrows) arrays, one per block of rows
+            separated by a blank line
+        '''
+        if delimiter is None:
+            delimiter = self.delimiter
 
+        groups = load_csv_groups(path, skiprows=1, delimiter=delimiter)
+        return [g.transpose() for g in groups]
 
     def _plot_button_fired(self):
-        with open(self._path, 'U') as fp:
-            reader = csv.reader(fp, delimiter=self.delimiter)
-            _header = reader.next()
-            groups = self._parse_data(reader)
-            #            print groups
-            for data in groups:
-            #                print data
-                self._show_plot(data)
+        groups = self._parse_data(self._path)
+        for data in groups:
+            self._show_plot(data)
 
     def _show_plot(self, data):
         cd = dict(padding=5, stack_order='top_to_bottom')
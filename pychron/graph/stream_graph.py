@@ -20,8 +20,10 @@
 from pyface.timer.api import do_after as do_after_timer
 
 #=============standard library imports ========================
-from numpy import hstack, Inf
+import time
+from numpy import Inf, nanmin, nanmax
 #=============local library imports  ==========================
+from pychron.core.helpers.ring_buffer import MirroredRingBuffer
 # from pychron.graph.editors.stream_plot_editor import StreamPlotEditor
 from pychron.core.helpers.datetime_tools import current_time_generator as time_generator
 from stacked_graph import StackedGraph
@@ -56,10 +58,24 @@ class StreamGraph(Graph):
 
     force_track_x_flag = None
 
+    # (plotid, series): (x buffer, y buffer, published y view)
+    stream_buffers = None
+
+    # record_row redraws at most max_fps times a second
+    max_fps = 10
+    _frame_pending = False
+    _last_frame = 0
+    _dirty_series = None
+    _pending_x_limits = None
+    _pending_y_updates = None
+
+    # plotid: epoch time of x=0
+    time_origins = None
 
     def clear(self):
         self.scan_delays = []
         self.time_generators = []
+        self.time_origins = dict()
         self.data_limits = []
         self.cur_min = []
         self.cur_max = []
@@ -68,6 +84,10 @@ class StreamGraph(Graph):
         self.track_y_max = []
         self.track_y_min = []
         self.force_track_x_flag = False
+        self.stream_buffers = dict()
+        self._dirty_series = set()
+        self._pending_x_limits = dict()
+        self._pending_y_updates = set()
 
         super(StreamGraph, self).clear()
 
@@ -97,13 +117,23 @@ class StreamGraph(Graph):
     def update_y_limits(self, plotid=0, **kw):
         ma = -1
         mi = 1e10
+
+        # use the running extrema of series fed by record
+        bufs = dict((id(yv), yb) for (pid, _), (_, yb, yv) in self.stream_buffers.iteritems()
+                    if pid == plotid)
+
         for _k, v in self.plots[plotid].plots.iteritems():
             ds = v[0].value.get_data()
-            try:
-                ma = max(ma, max(ds))
-                mi = min(mi, min(ds))
-            except ValueError:
-                return
+            yb = bufs.get(id(ds))
+            if yb is not None:
+                dma, dmi = yb.max, yb.min
+            else:
+                if not len(ds):
+                    return
+                dma, dmi = nanmax(ds), nanmin(ds)
+
+            ma = max(ma, dma)
+            mi = min(mi, dmi)
 
         if not self.track_y_max[plotid]:
             ma = None
@@ -125,17 +155,45 @@ class StreamGraph(Graph):
 
     def set_time_zero(self, plotid=0):
 
-        tg = time_generator(self.scan_delays[plotid])
+        tg = self._time_generator(plotid)
         try:
             self.time_generators[plotid] = tg
         except IndexError:
             self.time_generators.append(tg)
 
+    def get_time_origin(self, plotid=0):
+        '''
+            return the epoch time (s) of x=0 or None if nothing has been recorded
+        '''
+        if self.time_origins:
+            return self.time_origins.get(plotid)
+
+    def to_epoch(self, x, plotid=0):
+        '''
+            convert elapsed x to s since epoch
+        '''
+        t0 = self.get_time_origin(plotid)
+        if t0 is not None:
+            return x + t0
+
+    def _time_generator(self, plotid):
+        '''
+            elapsed time generator that records its origin on the first value
+        '''
+        tg = time_generator(self.scan_delays[plotid])
+        x = tg.next()
+        if self.time_origins is None:
+            self.time_origins = dict()
+        self.time_origins[plotid] = time.time() - x
+        yield x
+        for x in tg:
+            yield x
+
     def record_multiple(self, ys, plotid=0, scalar=1, track_x=True, **kw):
 
         tg = self.global_time_generator
         if tg is None:
-            tg = time_generator(self.scan_delays[plotid])
+            tg = self._time_generator(plotid)
             self.global_time_generator = tg
 
         x = tg.next() * scalar
@@ -175,7 +233,7 @@ class StreamGraph(Graph):
             try:
                 tg = self.time_generators[plotid]
             except IndexError:
-                tg = time_generator(self.scan_delays[plotid])
+                tg = self._time_generator(plotid)
                 self.time_generators.append(tg)
 
             nx = tg.next()
@@ -196,36 +254,21 @@ class StreamGraph(Graph):
         #        lim = MAX_LIMIT
         #         pad = 100
         #        print lim, nx, ny
-        lim = -dl * sd - 1000
-        new_xd = hstack((xd[lim:], [nx]))
-        new_yd = hstack((yd[lim:], [ny]))
-        #        print new_xd
-        self.cur_max[plotid] = max(self.cur_max[plotid], max(new_yd))
-        self.cur_min[plotid] = min(self.cur_min[plotid], min(new_yd))
+        window = int(dl * sd + 1000) + 1
+        key = (plotid, series)
+        xb, yb = self._get_stream_buffers(key, xd, yd, window)
+        xb.append(nx)
+        yb.append(ny)
+
+        self.cur_max[plotid] = max(self.cur_max[plotid], yb.max)
+        self.cur_min[plotid] = min(self.cur_min[plotid], yb.min)
 
         def _record_():
             if track_x and (self.track_x_min or self.track_x_max) \
                 or self.force_track_x_flag:
-                ma = new_xd[-1]
-                sd = self.scan_delays[plotid]
-                mi = ma - dl * sd + pad
-                if self.force_track_x_flag or \
-                                ma >= dl * sd - pad:
-
-                    if self.force_track_x_flag:
-                        self.force_track_x_flag = False
-                        ma = dl * sd
-
-                    if not self.track_x_max:
-                        ma = None
-                    else:
-                        ma = ma + pad
-
-                    if not self.track_x_min:
-                        mi = None
-                    else:
-                        mi = max(1, mi)
-
+                lims = self._get_x_track_limits(plotid, nx, pad)
+                if lims:
+                    mi, ma = lims
                     self.set_x_limits(max_=ma,
                                       min_=mi,
                                       plotid=plotid,
@@ -262,8 +305,7 @@ class StreamGraph(Graph):
             if aux:
                 self.add_datum_to_aux_plot((nx, ny), plotid, series)
             else:
-                plot.data.set_data(xn, new_xd)
-                plot.data.set_data(yn, new_yd)
+                self._publish_stream(key, plot, xn, yn)
             #            self.redraw()
 
         if do_after:
@@ -273,6 +315,146 @@ class StreamGraph(Graph):
 
         return nx
 
+    def record_row(self, x, values, track_x=True, update_y_limits=True, pad=0.1):
+        '''
+            record one x value for many series at once.
+
+            values: list of (plotid, series, y)
+
+            the data and limits are only handed to chaco when the next
+            frame is drawn, at most max_fps times a second, so a row
+            across many series and plots costs one repaint.
+            must be called from the gui thread
+        '''
+        plotids = set()
+        for plotid, series, y in values:
+            xn, yn = self.series[plotid][series]
+            plot = self.plots[plotid]
+            dl = self.data_limits[plotid]
+            sd = self.scan_delays[plotid]
+
+            window = int(dl * sd + 1000) + 1
+            key = (plotid, series)
+            xb, yb = self._get_stream_buffers(key, plot.data.get_data(xn),
+                                              plot.data.get_data(yn), window)
+            xb.append(x)
+            yb.append(float(y))
+            self._dirty_series.add(key)
+            plotids.add(plotid)
+
+        for plotid in plotids:
+            ys = [self.stream_buffers[k][1] for k in self.stream_buffers
+                  if k[0] == plotid]
+            self.cur_max[plotid] = max([self.cur_max[plotid]] + [yb.max for yb in ys])
+            self.cur_min[plotid] = min([self.cur_min[plotid]] + [yb.min for yb in ys])
+
+            if track_x and (self.track_x_min or self.track_x_max) \
+                    or self.force_track_x_flag:
+                lims = self._get_x_track_limits(plotid, x, self.data_limits[plotid] * pad)
+                if lims:
+                    self._pending_x_limits[plotid] = lims
+
+            if update_y_limits:
+                self._pending_y_updates.add(plotid)
+
+        self._schedule_frame()
+        return x
+
+    def _schedule_frame(self):
+        if self._frame_pending:
+            return
+
+        self._frame_pending = True
+        dt = max(0, 1.0 / self.max_fps - (time.time() - self._last_frame))
+        do_after_timer(max(1, int(dt * 1000)), self._draw_frame)
+
+    def _draw_frame(self):
+        self._frame_pending = False
+        self._last_frame = time.time()
+
+        for key in self._dirty_series:
+            plotid, series = key
+            try:
+                xn, yn = self.series[plotid][series]
+            except IndexError:
+                # graph was cleared
+                continue
+            self._publish_stream(key, self.plots[plotid], xn, yn)
+        self._dirty_series.clear()
+
+        for plotid, (mi, ma) in self._pending_x_limits.iteritems():
+            self.set_x_limits(min_=mi, max_=ma, plotid=plotid)
+        self._pending_x_limits.clear()
+
+        for plotid in self._pending_y_updates:
+            try:
+                self.update_y_limits(plotid=plotid)
+            except IndexError:
+                pass
+        self._pending_y_updates.clear()
+
+        self.redraw(force=False)
+
+    def _get_x_track_limits(self, plotid, nx, pad):
+        '''
+            return (min, max) to track nx or None if the x limits
+            should not change
+        '''
+        dl = self.data_limits[plotid]
+        sd = self.scan_delays[plotid]
+        ma = nx
+        mi = ma - dl * sd + pad
+        if self.force_track_x_flag or \
+                        ma >= dl * sd - pad:
+
+            if self.force_track_x_flag:
+                self.force_track_x_flag = False
+                ma = dl * sd
+
+            if not self.track_x_max:
+                ma = None
+            else:
+                ma = ma + pad
+
+            if not self.track_x_min:
+                mi = None
+            else:
+                mi = max(1, mi)
+            return mi, ma
+
+    def _get_stream_buffers(self, key, xd, yd, window):
+        '''
+            return the x, y ring buffers for a series. the buffers are
+            (re)seeded from the plot data if the series was set outside
+            of record or the window changed
+        '''
+        try:
+            xb, yb, yv = self.stream_buffers[key]
+            if yv is yd and xb.window == window:
+                return xb, yb
+        except KeyError:
+            pass
+
+        xb = MirroredRingBuffer(window)
+        yb = MirroredRingBuffer(window)
+        n = min(len(xd), len(yd), window - 1)
+        if n:
+            xb.extend(xd[-n:])
+            yb.extend(yd[-n:])
+
+        self.stream_buffers[key] = (xb, yb, yd)
+        return xb, yb
+
+    def _publish_stream(self, key, plot, xn, yn):
+        '''
+            hand chaco contiguous views of the buffers. no copy is made
+        '''
+        xb, yb, _ = self.stream_buffers[key]
+        yv = yb.view()
+        plot.data.set_data(xn, xb.view())
+        plot.data.set_data(yn, yv)
+        self.stream_buffers[key] = (xb, yb, yv)
+
 
 class StreamStackedGraph(StreamGraph, StackedGraph):
     pass
@@ -326,6 +326,17 @@ Add {}'.format(sd)):
     def _update_(self):
         '''
         '''
+        self.pre_sample()
+
+        # self.get_temperature(verbose=False)
+        # self.complex_query(verbose=False)
+        self.get_temp_and_power(verbose=False)
+        self.post_sample()
+
+    def pre_sample(self):
+        '''
+            duration bookkeeping run before each sample
+        '''
         if self.isActive():
             self.cnt += self.update_interval
             nsecs = 15
@@ -333,9 +344,10 @@ Add {}'.format(sd)):
                 self._duration -= (nsecs + self.cnt % nsecs) / 3600.
                 self.cnt = 0
 
-        # self.get_temperature(verbose=False)
-        # self.complex_query(verbose=False)
-        self.get_temp_and_power(verbose=False)
+    def post_sample(self):
+        '''
+            run after each sample has been read
+        '''
         if self._check_temp_enabled:
             self._check_temp()
             #        self.get_temp_and_power(verbose=True)
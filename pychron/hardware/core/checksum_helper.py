@@ -59,6 +59,25 @@ def __generate_crc16_table():
 __crc16_table = __generate_crc16_table()
 
 
+def computeCRC16(buf, start=0, stop=None, start_crc=0xffff):
+    '''
+        Computes the modbus crc16 over a buffer and returns it as an int
+
+        buf can be a str, bytearray or memoryview. only buf[start:stop]
+        is used so a frame's crc can be calculated in place
+    '''
+    if not isinstance(buf, bytearray):
+        buf = bytearray(buf)
+    if stop is None:
+        stop = len(buf)
+
+    table = __crc16_table
+    crc = start_crc
+    for i in xrange(start, stop):
+        crc = (crc >> 8) ^ table[(crc ^ buf[i]) & 0xff]
+    return crc
+
+
 def computeCRC(data, start_crc=0xffff):
     '''
     '''
@@ -70,14 +89,7 @@ def computeCRC(data, start_crc=0xffff):
 
     Accepts a string or a integer list
     '''
-    crc = start_crc
-    pre = lambda x: x
-    if isinstance(data, str):
-        pre = lambda x: ord(x)
-
-    for a in data:
-        crc = ((crc >> 8) & 0xff) ^ __crc16_table[
-               (crc ^ pre(a)) & 0xff]
+    crc = computeCRC16(bytearray(data), start_crc=start_crc)
 
     # flip lo and hi bits
     crc = '%04x' % crc
@@ -0,0 +1,389 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import socket
+import binascii
+from collections import deque
+#============= local library imports  ==========================
+from pychron.hardware.core.communicators.io_loop import Future, chain, \
+    get_io_loop
+from pychron.hardware.core.communicators.serial_communicator import SerialCommunicator
+from pychron.hardware.core.communicators.modbus_communicator import ModbusCommunicator
+from pychron.hardware.core.communicators.ethernet_communicator import EthernetCommunicator
+from pychron.hardware.core.communicators.modbus_framing import reply_length, \
+    encode_write_single, encode_write_multiple, float_to_words, \
+    READ_HOLDING_REGISTERS
+
+'''
+    non-blocking communicators driven by the shared IOLoop.
+
+    ask_async writes the command and returns a Future immediately. the
+    reply is collected by the io loop as bytes arrive so one thread can
+    service many devices. requests to the same port are queued on a
+    channel and executed one at a time.
+
+    use communicator type async_serial, async_modbus or async_ethernet in
+    the device config. the blocking ask/write methods are still available.
+    a serial request holds the port lock (see get_port_lock) from the write
+    until its reply is read. the blocking paths of every communicator on
+    the port hold the same lock so frames from both paths do not interleave
+'''
+
+_channels = dict()
+
+# seconds between attempts to take a port held by a blocking ask/write
+LOCK_RETRY = 0.01
+
+
+class _AsyncRequest(object):
+    def __init__(self, comm, cmd, nbytes, terminator, timeout, kw):
+        self.comm = comm
+        self.cmd = cmd
+        self.nbytes = nbytes
+        self.terminator = terminator
+        self.timeout = timeout
+        self.kw = kw
+        self.future = Future()
+
+
+class _AsyncChannel(object):
+    '''
+        serializes requests on one port. all methods run on the io loop thread
+    '''
+
+    def __init__(self, io_loop, gap=0):
+        self.io_loop = io_loop
+        self.gap = gap
+        self._requests = deque()
+        self._current = None
+        self._buf = ''
+        self._fd = None
+        self._timeout_handle = None
+        self._retry_handle = None
+
+    def submit(self, req):
+        self._requests.append(req)
+        if self._current is None:
+            self._next()
+
+    def _retry(self):
+        self._retry_handle = None
+        self._next()
+
+    def _next(self):
+        if self._current is not None or not self._requests:
+            return
+
+        comm = self._requests[0].comm
+        if not comm._async_acquire():
+            # a blocking ask/write has the port. never block the loop
+            if self._retry_handle is None:
+                self._retry_handle = self.io_loop.call_later(LOCK_RETRY, self._retry)
+            return
+
+        req = self._current = self._requests.popleft()
+        self._buf = ''
+        self._fd = comm._async_fileno()
+        if self._fd is None:
+            self._finish(None)
+            return
+
+        try:
+            comm._async_send(req)
+        except Exception, e:
+            # anything raised here would leave the channel and the port
+            # lock held
+            comm.warning('async send failed {}'.format(e))
+            self._finish(None)
+            return
+
+        if not req.nbytes and req.terminator is False:
+            # write only
+            self._finish('')
+            return
+
+        loop = self.io_loop
+        loop.add_reader(self._fd, self._on_readable)
+        self._timeout_handle = loop.call_later(req.timeout, self._on_timeout, req)
+
+    def _on_readable(self, fd):
+        req = self._current
+        if req is None:
+            self.io_loop.remove_reader(fd)
+            return
+
+        try:
+            data = req.comm._async_recv(fd)
+        except (OSError, IOError, socket.error), e:
+            req.comm.warning('async read failed {}'.format(e))
+            self._finish(self._buf or None)
+            return
+
+        if data:
+            self._buf += data
+            if req.comm._async_is_complete(req, self._buf):
+                self._finish(self._buf)
+
+    def _on_timeout(self, req):
+        if req is self._current:
+            req.comm.debug('async request timed out. nbytes={}'.format(len(self._buf)))
+            self._finish(self._buf or None)
+
+    def _finish(self, r):
+        loop = self.io_loop
+        if self._fd is not None:
+            loop.remove_reader(self._fd)
+        loop.cancel(self._timeout_handle)
+        self._timeout_handle = None
+
+        req, self._current = self._current, None
+        req.comm._async_release()
+        try:
+            r = req.comm._async_process(req, r)
+        except Exception, e:
+            req.future.set_exception(e)
+        else:
+            req.future.set_result(r)
+
+        if self._requests:
+            if self.gap:
+                loop.call_later(self.gap, self._next)
+            else:
+                self._next()
+
+
+class AsyncCommunicatorMixin(object):
+    '''
+        subclasses implement the _async_* hooks
+    '''
+    io_loop = None
+    async_timeout = 1
+
+    def ask_async(self, cmd, nbytes=None, terminator=None, timeout=None, **kw):
+        '''
+            terminator=False means do not wait for a reply
+
+            returns a Future
+        '''
+        if timeout is None:
+            timeout = self.async_timeout
+
+        req = _AsyncRequest(self, cmd, nbytes, terminator, timeout, kw)
+        if self.simulation or self._async_fileno() is None:
+            req.future.set_result(None)
+            return req.future
+
+        loop = self._get_io_loop()
+        loop.call_soon(self._get_channel().submit, req)
+        return req.future
+
+    def tell_async(self, cmd, **kw):
+        return self.ask_async(cmd, terminator=False, **kw)
+
+    def _get_io_loop(self):
+        if self.io_loop is None:
+            self.io_loop = get_io_loop()
+        self.io_loop.start()
+        return self.io_loop
+
+    def _get_channel(self):
+        key = self._async_channel_key()
+        try:
+            return _channels[key]
+        except KeyError:
+            ch = _channels[key] = _AsyncChannel(self._get_io_loop(),
+                                                self._async_gap())
+            return ch
+
+    def _async_gap(self):
+        return 0
+
+    def _async_acquire(self):
+        '''
+            called on the io loop before a request is sent. must not block.
+            return False to retry later
+        '''
+        return True
+
+    def _async_release(self):
+        pass
+
+    def _async_channel_key(self):
+        raise NotImplementedError
+
+    def _async_fileno(self):
+        raise NotImplementedError
+
+    def _async_send(self, req):
+        raise NotImplementedError
+
+    def _async_recv(self, fd):
+        return os.read(fd, 4096)
+
+    def _async_is_complete(self, req, buf):
+        if req.nbytes:
+            return len(buf) >= req.nbytes
+
+        terminator = req.terminator
+        if terminator is None:
+            terminator = ('\n', '\r')
+        elif not isinstance(terminator, (list, tuple)):
+            terminator = (terminator,)
+
+        return any((buf.endswith(ti) for ti in terminator))
+
+    def _async_process(self, req, r):
+        return r
+
+
+class AsyncSerialCommunicator(AsyncCommunicatorMixin, SerialCommunicator):
+    def _async_channel_key(self):
+        return self.port
+
+    def _async_fileno(self):
+        if self.handle is not None and self.handle.isOpen():
+            return self._get_fileno()
+
+    def _async_acquire(self):
+        # the port lock. the blocking ask/write paths of every communicator
+        # on this port hold it for a whole transaction
+        return self._lock.acquire(False)
+
+    def _async_release(self):
+        self._lock.release()
+
+    def _async_send(self, req):
+        if self.clear_output:
+            self.handle.flushInput()
+
+        kw = req.kw
+        self._write(req.cmd, is_hex=kw.get('is_hex', False),
+                    is_binary=kw.get('is_binary', False))
+
+    def _async_process(self, req, r):
+        kw = req.kw
+        cmd = req.cmd
+        verbose = kw.get('verbose', True)
+        if r is not None and req.nbytes:
+            r = r[:req.nbytes]
+
+        if kw.get('is_binary'):
+            if verbose:
+                self.log_response(binascii.hexlify(cmd),
+                                  binascii.hexlify(r) if r else r, kw.get('info'))
+            return r
+        elif kw.get('is_hex'):
+            if r is not None:
+                r = binascii.hexlify(r)
+            if verbose:
+                self.log_response(cmd, r, kw.get('info'))
+            return r
+
+        if kw.get('remove_eol', True):
+            r = self._remove_eol(r)
+        if verbose and r is not None and req.terminator is not False:
+            self.log_response(cmd, self.process_response(r, kw.get('replace')),
+                              kw.get('info'))
+        return r
+
+
+class AsyncModbusCommunicator(AsyncSerialCommunicator, ModbusCommunicator):
+    '''
+        modbus rtu over an async serial port.
+
+        read_async/write_async return Futures of the decoded values
+    '''
+
+    def read_async(self, register, response_type='float', nregisters=1, **kw):
+        frame = self._read_request(register, nregisters)
+        nbytes = kw.pop('nbytes', None)
+        if nbytes is None:
+            nbytes = reply_length(READ_HOLDING_REGISTERS, nregisters)
+        return self._transact_async(frame, response_type, nbytes, **kw)
+
+    def read_block_async(self, register, nregisters, **kw):
+        '''
+            read nregisters raw 16-bit words
+        '''
+        return self.read_async(register, response_type='registers',
+                               nregisters=nregisters, **kw)
+
+    def write_async(self, register, value, **kw):
+        if isinstance(value, float):
+            words = float_to_words(value, self.device_word_order)
+            frame = encode_write_multiple(self._get_address(), int(register), words)
+        else:
+            frame = encode_write_single(self._get_address(), int(register), value)
+        return self._transact_async(frame, 'register_write', 8, **kw)
+
+    def _transact_async(self, frame, response_type, nbytes, **kw):
+        kw['is_binary'] = True
+        f = self.ask_async(frame, nbytes=nbytes, **kw)
+        return chain(f, lambda r: self._decode_response(frame, r, response_type))
+
+    def _async_gap(self):
+        # modbus rtu requires 3.5 character times of silence between frames
+        return 3.5 * self._get_char_time()
+
+
+class AsyncEthernetCommunicator(AsyncCommunicatorMixin, EthernetCommunicator):
+    '''
+        udp communicator with a non-blocking socket. one reply datagram
+        completes a request
+    '''
+    _async_sock = None
+
+    def _async_channel_key(self):
+        return (self.host, self.port)
+
+    def _async_fileno(self):
+        if self._async_sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setblocking(0)
+            self._async_sock = sock
+        return self._async_sock.fileno()
+
+    def _async_send(self, req):
+        # discard any stale replies from a previous timed out request
+        while 1:
+            try:
+                self._async_sock.recv(4096)
+            except socket.error:
+                break
+
+        self._async_sock.sendto(req.cmd, (self.host, self.port))
+
+    def _async_recv(self, fd):
+        try:
+            return self._async_sock.recv(4096)
+        except socket.error:
+            pass
+
+    def _async_is_complete(self, req, buf):
+        return True
+
+    def _async_process(self, req, r):
+        kw = req.kw
+        if r is not None:
+            r = self.process_response(r)
+        if kw.get('verbose', True) and req.terminator is not False:
+            self.log_response(req.cmd, r, kw.get('info'))
+        return r
+
+#============= EOF =============================================
@@ -0,0 +1,372 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import time
+import heapq
+import select
+from itertools import count
+from threading import Thread, Event, Lock, currentThread
+#============= local library imports  ==========================
+from pychron.loggable import Loggable
+
+
+class Future(object):
+    '''
+        result of an asynchronous request.
+
+        result() blocks until the request finishes. callbacks added with
+        add_done_callback are called with the future on the thread that
+        finished it (the io loop for async communicators)
+    '''
+
+    def __init__(self):
+        self._result = None
+        self._exception = None
+        self._event = Event()
+        self._callbacks = []
+        self._cb_lock = Lock()
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        if not self._event.wait(timeout):
+            return
+
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        return self._exception
+
+    def add_done_callback(self, func):
+        with self._cb_lock:
+            if not self.done():
+                self._callbacks.append(func)
+                return
+        func(self)
+
+    def set_result(self, r):
+        self._result = r
+        self._finish()
+
+    def set_exception(self, e):
+        self._exception = e
+        self._finish()
+
+    def _finish(self):
+        with self._cb_lock:
+            self._event.set()
+            cbs, self._callbacks = self._callbacks, []
+
+        for cb in cbs:
+            try:
+                cb(self)
+            except Exception:
+                import traceback
+
+                traceback.print_exc()
+
+
+def chain(future, func):
+    '''
+        return a new Future whose result is func(future.result())
+    '''
+    nf = Future()
+
+    def _done(f):
+        e = f.exception()
+        if e is not None:
+            nf.set_exception(e)
+        else:
+            try:
+                nf.set_result(func(f.result(0)))
+            except Exception, e:
+                nf.set_exception(e)
+
+    future.add_done_callback(_done)
+    return nf
+
+
+def gather(futures):
+    '''
+        return a Future whose result is the list of results of futures.
+        failed futures give None
+    '''
+    nf = Future()
+    n = len(futures)
+    if not n:
+        nf.set_result([])
+        return nf
+
+    results = [None] * n
+    remaining = [n]
+    lock = Lock()
+
+    def _make_cb(i):
+        def _done(f):
+            if f.exception() is None:
+                results[i] = f.result(0)
+            with lock:
+                remaining[0] -= 1
+                fin = not remaining[0]
+            if fin:
+                nf.set_result(results)
+
+        return _done
+
+    for i, f in enumerate(futures):
+        f.add_done_callback(_make_cb(i))
+    return nf
+
+
+class IOLoop(Loggable):
+    '''
+        single threaded select based event loop.
+
+        file descriptors are watched with add_reader and timed callbacks
+        are run with call_at/call_later. call_soon is thread safe and
+        is used to hand work to the loop from other threads
+    '''
+
+    def __init__(self, *args, **kw):
+        super(IOLoop, self).__init__(*args, **kw)
+        self._readers = dict()
+        self._timers = []
+        self._pending = []
+        self._pending_lock = Lock()
+        self._seq = count()
+        self._alive = False
+        self._thread = None
+        self._wake_r, self._wake_w = os.pipe()
+
+    def time(self):
+        return time.time()
+
+    def is_loop_thread(self):
+        return currentThread() is self._thread
+
+    def start(self):
+        if not self._alive:
+            self._alive = True
+            t = Thread(target=self._run, name='io_loop')
+            t.setDaemon(True)
+            t.start()
+            self._thread = t
+
+    def stop(self):
+        self._alive = False
+        self._wake()
+
+    def call_soon(self, func, *args):
+        with self._pending_lock:
+            self._pending.append((func, args))
+        if not self.is_loop_thread():
+            self._wake()
+
+    def call_at(self, deadline, func, *args):
+        '''
+            returns a handle that can be passed to cancel.
+            must be called on the loop thread. use call_soon from others
+        '''
+        h = [deadline, next(self._seq), func, args, False]
+        heapq.heappush(self._timers, h)
+        return h
+
+    def call_later(self, delay, func, *args):
+        return self.call_at(self.time() + delay, func, *args)
+
+    def cancel(self, handle):
+        if handle is not None:
+            handle[4] = True
+
+    def add_reader(self, fd, func):
+        self._readers[fd] = func
+
+    def remove_reader(self, fd):
+        self._readers.pop(fd, None)
+
+    #===============================================================================
+    # private
+    #===============================================================================
+    def _wake(self):
+        try:
+            os.write(self._wake_w, 'x')
+        except OSError:
+            pass
+
+    def _run_pending(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+
+        for func, args in pending:
+            self._call(func, args)
+
+    def _call(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            import traceback
+
+            self.warning(traceback.format_exc())
+
+    def _run(self):
+        timers = self._timers
+        while self._alive:
+            self._run_pending()
+
+            timeout = 0.5
+            while timers and timers[0][4]:
+                heapq.heappop(timers)
+            if timers:
+                timeout = max(0, min(timeout, timers[0][0] - self.time()))
+
+            fds = [self._wake_r] + self._readers.keys()
+            try:
+                rd, _, _ = select.select(fds, [], [], timeout)
+            except (select.error, OSError, IOError), e:
+                self.warning('select error {}'.format(e))
+                # drop descriptors that were closed underneath us
+                for fd in self._readers.keys():
+                    try:
+                        os.fstat(fd)
+                    except OSError:
+                        self._readers.pop(fd, None)
+                continue
+
+            for fd in rd:
+                if fd == self._wake_r:
+                    os.read(self._wake_r, 1024)
+                else:
+                    func = self._readers.get(fd)
+                    if func is not None:
+                        self._call(func, (fd,))
+
+            now = self.time()
+            while timers and timers[0][0] <= now:
+                _, _, func, args, cancelled = heapq.heappop(timers)
+                if not cancelled:
+                    self._call(func, args)
+
+
+class PollScheduler(Loggable):
+    '''
+        periodically issue requests for many devices from one IOLoop.
+
+        each poll is a callable returning a Future. polls fire on absolute
+        deadlines aligned to their period so sample times do not drift.
+        callback is called with (result, scheduled_time, latency)
+    '''
+
+    def __init__(self, io_loop=None, *args, **kw):
+        super(PollScheduler, self).__init__(*args, **kw)
+        if io_loop is None:
+            io_loop = get_io_loop()
+        self.io_loop = io_loop
+        self._polls = dict()
+
+    def add_poll(self, name, request, callback, period):
+        '''
+            period in seconds
+        '''
+        poll = dict(request=request, callback=callback, period=period,
+                    handle=None, pending=False)
+        self.io_loop.start()
+        self.io_loop.call_soon(self._add_poll, name, poll)
+
+    def remove_poll(self, name):
+        self.io_loop.call_soon(self._remove_poll, name)
+
+    def _add_poll(self, name, poll):
+        self._remove_poll(name)
+        self._polls[name] = poll
+
+        period = poll['period']
+        now = self.io_loop.time()
+        deadline = (int(now / period) + 1) * period
+        poll['handle'] = self.io_loop.call_at(deadline, self._tick, name, deadline)
+
+    def _remove_poll(self, name):
+        poll = self._polls.pop(name, None)
+        if poll is not None:
+            self.io_loop.cancel(poll['handle'])
+
+    def _tick(self, name, scheduled):
+        poll = self._polls.get(name)
+        if poll is None:
+            return
+
+        loop = self.io_loop
+        period = poll['period']
+
+        # schedule the next tick first. skip any ticks we have fallen behind on
+        now = loop.time()
+        nticks = max(1, int((now - scheduled) / period) + 1)
+        deadline = scheduled + nticks * period
+        poll['handle'] = loop.call_at(deadline, self._tick, name, deadline)
+
+        if poll['pending']:
+            self.debug('{} poll still pending. skipping tick'.format(name))
+            return
+
+        poll['pending'] = True
+        st = loop.time()
+
+        def _done(f):
+            poll['pending'] = False
+            e = f.exception()
+            r = None if e is not None else f.result(0)
+            poll['callback'](r, scheduled, loop.time() - st)
+
+        try:
+            f = poll['request']()
+        except Exception, e:
+            # a request that fails before returning its future, e.g. a
+            # serial write error, must not leave the poll pending forever
+            poll['pending'] = False
+            self.warning('{} poll request failed {}'.format(name, e))
+            poll['callback'](None, scheduled, loop.time() - st)
+            return
+
+        f.add_done_callback(_done)
+
+
+_io_loop = None
+_poll_scheduler = None
+_singleton_lock = Lock()
+
+
+def get_io_loop():
+    global _io_loop
+    with _singleton_lock:
+        if _io_loop is None:
+            _io_loop = IOLoop(name='io_loop')
+        return _io_loop
+
+
+def get_poll_scheduler():
+    global _poll_scheduler
+    io_loop = get_io_loop()
+    with _singleton_lock:
+        if _poll_scheduler is None:
+            _poll_scheduler = PollScheduler(io_loop, name='poll_scheduler')
+        return _poll_scheduler
+
+#============= EOF =============================================
@@ -18,17 +18,25 @@
 
 #=============enthought library imports=======================
 #=============standard library imports =======================
-import struct
 import binascii
 #=============local library imports  =========================
 from serial_communicator import SerialCommunicator
-from pychron.hardware.core.checksum_helper import computeCRC
+from pychron.hardware.core.communicators.scheduler import ModbusBusScheduler, \
+    BusTransaction
+from pychron.hardware.core.communicators.modbus_framing import encode_read_request, \
+    encode_write_single, encode_write_multiple, encode_hex_request, float_to_words, \
+    decode_reply, reply_length, ModbusFrameError, WRITE_SINGLE_REGISTER, \
+    READ_HOLDING_REGISTERS
 
 
 class ModbusCommunicator(SerialCommunicator):
     '''
         modbus message syntax
         [Device address][function code][data][error check]
+
+        requests and replies are framed as raw bytes (see modbus_framing).
+        the hex string methods (_execute_request, _parse_response) are kept
+        as a compatibility layer
     '''
 
     slave_address = '01'
@@ -63,162 +71,140 @@ class ModbusCommunicator(SerialCommunicator):
     def read(self, register, response_type='float', nregisters=1, **kw):
         '''
         '''
-        if not kw.has_key('nbytes'):
-            if response_type == 'int':
-                kw['nbytes'] = 7
-            elif response_type == 'float':
-                kw['nbytes'] = 8
-
+        self._set_read_nbytes(response_type, nregisters, kw)
         return self.read_holding_register(register,
                                           nregisters, response_type, **kw)
 
-    def _execute_request(self, args, response_type, ** kw):
+    def queue_read(self, register, response_type='float', nregisters=1, **kw):
         '''
-        '''
-        cmd = ''.join([self.slave_address] + args)
-
-        # convert hex string into list of ints
-        cmdargs = self._parse_hexstr(cmd, return_type='int')
-
-        # calculate the CRC and append to message
-        crc = computeCRC(cmdargs)
-        cmd += crc
+            queue a holding register read on the bus scheduler and return a
+            BusTransaction. use transaction.result() to get the parsed value.
 
-        kw['is_hex'] = True
+            without a ModbusBusScheduler the read is executed immediately
+        '''
+        self._set_read_nbytes(response_type, nregisters, kw)
+        frame = self._read_request(register, nregisters)
+        return self._queue_frame(frame, response_type, **kw)
 
-        if self.scheduler is not None:
-            resp = self.scheduler.schedule(self.ask, args=(cmd,),
-                                           kwargs=kw
-                                           )
+    def set_multiple_registers(self, startid,
+                                nregisters, value, response_type, **kw):
+        '''
+        '''
+        if isinstance(value, tuple):
+            words = value
         else:
-            resp = self.ask(cmd, **kw)
+            # convert decimal value to 32-bit float
+            words = float_to_words(value, self.device_word_order)
 
-        return self._parse_response(cmd, resp, response_type)
+        frame = encode_write_multiple(self._get_address(), int(startid), words)
+        return self._execute_frame(frame, response_type, **kw)
 
-    def _parse_hexstr(self, hexstr, return_type='hex'):
+    def set_single_register(self, rid, value,
+                            response_type, func_code='06', ** kw):
         '''
         '''
-        gen = range(0, len(hexstr), 2)
-        if return_type == 'int':
-            return [int(hexstr[i:i + 2], 16) for i in  gen]
-        else:
-            return [hexstr[i:i + 2] for i in gen]
+        frame = encode_write_single(self._get_address(), int(rid), value,
+                                    func_code=int(func_code, 16))
+        return self._execute_frame(frame, response_type, **kw)
 
-    def _parse_response(self, cmd, resp, response_type):
+    def read_holding_register(self, holdid, nregisters, response_type, **kw):
         '''
         '''
-        if resp is not None and resp is not 'simulation':
-
-            args = self._parse_hexstr(resp)
-            if args:
-                if args[0] != cmd[:2]:
-                    self.warning('{} != {}     {} >> {}'.format(cmd[:2],
-                                                    args[0], cmd, resp))
-                    return
-            else:
-                return
-
-            # check the crc
-            cargs = self._parse_hexstr(resp, return_type='int')
-
-            crc = ''.join(args[-2:])
-            calc_crc = computeCRC(cargs[:-2])
-            if not crc.upper() == calc_crc.upper():
-                self.warning('Returned CRC ({}) does not match calculated ({})'.format(crc, calc_crc))
-            else:
-                if response_type == 'register_write':
-                    return True
-                ndata = int(args[2], 16)
-
-                dataargs = args[3:3 + ndata]
-                if len(dataargs) < ndata:
-                    ndata = 4
-                    dataargs = args[3:3 + ndata]
-
-                if ndata > 2:
-                    data = []
-                    for i in range(ndata / 4):
-                        s = 4 * i
-                        low_word = ''.join(dataargs[s:s + 2])
-                        high_word = ''.join(dataargs[s + 2:s + 4])
-
-                        if self.device_word_order == 'low_high':
-                            '''
-                                dataargs in low word - high word order
-                                1234 5678
-                                want high word -low word order
-                                5678 1234
-                            '''
-                            di = ''.join([high_word, low_word])
-                        else:
-                            di = ''.join([low_word, high_word])
-                        data.append(di)
-
-                    data = ''.join(data)
-
-                if response_type == 'float':
-                    fmt_str = '!' + 'f' * (ndata / 4)
-                    resp = struct.unpack(fmt_str, data.decode('hex'))
-                    # return a single value
-
-                    if ndata == 4:
-                        return resp[0]
-                    else:
-                        # return a list of values
-                        return resp
-
-                else:
-                    data = ''.join(args[3:3 + ndata])
-                    return int(data, 16)
+        frame = self._read_request(holdid, nregisters)
+        return self._execute_frame(frame, response_type, **kw)
 
-    def set_multiple_registers(self, startid,
-                                nregisters, value, response_type, **kw):
+    #===============================================================================
+    # private
+    #===============================================================================
+    def _get_address(self):
+        return int(self.slave_address, 16)
+
+    def _read_request(self, holdid, nregisters):
+        return encode_read_request(self._get_address(), holdid, nregisters)
+
+    def _set_read_nbytes(self, response_type, nregisters, kw):
         '''
+            function 03 reply is
+            [address][function code][byte count][2*nregisters data bytes][crc lo][crc hi]
+            so the expected length is known before the request is sent
         '''
+        if not kw.has_key('nbytes'):
+            if response_type in ('int', 'float', 'registers'):
+                kw['nbytes'] = reply_length(READ_HOLDING_REGISTERS, nregisters)
+
+    def _prepare_request_kw(self, kw):
+        kw['is_binary'] = True
+        kw.setdefault('nbytes', reply_length(WRITE_SINGLE_REGISTER))
+        if isinstance(self.scheduler, ModbusBusScheduler):
+            # the bus scheduler enforces the inter-frame timing
+            kw.setdefault('delay', 0)
+
+    def _transact(self, frame, response_type, **kw):
+        resp = self.ask(frame, **kw)
+        return self._decode_response(frame, resp, response_type)
+
+    def _decode_response(self, frame, resp, response_type):
+        if resp and resp != 'simulation':
+            try:
+                return decode_reply(frame, resp, response_type,
+                                    self.device_word_order)
+            except ModbusFrameError, e:
+                self.warning('{}     {} >> {}'.format(e,
+                                                      binascii.hexlify(frame),
+                                                      binascii.hexlify(resp)))
+
+    def _queue_frame(self, frame, response_type, **kw):
+        self._prepare_request_kw(kw)
+
+        if isinstance(self.scheduler, ModbusBusScheduler):
+            return self.scheduler.submit(self._transact, args=(frame, response_type),
+                                         kwargs=kw)
+        else:
+            tr = BusTransaction(self._transact, (frame, response_type), kw)
+            tr.set_result(self._transact(frame, response_type, **kw))
+            return tr
 
-        func_code = '10'
-        data_address = '{:04X}'.format(int(startid))
-        n = '{:04X}'.format(int(nregisters))
-        nbytes = '{:02X}'.format(int(nregisters * 2))
+    def _execute_frame(self, frame, response_type, **kw):
+        self._prepare_request_kw(kw)
 
-        if isinstance(value, tuple):
-            value = ''.join(map('{:04X}'.format, value))
+        if self.scheduler is not None:
+            return self.scheduler.schedule(self._transact, args=(frame, response_type),
+                                           kwargs=kw)
         else:
-            # convert decimal value to 32-bit float
-            binstr = struct.pack('!f', value)
-
-            # convert binary string to a ascii hex string
-            hexstr = binascii.hexlify(binstr)
-            if self.device_word_order == 'low_high':
-                high = hexstr[:4]
-                low = hexstr[4:]
+            return self._transact(frame, response_type, **kw)
 
-                # flip order of words
-                value = ''.join([low, high])
-            else:
-                value = hexstr
+    #===============================================================================
+    # hex string compatibility
+    #===============================================================================
+    def _build_request(self, args):
+        '''
+            args: list of hex strings e.g ['03', '00C8', '0004']
+            return the framed request with the CRC appended
+        '''
+        return encode_hex_request(''.join([self.slave_address] + args))
 
-        return self._execute_request([func_code, data_address, n,
-                                      nbytes, value],
-                                     response_type, **kw)
+    def _execute_request(self, args, response_type, ** kw):
+        '''
+        '''
+        return self._execute_frame(self._build_request(args), response_type, **kw)
 
-    def set_single_register(self, rid, value,
-                            response_type, func_code='06', ** kw):
+    def _parse_hexstr(self, hexstr, return_type='hex'):
         '''
         '''
-        register_addr = '{:04X}'.format(int(rid))
-        value = '{:04X}'.format(int(value))
-        return self._execute_request([func_code, register_addr, value],
-                                     response_type, **kw)
+        gen = range(0, len(hexstr), 2)
+        if return_type == 'int':
+            return [int(hexstr[i:i + 2], 16) for i in  gen]
+        else:
+            return [hexstr[i:i + 2] for i in gen]
 
-    def read_holding_register(self, holdid, nregisters, response_type, **kw):
+    def _parse_response(self, cmd, resp, response_type):
         '''
+            cmd and resp are hex strings
         '''
-        func_code = '03'
-        data_address = '{:04X}'.format(holdid)
-        n = '{:04X}'.format(nregisters)
-        return self._execute_request([func_code, data_address, n],
-                                      response_type, **kw)
+        if resp is not None and resp != 'simulation':
+            return self._decode_response(bytearray(cmd.decode('hex')),
+                                         resp.decode('hex'),
+                                         response_type)
 
 #    def read_input_status(self, inputid, ninputs):
 #        '''
@@ -0,0 +1,200 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+from struct import Struct
+#============= local library imports  ==========================
+from pychron.hardware.core.checksum_helper import computeCRC16
+
+'''
+    binary modbus rtu framing
+
+    requests are built directly into bytearrays and replies are decoded
+    with precompiled structs straight from the received buffer.
+
+    [Device address][function code][data][crc lo][crc hi]
+'''
+
+READ_HOLDING_REGISTERS = 0x03
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+# address, function code, start/register, count/value
+REQUEST = Struct('>BBHH')
+# address, function code, start, nregisters, nbytes
+WRITE_MULTIPLE_HEADER = Struct('>BBHHB')
+# address, function code, nbytes
+REPLY_HEADER = Struct('>BBB')
+CRC = Struct('<H')
+
+FLOAT = Struct('>f')
+FLOAT_WORDS = Struct('>HH')
+
+_structs = {}
+
+
+class ModbusFrameError(Exception):
+    pass
+
+
+def get_struct(fmt):
+    '''
+        return a cached precompiled Struct for fmt
+    '''
+    try:
+        return _structs[fmt]
+    except KeyError:
+        s = _structs[fmt] = Struct(fmt)
+        return s
+
+
+def _append_crc(buf, n):
+    CRC.pack_into(buf, n, computeCRC16(buf, 0, n))
+    return buf
+
+
+def encode_read_request(address, start, nregisters,
+                        func_code=READ_HOLDING_REGISTERS):
+    buf = bytearray(8)
+    REQUEST.pack_into(buf, 0, address, func_code, start, nregisters)
+    return _append_crc(buf, 6)
+
+
+def encode_write_single(address, register, value,
+                        func_code=WRITE_SINGLE_REGISTER):
+    buf = bytearray(8)
+    REQUEST.pack_into(buf, 0, address, func_code, register, int(value) & 0xFFFF)
+    return _append_crc(buf, 6)
+
+
+def encode_write_multiple(address, start, words,
+                          func_code=WRITE_MULTIPLE_REGISTERS):
+    n = len(words)
+    m = 7 + 2 * n
+    buf = bytearray(m + 2)
+    WRITE_MULTIPLE_HEADER.pack_into(buf, 0, address, func_code, start, n, 2 * n)
+    get_struct('>{}H'.format(n)).pack_into(buf, 7, *words)
+    return _append_crc(buf, m)
+
+
+def encode_hex_request(hexstr):
+    '''
+        compatibility shim. hexstr is the address, function code and data
+        as an ascii hex string. returns the framed request with crc
+    '''
+    m = len(hexstr) / 2
+    buf = bytearray(m + 2)
+    buf[:m] = hexstr.decode('hex')
+    return _append_crc(buf, m)
+
+
+def float_to_words(value, word_order='low_high'):
+    '''
+        split a 32-bit float into two 16-bit register words
+    '''
+    high, low = FLOAT_WORDS.unpack(FLOAT.pack(value))
+    if word_order == 'low_high':
+        return low, high
+    return high, low
+
+
+def reply_length(func_code, nregisters=1):
+    '''
+        expected length in bytes of a normal reply
+    '''
+    if func_code == READ_HOLDING_REGISTERS:
+        return 5 + 2 * nregisters
+    # writes echo address, function code, register and value/count
+    return 8
+
+
+def check_reply(request, reply):
+    '''
+        verify the reply's address and crc. raises ModbusFrameError
+    '''
+    n = len(reply)
+    if n < 5:
+        raise ModbusFrameError('reply too short len={}'.format(n))
+
+    if ord(reply[0]) != request[0]:
+        raise ModbusFrameError('address {:02X} != {:02X}'.format(request[0], ord(reply[0])))
+
+    crc, = CRC.unpack_from(reply, n - 2)
+    calc_crc = computeCRC16(reply, 0, n - 2)
+    if crc != calc_crc:
+        raise ModbusFrameError('Returned CRC ({:04X}) does not match calculated ({:04X})'.format(crc, calc_crc))
+
+
+def decode_reply(request, reply, response_type, word_order='low_high'):
+    '''
+        request: the framed request (bytearray)
+        reply: raw reply bytes as read from the port
+
+        returns True for register writes, a float/tuple of floats for
+        response_type=='float', a tuple of raw 16-bit words for
+        response_type=='registers' and an int otherwise
+    '''
+    check_reply(request, reply)
+    if response_type == 'register_write':
+        return True
+
+    _, func_code, ndata = REPLY_HEADER.unpack_from(reply)
+    if func_code & 0x80:
+        raise ModbusFrameError('exception response code={}'.format(ndata))
+
+    if response_type == 'registers':
+        # raw 16-bit register values
+        if len(reply) - 5 < ndata:
+            raise ModbusFrameError('incomplete reply ndata={} len={}'.format(ndata, len(reply)))
+        return get_struct('>{}H'.format(ndata / 2)).unpack_from(reply, 3)
+
+    if len(reply) - 3 < ndata:
+        ndata = 4
+
+    if response_type == 'float':
+        nf = ndata / 4
+        if not nf:
+            return
+
+        e = 3 + 4 * nf
+        if word_order == 'low_high':
+            # dataargs in low word - high word order. swap to high-low
+            data = bytearray(4 * nf)
+            data[0::4] = reply[5:e:4]
+            data[1::4] = reply[6:e:4]
+            data[2::4] = reply[3:e:4]
+            data[3::4] = reply[4:e:4]
+            vs = get_struct('>{}f'.format(nf)).unpack_from(buffer(data))
+        else:
+            vs = get_struct('>{}f'.format(nf)).unpack_from(reply, 3)
+
+        if nf == 1:
+            return vs[0]
+        # return a list of values
+        return vs
+    else:
+        if ndata == 2:
+            return get_struct('>H').unpack_from(reply, 3)[0]
+        elif ndata == 4:
+            return get_struct('>I').unpack_from(reply, 3)[0]
+
+        v = 0
+        for c in bytearray(reply[3:3 + ndata]):
+            v = (v << 8) | c
+        return v
+
+#============= EOF =============================================
@@ -15,13 +15,16 @@
 #===============================================================================
 
 #============= enthought library imports =======================
-from traits.api import Float
+from traits.api import Float, Int
 
 #============= standard library imports ========================
-from threading import Lock
+import time
+from threading import Lock, Thread, currentThread
+from Queue import Queue, Empty
 
 #============= local library imports  ==========================
 from pychron.loggable import Loggable
+from pychron.hardware.core.communicators.io_loop import Future
 
 # SINGLE_ITEM_BUF = True
 # SINGLE_ITEM_BUF=False
@@ -75,6 +78,186 @@ class CommunicationScheduler(Loggable):
         return r
 
 
+class BusError(Exception):
+    pass
+
+
+class BusTransaction(Future):
+    '''
+        future-like handle for a request queued on a ModbusBusScheduler.
+
+        result() blocks until the bus thread has executed the request
+    '''
+
+    def __init__(self, func, args, kwargs):
+        super(BusTransaction, self).__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self._started = False
+        self._state_lock = Lock()
+
+    def set_running(self):
+        '''
+            called by the bus thread. returns False if the transaction was
+            cancelled or failed before it reached the bus
+        '''
+        with self._state_lock:
+            if self.done():
+                return False
+            self._started = True
+            return True
+
+    def cancel(self, msg='cancelled'):
+        '''
+            fail the transaction if it has not reached the bus yet.
+            returns True if it was cancelled
+        '''
+        with self._state_lock:
+            if self._started or self.done():
+                return False
+            self.set_exception(BusError(msg))
+            return True
+
+
+class ModbusBusScheduler(CommunicationScheduler):
+    '''
+        owns a shared rs485 port and executes queued transactions from all
+        devices on a single bus thread.
+
+        frames are issued back-to-back separated only by the Modbus RTU
+        inter-frame silence (3.5 character times at the port's baudrate)
+        instead of each device paying its own read_delay.
+
+        use submit/submit_batch to get BusTransaction futures or schedule
+        for the blocking CommunicationScheduler interface
+    '''
+    baudrate = Int(9600)
+    timeout = Float(2)
+
+    def __init__(self, *args, **kw):
+        super(ModbusBusScheduler, self).__init__(*args, **kw)
+        self._queue = Queue()
+        self._alive = False
+        self._bus_thread = None
+        self._last_frame = 0
+        # guards starting/stopping the bus thread and queueing so there is
+        # only ever one bus thread and no transaction is left unresolved
+        self._run_lock = Lock()
+
+    def get_frame_delay(self):
+        '''
+            return the RTU inter-frame silence in seconds.
+
+            one character is 11 bits (start, 8 data, parity/stop, stop).
+            above 19200 baud the spec fixes the silence at 1.75 ms
+        '''
+        if self.baudrate > 19200:
+            return 0.00175
+        return 3.5 * 11 / float(self.baudrate)
+
+    def start(self):
+        with self._run_lock:
+            self._start()
+
+    def stop(self):
+        '''
+            stop the bus thread and fail the transactions still queued
+        '''
+        with self._run_lock:
+            self._alive = False
+            self._join()
+
+            q = self._queue
+            while 1:
+                try:
+                    tr = q.get_nowait()
+                except Empty:
+                    break
+                tr.cancel('bus {} stopped'.format(self.name))
+
+    def submit(self, func, args=None, kwargs=None):
+        if args is None:
+            args = tuple()
+        if kwargs is None:
+            kwargs = dict()
+
+        tr = BusTransaction(func, args, kwargs)
+        with self._run_lock:
+            self._start()
+            self._queue.put(tr)
+        return tr
+
+    def submit_batch(self, requests):
+        '''
+            requests: list of (func, args, kwargs) tuples
+
+            queue all requests at once so they are framed as one burst.
+            returns a list of BusTransactions in the same order
+        '''
+        return [self.submit(*r) for r in requests]
+
+    def schedule(self, func, args=None, kwargs=None):
+        '''
+            blocking submit. returns None if the transaction does not
+            finish within timeout. a transaction that has not reached the
+            bus by then is cancelled
+        '''
+        tr = self.submit(func, args, kwargs)
+        r = tr.result(self.timeout)
+        if not tr.done():
+            if tr.cancel('timed out after {}s'.format(self.timeout)):
+                self.warning('bus transaction timed out after {}s waiting '
+                             'for the bus. cancelled'.format(self.timeout))
+            else:
+                self.warning('bus transaction timed out after {}s. '
+                             'reply discarded'.format(self.timeout))
+        return r
+
+    def _start(self):
+        if self._alive:
+            return
+
+        # a stopped thread may still be finishing a transaction
+        self._join()
+
+        self._alive = True
+        t = Thread(target=self._run, name='bus_{}'.format(self.name))
+        t.setDaemon(True)
+        t.start()
+        self._bus_thread = t
+
+    def _join(self):
+        t = self._bus_thread
+        if t is not None and t is not currentThread():
+            t.join()
+        self._bus_thread = None
+
+    def _run(self):
+        q = self._queue
+        while self._alive:
+            try:
+                tr = q.get(timeout=0.5)
+            except Empty:
+                continue
+
+            if not tr.set_running():
+                continue
+
+            # honor the inter-frame silence since the end of the last reply
+            gap = self._last_frame + self.get_frame_delay() - time.time()
+            if gap > 0:
+                time.sleep(gap)
+
+            try:
+                tr.set_result(tr.func(*tr.args, **tr.kwargs))
+            except Exception, e:
+                self.warning('bus transaction failed {}'.format(e))
+                tr.set_exception(e)
+
+            self._last_frame = time.time()
+
+
 # class Consumer(Thread):
 #
 #    def __init__(self, q, b, cd):
@@ -23,6 +23,9 @@ import time
 import glob
 import os
 import sys
+import select
+import binascii
+from threading import Lock
 
 import serial
 
@@ -39,6 +42,26 @@ def get_ports():
     return keyspan + usb
 
 
+_port_locks = dict()
+_port_locks_lock = Lock()
+
+
+def get_port_lock(port):
+    '''
+        return the lock shared by every communicator on port.
+
+        devices on a shared rs485 port each have their own communicator.
+        the lock is held from a write until its reply is read so frames
+        to different devices cannot interleave
+    '''
+    with _port_locks_lock:
+        try:
+            return _port_locks[port]
+        except KeyError:
+            lock = _port_locks[port] = Lock()
+            return lock
+
+
 class SerialCommunicator(Communicator):
     '''
         Base Class for devices that communicate using a rs232 serial port.
@@ -69,6 +92,10 @@ class SerialCommunicator(Communicator):
     read_terminator = None
     clear_output = False
 
+    # poll: sleep/poll inWaiting every 10 ms
+    # select: block on the port's file descriptor until data arrives
+    read_mode = 'poll'
+
 
     def reset(self):
         handle = self.handle
@@ -133,6 +160,9 @@ class SerialCommunicator(Communicator):
         self.set_attribute(config, 'read_terminator', 'Communications', 'terminator',
                            optional=True, default=None)
 
+        self.set_attribute(config, 'read_mode', 'Communications', 'read_mode',
+                           optional=True, default='poll')
+
     def tell(self, cmd, is_hex=False, info=None, verbose=True, **kw):
         '''
 
@@ -177,10 +207,12 @@ class SerialCommunicator(Communicator):
             handshake_only=False,
             handshake=None,
             read_terminator=None,
-            nchars=None
+            nchars=None,
+            is_binary=False
     ):
         '''
-
+            is_binary: cmd is written as raw bytes and exactly nbytes raw
+            bytes are read back
         '''
 
 
@@ -197,8 +229,10 @@ class SerialCommunicator(Communicator):
                 self.handle.flushInput()
                 self.handle.flushOutput()
             #            self.info('acquiring lock {}'.format(self._lock))
-            self._write(cmd, is_hex=is_hex)
-            if is_hex:
+            self._write(cmd, is_hex=is_hex, is_binary=is_binary)
+            if is_binary:
+                re = self._read_nchars(nbytes or 8, delay=delay)
+            elif is_hex:
                 if nbytes is None:
                     nbytes = 8
                 re = self._read_hex(nbytes=nbytes, delay=delay)
@@ -210,6 +244,12 @@ class SerialCommunicator(Communicator):
                 # print read_terminator
                 re = self._read_terminator(delay=delay,
                                            terminator=read_terminator)
+        if is_binary:
+            if verbose:
+                self.log_response(binascii.hexlify(cmd),
+                                  binascii.hexlify(re) if re else re, info)
+            return re
+
         if remove_eol:
             re = self._remove_eol(re)
 
@@ -252,6 +292,7 @@ class SerialCommunicator(Communicator):
             #=======================================================================
 
         args['port'] = port
+        self._lock = get_port_lock(port)
 
         for key in ['baudrate', 'bytesize', 'parity', 'stopbits', 'timeout']:
             v = ldict[key] if key in ldict else None
@@ -293,6 +334,7 @@ class SerialCommunicator(Communicator):
         for port in get_ports():
             self.info('trying port {}'.format(port))
             args['port'] = port
+            self._lock = get_port_lock(port)
             try:
                 self.handle = serial.Serial(**args)
             except serial.SerialException:
@@ -360,7 +402,7 @@ class SerialCommunicator(Communicator):
                 #==== valid port addresses ==== \n%s''' % (port, valid))
 
 
-    def _write(self, cmd, is_hex=False):
+    def _write(self, cmd, is_hex=False, is_binary=False):
         '''
             use the serial handle to write the cmd to the serial buffer
 
@@ -375,7 +417,9 @@ class SerialCommunicator(Communicator):
 
         if not self.simulation:
 
-            if is_hex:
+            if is_binary:
+                cmd = bytes(cmd)
+            elif is_hex:
                 cmd = cmd.decode('hex')
                 # write(cmd)
             else:
@@ -393,12 +437,12 @@ class SerialCommunicator(Communicator):
 
     def _read_nchars(self, n, timeout=1, delay=None):
         func = lambda r: self._get_nchars(n, r)
-        return self._read_loop(func, delay, timeout)
+        return self._read_loop(func, delay, timeout, nbytes=n)
 
     def _read_hex(self, nbytes=8, timeout=1, delay=None):
     #        print nbytes
         func = lambda r: self._get_nbytes(nbytes * 2, r)
-        return self._read_loop(func, delay, timeout)
+        return self._read_loop(func, delay, timeout, nbytes=nbytes)
 
     def _read_handshake(self, handshake, handshake_only, timeout=1, delay=None):
         def hfunc(r):
@@ -525,8 +569,82 @@ class SerialCommunicator(Communicator):
             self.warning(e)
         return r, terminated
 
-    def _read_loop(self, func, delay, timeout=1):
+    def _get_fileno(self):
+        try:
+            return self.handle.fileno()
+        except (AttributeError, ValueError, IOError):
+            pass
+
+    def _get_char_time(self):
+        '''
+            time in s to transmit one character (start + 8 data + parity + stop)
+        '''
+        baudrate = self.baudrate or 9600
+        return 11 / float(baudrate)
+
+    def _read_select(self, fd, func, delay, timeout=1, nbytes=None):
+        '''
+            block on the file descriptor instead of sleep polling.
+
+            func is the completion predicate, e.g. _get_nchars, _get_nbytes,
+            _get_isterminated or the handshake check. it is called each time
+            the port becomes readable.
+
+            if the expected number of bytes is known the deadline is pulled in
+            once the first byte arrives to the time needed to transmit the rest
+            of the reply
+        '''
+        # read_delay is not needed. only honor an explicitly requested delay
+        if delay:
+            time.sleep(delay / 1000.)
+
+        r = ''
+        st = time.time()
+        deadline = st + timeout
+        char_time = self._get_char_time()
+        handle = self.handle
+        isterminated = False
+        while 1:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not handle.isOpen():
+                break
+
+            try:
+                rd, _, _ = select.select([fd], [], [], remaining)
+            except (select.error, OSError, IOError), e:
+                self.warning(e)
+                break
+
+            if not rd:
+                break
+
+            first = not r
+            try:
+                r, isterminated = func(r)
+            except (ValueError, TypeError):
+                pass
+
+            if isterminated:
+                break
+
+            if first and nbytes and r:
+                # allow the remaining bytes plus a few character times of slack
+                deadline = min(deadline,
+                               time.time() + (nbytes + 3) * char_time + 0.01)
+
+        if not isterminated:
+            l = len(r) if r else 0
+            self.info('timed out. {:0.3f}s r={}, len={}'.format(time.time() - st, r, l))
+
+        return r
+
+    def _read_loop(self, func, delay, timeout=1, nbytes=None):
         # print func, delay, timeout
+        if self.read_mode == 'select':
+            fd = self._get_fileno()
+            if fd is not None:
+                return self._read_select(fd, func, delay, timeout, nbytes)
+
         if delay is not None:
             time.sleep(delay / 1000.)
 
@@ -0,0 +1,97 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+from collections import namedtuple
+from struct import Struct
+#============= local library imports  ==========================
+
+'''
+    declarative modbus register maps and a read planner that coalesces
+    requested registers into the fewest contiguous function 03 reads
+'''
+
+# kind is 'int' (one 16-bit register) or 'float' (two registers)
+# decoder is an optional callable mapping the raw value to a trait value
+RegisterEntry = namedtuple('RegisterEntry', 'name register kind decoder')
+
+FLOAT = Struct('>f')
+WORDS = Struct('>HH')
+
+
+def register(name, address, kind='int', decoder=None):
+    return RegisterEntry(name, address, kind, decoder)
+
+
+def nregisters(entry):
+    return 2 if entry.kind == 'float' else 1
+
+
+def plan_reads(entries, max_registers=40, max_gap=16):
+    '''
+        group entries into contiguous reads.
+
+        an entry is added to the current block if the gap from the end of
+        the block is at most max_gap registers and the block would not
+        exceed max_registers
+
+        returns a list of (start, nregisters, entries)
+    '''
+    blocks = []
+    for e in sorted(entries, key=lambda x: x.register):
+        end = e.register + nregisters(e)
+        if blocks:
+            start, stop, es = blocks[-1]
+            if e.register - stop <= max_gap and max(stop, end) - start <= max_registers:
+                es.append(e)
+                blocks[-1] = (start, max(stop, end), es)
+                continue
+
+        blocks.append((e.register, end, [e]))
+
+    return [(start, stop - start, es) for start, stop, es in blocks]
+
+
+def words_to_float(w0, w1, word_order='low_high'):
+    if word_order == 'low_high':
+        w0, w1 = w1, w0
+    return FLOAT.unpack(WORDS.pack(w0, w1))[0]
+
+
+def decode_entry(entry, value):
+    if value is not None and entry.decoder is not None:
+        value = entry.decoder(value)
+    return value
+
+
+def decode_block(start, words, entries, word_order='low_high'):
+    '''
+        words: raw 16-bit register values read from start
+
+        returns a dict of entry.name: decoded value
+    '''
+    values = dict()
+    for e in entries:
+        i = e.register - start
+        if e.kind == 'float':
+            v = words_to_float(words[i], words[i + 1], word_order)
+        else:
+            v = words[i]
+        values[e.name] = decode_entry(e, v)
+    return values
+
+#============= EOF =============================================
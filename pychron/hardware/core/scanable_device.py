@@ -19,6 +19,7 @@ from traitsui.api import HGroup, VGroup, Item, spring, ButtonEditor
 #============= standard library imports ========================
 from threading import Lock
 import os
+import time
 #============= local library imports  ==========================
 from pychron.hardware.core.viewable_device import ViewableDevice
 from pychron.graph.plot_record import PlotRecord
@@ -31,6 +32,7 @@ from pychron.core.helpers.datetime_tools import generate_datetimestamp
 from pychron.hardware.core.alarm import Alarm
 from pychron.graph.graph import Graph
 from pychron.graph.time_series_graph import TimeSeriesStreamGraph
+from pychron.hardware.core.communicators.io_loop import get_poll_scheduler
 
 
 class ScanableDevice(ViewableDevice):
@@ -40,8 +42,24 @@ class ScanableDevice(ViewableDevice):
 
     is_scanable = Bool(False)
     scan_func = Any
+    # name of a method returning a Future. used instead of scan_func when
+    # the communicator supports async requests
+    async_scan_func = Any
     scan_lock = None
     timer = None
+    # DeviceScanAdapter shared by all devices. see _get_scan_db
+    _scan_db = None
+
+    # DataManager kind 'db' stores samples in the device scan database
+    # instead of a file per scan. samples are written every
+    # scan_flush_interval s
+    scan_flush_interval = 60
+    # samples kept while the database cannot be written. oldest dropped first
+    scan_max_buffered = 100000
+    _scan_samples = None
+    _scan_device_id = None
+    _scan_record_id = None
+    _scan_flush_t = None
     scan_period = Float(1000, enter_set=True, auto_set=False)
     scan_units = 'ms'
     record_scan_data = Bool(False)
@@ -77,6 +95,7 @@ class ScanableDevice(ViewableDevice):
                 self.set_attribute(config, 'scan_units', 'Scan', 'units')
                 self.set_attribute(config, 'record_scan_data', 'Scan', 'record', cast='boolean')
                 self.set_attribute(config, 'graph_scan_data', 'Scan', 'graph', cast='boolean')
+                self.set_attribute(config, 'async_scan_func', 'Scan', 'async_function', optional=True)
                 self.set_attribute(config, 'use_db', 'DataManager', 'use_db', cast='boolean', default=False)
                 self.set_attribute(config, 'dm_kind', 'DataManager', 'kind', default='csv')
 
@@ -100,54 +119,83 @@ class ScanableDevice(ViewableDevice):
                 print e
                 return
 
-            if v is not None:
-                self.current_scan_value = str(v)
-
-                if self.graph_scan_data:
-                    if isinstance(v, tuple):
-                        x = self.graph.record_multiple(v)
-                    elif isinstance(v, PlotRecord):
-                        for pi, d in zip(v.plotids, v.data):
-
-                            if isinstance(d, tuple):
-                                x = self.graph.record_multiple(d, plotid=pi)
-                            else:
-                                x = self.graph.record(d, plotid=pi)
-                        v = v.as_data_tuple()
-
-                    else:
-                        x = self.graph.record(v)
-                        v = (v,)
-
-                if self.record_scan_data:
-                    if self.dm_kind == 'csv':
-                        ts = generate_datetimestamp()
-                        self.data_manager.write_to_frame((ts, x) + v)
-                    else:
-                        tab = self.data_manager.get_table('scan1', '/scans')
-                        if tab is not None:
-                            r = tab.row
-                            r['time'] = x
-                            r['value'] = v[0]
-                            r.append()
-                            tab.flush()
-
-                self._scan_hook(v)
+            self._handle_scan_value(v)
 
-            else:
-                '''
-                    scan func must return a value or we will stop the scan
-                    since the timer runs on the main thread any long comms timeouts
-                    slow user interaction
-                '''
-                if self._no_response_counter > 3:
-                    self.timer.Stop()
-                    self.info('no response. stopping scan')
-                    self._scanning = False
-                    self._no_response_counter = 0
+    def _async_scan_(self, v, scheduled, latency):
+        if self.scan_lock is None:
+            self.scan_lock = Lock()
 
+        with self.scan_lock:
+            if self._scanning:
+                self._handle_scan_value(v, scheduled)
+
+    def _handle_scan_value(self, v, t=None):
+        '''
+            t: sample time in s since epoch. defaults to now
+        '''
+        if v is not None:
+            if t is None:
+                t = time.time()
+            self.current_scan_value = str(v)
+
+            if self.graph_scan_data:
+                if isinstance(v, tuple):
+                    x = self.graph.record_multiple(v)
+                elif isinstance(v, PlotRecord):
+                    for pi, d in zip(v.plotids, v.data):
+
+                        if isinstance(d, tuple):
+                            x = self.graph.record_multiple(d, plotid=pi)
+                        else:
+                            x = self.graph.record(d, plotid=pi)
+                    v = v.as_data_tuple()
+
+                else:
+                    x = self.graph.record(v)
+                    v = (v,)
+
+            if self.record_scan_data:
+                if self.dm_kind == 'db':
+                    self._buffer_scan_sample(t, v[0])
+                elif self.dm_kind == 'csv':
+                    ts = generate_datetimestamp()
+                    self.data_manager.write_to_frame((ts, x) + v)
                 else:
-                    self._no_response_counter += 1
+                    tab = self.data_manager.get_table('scan1', '/scans')
+                    if tab is not None:
+                        r = tab.row
+                        r['time'] = t
+                        r['value'] = v[0]
+                        r.append()
+                        tab.flush()
+
+            self._scan_hook(v)
+
+        else:
+            '''
+                scan func must return a value or we will stop the scan
+                since the timer runs on the main thread any long comms timeouts
+                slow user interaction
+            '''
+            if self._no_response_counter > 3:
+                self._stop_scan_timer()
+                self.info('no response. stopping scan')
+                self._scanning = False
+                self._no_response_counter = 0
+
+            else:
+                self._no_response_counter += 1
+
+    def _use_async_scan(self):
+        return self.async_scan_func and \
+                hasattr(self._communicator, 'ask_async')
+
+    def _stop_scan_timer(self):
+        if self._use_async_scan():
+            get_poll_scheduler().remove_poll(self.name)
+
+        if self.timer is not None:
+            self.timer.Stop()
 
     def scan(self, *args, **kw):
         if self.scan_lock is None:
@@ -160,10 +208,13 @@ class ScanableDevice(ViewableDevice):
         if self.timer is not None:
             self.timer.Stop()
             self.timer.wait_for_completion()
+        self._stop_scan_timer()
 
         self._scanning = True
         self.info('Starting scan')
-        if self.record_scan_data:
+        if self.record_scan_data and self.dm_kind == 'db':
+            self._start_db_scan()
+        elif self.record_scan_data:
             if self.dm_kind == 'h5':
                 klass = H5DataManager
             else:
@@ -181,39 +232,102 @@ class ScanableDevice(ViewableDevice):
             self.scan_path = dm.get_current_path()
 
             if self.dm_kind == 'h5':
+                dm.set_run_start()
                 g = dm.new_group('scans')
-                dm.new_table(g, 'scan1')
+                dm.new_table(g, 'scan1', table_style='Epoch')
 
             if self.auto_start:
                 self.save_scan_to_db()
 
         sp = self.scan_period * self.time_dict[self.scan_units]
-        self.timer = Timer(sp, self.scan)
+        if self._use_async_scan():
+            # all async devices are polled from the shared io loop
+            get_poll_scheduler().add_poll(self.name,
+                                          getattr(self, self.async_scan_func),
+                                          self._async_scan_,
+                                          sp / 1000.)
+        else:
+            self.timer = Timer(sp, self.scan)
         self.info('Scan started')
 
     def save_scan_to_db(self):
-        from pychron.database.adapters.device_scan_adapter import DeviceScanAdapter
-
-        db = DeviceScanAdapter(name=paths.device_scan_db,
-                               kind='sqlite')
-        db.connect()
-        dev = db.add_device(self.name, klass=self.__class__.__name__)
-        s = db.add_scan(dev)
-
+        db = self._get_scan_db()
         path = self.scan_path
-        db.add_path(s, path)
+        with db.session_ctx():
+            dev = db.add_device(self.name, klass=self.__class__.__name__)
+            s = db.add_scan(dev)
+            db.add_path(s, path)
         self.info('saving scan {} to database {}'.format(path, paths.device_scan_db))
 
-        db.commit()
+    def _start_db_scan(self):
+        db = self._get_scan_db()
+        with db.session_ctx() as sess:
+            dev = db.add_device(self.name, klass=self.__class__.__name__)
+            s = db.add_scan(dev)
+            sess.flush()
+            self._scan_device_id, self._scan_record_id = dev.id, s.id
+
+        self._scan_samples = []
+        self._scan_flush_t = None
+        self.info('recording scan to database {}'.format(paths.device_scan_db))
+
+    def _buffer_scan_sample(self, t, v):
+        samples = self._scan_samples
+        if samples is None:
+            return
+
+        samples.append((t, v))
+        # time of the last flush attempt. a failed flush is retried after
+        # another interval, not on every sample
+        if self._scan_flush_t is None:
+            self._scan_flush_t = t
+        elif t - self._scan_flush_t >= self.scan_flush_interval:
+            self._scan_flush_t = t
+            self._flush_scan_samples()
+
+    def _flush_scan_samples(self):
+        samples, self._scan_samples = self._scan_samples, []
+        if not samples:
+            return
+
+        ts, vs = zip(*samples)
+        try:
+            self._get_scan_db().add_samples(self._scan_device_id, ts, vs,
+                                            scan=self._scan_record_id)
+        except Exception, e:
+            # keep the samples for the next flush
+            self._scan_samples = (samples + self._scan_samples)[-self.scan_max_buffered:]
+            self.warning('failed writing {} samples to database. {}'.format(len(ts), e))
+
+    def _get_scan_db(self):
+        '''
+            every device shares one adapter and its connection pool
+        '''
+        db = ScanableDevice._scan_db
+        if db is None:
+            from pychron.database.adapters.device_scan_adapter import DeviceScanAdapter
+
+            db = DeviceScanAdapter(path=paths.device_scan_db, kind='sqlite')
+            ScanableDevice._scan_db = db
+
+        db.connect()
+        return db
 
     def stop_scan(self):
         self.info('Stoppiing scan')
 
         self._scanning = False
-        if self.timer is not None:
-            self.timer.Stop()
+        self._stop_scan_timer()
+
+        if self.record_scan_data and self.dm_kind == 'db':
+            if self.scan_lock is not None:
+                with self.scan_lock:
+                    self._flush_scan_samples()
+            else:
+                self._flush_scan_samples()
+            self._scan_samples = None
 
-        if self.record_scan_data and not self._auto_started:
+        elif self.record_scan_data and not self._auto_started:
             if self.use_db:
                 if self.db_save_dialog():
                     self.save_scan_to_db()
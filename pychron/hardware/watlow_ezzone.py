@@ -16,6 +16,8 @@
 
 #=============enthought library imports========================
 import os
+import shelve
+from whichdb import whichdb
 from traits.api import Enum, Float, Event, Property, Int, Button, Bool, Str, Any, on_trait_change, String
 from traitsui.api import View, HGroup, Item, Group, VGroup, EnumEditor, RangeEditor, ButtonEditor, spring
 # from pyface.timer.api import Timer
@@ -34,6 +36,10 @@ from pychron.graph.plot_record import PlotRecord
 import time
 from pychron.hardware.meter_calibration import MeterCalibration
 from pychron.core.helpers.filetools import parse_file
+from pychron.hardware.core.register_planner import register, plan_reads, \
+    decode_block, decode_entry, nregisters
+from pychron.paths import paths
+from pychron.hardware.core.communicators.io_loop import Future, chain, gather
 
 sensor_map = {'62': 'off',
               '95': 'thermocouple',
@@ -75,6 +81,47 @@ truefalse_map = {'59': False, '106': True}
 heat_algorithm_map = {'62': 'off', '71': 'PID', '64': 'on-off'}
 baudmap = {'9600': 188, '19200': 189, '38400': 190}
 ibaudmap = {'188': '9600', '189': '19200', '190': '38400'}
+iautotune_aggressive_map = {'99': 'under', '21': 'critical', '69': 'over'}
+
+# EZ-Zone PM register map. see watlow ez zone pm communications rev b nov 07
+register_map = dict((r.name, r) for r in (
+    register('process_value', 360, 'float'),
+    register('sensor1_type', 368),
+    register('thermocouple1_type', 370),
+    register('input_scale_low', 388, 'float'),
+    register('input_scale_high', 390, 'float'),
+    register('output_scale_low', 736, 'float'),
+    register('output_scale_high', 738, 'float'),
+    register('control_mode', 1880, decoder=lambda v: 'closed' if v == 10 else 'open'),
+    register('heat_proportional_band', 1890, 'float'),
+    register('cool_proportional_band', 1892, 'float'),
+    register('time_integral', 1894, 'float'),
+    register('time_derivative', 1896, 'float'),
+    register('heat_power', 1904, 'float'),
+    register('tru_tune_enabled', 1910, decoder=lambda v: truefalse_map.get(str(v))),
+    register('tru_tune_band', 1912),
+    register('tru_tune_gain', 1914, decoder=str),
+    register('autotune_aggressiveness', 1916,
+             decoder=lambda v: iautotune_aggressive_map.get(str(v))),
+    register('autotune_setpoint', 1998, 'float')))
+
+# (register name, trait) pairs loaded by initialization_hook
+initialization_registers = [('sensor1_type', '_sensor1_type'),
+                            ('thermocouple1_type', '_thermocouple1_type'),
+                            ('heat_proportional_band', '_Ph_'),
+                            ('cool_proportional_band', '_Pc_'),
+                            ('time_integral', '_I_'),
+                            ('time_derivative', '_D_'),
+                            ('output_scale_low', '_output_scale_low'),
+                            ('output_scale_high', '_output_scale_high'),
+                            ('input_scale_low', '_input_scale_low'),
+                            ('input_scale_high', '_input_scale_high'),
+                            ('autotune_setpoint', '_autotune_setpoint'),
+                            ('autotune_aggressiveness', '_autotune_aggressiveness'),
+                            ('tru_tune_enabled', '_enable_tru_tune'),
+                            ('tru_tune_band', '_tru_tune_band'),
+                            ('tru_tune_gain', '_tru_tune_gain'),
+                            ('control_mode', '_control_mode')]
 
 
 class WatlowEZZone(CoreDevice):
@@ -201,9 +248,12 @@ class WatlowEZZone(CoreDevice):
     heat_power_value = Float
     # scan_func = 'get_temperature'
     scan_func = 'get_temp_and_power'
+    async_scan_func = 'get_temp_and_power_async'
 
     memory_blocks_enabled = Bool(True)
     program_memory_blocks = Bool(True)
+    # always write the assembly definition addresses, skip verification
+    force_program_memory_blocks = Bool(False)
 
     _process_working_address = 200
     _process_memory_block = [360, 1904]
@@ -214,6 +264,10 @@ class WatlowEZZone(CoreDevice):
     coeff_string = Property
 
     use_pid_bin = Bool(True)
+
+    # largest block and largest unused gap allowed when coalescing reads
+    max_read_registers = Int(40)
+    max_read_gap = Int(16)
     default_output=Int(1)
     advanced_values_button=Button
     min_output_scale=Float
@@ -311,12 +365,83 @@ class WatlowEZZone(CoreDevice):
             see watlow ez zone pm communications rev b nov 07
             page 5
             User programmable memory blocks
+
+            the assembly definition addresses are only written if the
+            controller's current pointers differ from _process_memory_block.
+            verified layouts are cached so warm starts skip the check
         """
-        self._process_memory_len = 0
+        layout = self._process_memory_block
+        self._process_memory_len = 2 * len(layout)
+
+        key = self._get_memory_block_cache_key()
+        if not self.force_program_memory_blocks:
+            if self._load_memory_block_cache(key) == layout:
+                self.info('memory block layout {} verified (cached)'.format(layout))
+                return
+
+            if self.check_memory_blocks():
+                self.info('memory block layout {} verified'.format(layout))
+                self._dump_memory_block_cache(key, layout)
+                return
+
         self.info('programming memory block')
-        for i, ta in enumerate(self._process_memory_block):
+        for i, ta in enumerate(layout):
             self.set_assembly_definition_address(self._process_working_address + 2 * i, ta)
-            self._process_memory_len += 2
+
+        if self.check_memory_blocks():
+            self._dump_memory_block_cache(key, layout)
+        else:
+            self.warning('failed to verify memory block layout {}'.format(layout))
+
+    def read_assembly_definition_addresses(self, **kw):
+        """
+            read all the assembly definition pointers for the process memory
+            block in a single read
+        """
+        ada = self._process_working_address - 160
+        n = 2 * len(self._process_memory_block)
+        return self.read(ada, response_type='registers', nregisters=n, **kw)
+
+    def check_memory_blocks(self):
+        expected = []
+        for ta in self._process_memory_block:
+            expected.extend((ta, ta + 1))
+
+        r = self.read_assembly_definition_addresses()
+        return r is not None and list(r) == expected
+
+    def _get_memory_block_cache_key(self):
+        """
+            the port name contains the usb-serial adapter's serial number
+            so port + slave address identifies the controller
+        """
+        comm = self._communicator
+        return '{}:{}'.format(comm.port, comm.slave_address) if comm else None
+
+    def _load_memory_block_cache(self, key):
+        p = paths.memory_block_cache
+        # the dbm modules add their own extensions to p. whichdb returns
+        # None if there is no cache yet
+        if key and p and whichdb(p) is not None:
+            try:
+                d = shelve.open(p, 'r')
+                try:
+                    if d.has_key(key):
+                        return d[key]
+                finally:
+                    d.close()
+            except Exception, e:
+                self.warning('failed loading memory block cache {}'.format(e))
+
+    def _dump_memory_block_cache(self, key, layout):
+        p = paths.memory_block_cache
+        if key and p:
+            try:
+                d = shelve.open(p)
+                d[key] = list(layout)
+                d.close()
+            except Exception, e:
+                self.warning('failed saving memory block cache {}'.format(e))
 
     def report_pid(self):
         pid_attrs = ['_Ph_', '_Pc_', '_I_', '_D_']
@@ -331,49 +456,58 @@ class WatlowEZZone(CoreDevice):
         return pid_vals
 
     def initialization_hook(self):
-        self.info('read input sensor type')
-        s = self.read_analog_input_sensor_type(1)
-        if s is not None:
-            self._sensor1_type = s
+        self.info('read configuration registers')
+        values = self.read_registers([name for name, _ in initialization_registers])
+        if not values:
+            return
 
-        if self._sensor1_type == 95:
-            t = self.read_thermocouple_type(1)
-            if t is not None:
-                self._thermocouple1_type = t
+        for name, attr in initialization_registers:
+            v = values.get(name)
+            if v is None:
+                continue
+            if attr == '_thermocouple1_type' and self._sensor1_type != 95:
+                continue
+            setattr(self, attr, v)
 
-        self.report_pid()
+        self.info('======================== PID =====================')
+        for attr in ('_Ph_', '_Pc_', '_I_', '_D_'):
+            self.info('{} set to {}'.format(attr, getattr(self, attr)))
+        self.info('==================================================')
 
-        self.info('read input/output scaling')
-        if not self.simulation:
-            try:
-                osl, osh = self.read(736, nregisters=4, nbytes=13)
-                isl, ish = self.read(388, nregisters=4, nbytes=13)
-
-                self._output_scale_low = osl
-                self._output_scale_high = osh
-                self._input_scale_low = isl
-                self._input_scale_high = ish
-            except TypeError:
-                pass
-
-        attrs = [
-            ('read_autotune_setpoint', '_autotune_setpoint'),
-            ('read_autotune_aggressiveness', '_autotune_aggressiveness'),
-            ('read_tru_tune_enabled', '_enable_tru_tune'),
-            ('read_tru_tune_band', '_tru_tune_band'),
-            ('read_tru_tune_gain', '_tru_tune_gain'),
-
-            #               ('read_output_scale_low', '_output_scale_low'),
-            #               ('read_output_scale_high', '_output_scale_high'),
-            #               ('read_input_scale_low', '_input_scale_low'),
-            #               ('read_input_scale_high', '_input_scale_high'),
-
-            ('read_control_mode', '_control_mode')
-        ]
-        for func, attr in attrs:
-            v = getattr(self, func)()
-            if v is not None:
-                setattr(self, attr, v)
+    def read_registers(self, names, **kw):
+        """
+            read the named registers in ``register_map`` using the fewest
+            contiguous function 03 reads.
+
+            returns a dict of name: decoded value
+        """
+        values = dict()
+        comm = self._communicator
+        if comm is None or self.simulation:
+            return values
+
+        entries = [register_map[n] for n in names]
+        plan = plan_reads(entries, self.max_read_registers, self.max_read_gap)
+
+        # queue every block before waiting so they go out back-to-back
+        trs = [(start, n, es, comm.queue_read(start, response_type='registers',
+                                               nregisters=n, **kw))
+               for start, n, es in plan]
+
+        timeout = len(trs) + 1
+        for start, n, es, tr in trs:
+            words = tr.result(timeout)
+            if words and len(words) >= n:
+                values.update(decode_block(start, words, es,
+                                           comm.device_word_order))
+            else:
+                # block read failed. fall back to reading each register
+                for e in es:
+                    rt = 'float' if e.kind == 'float' else 'int'
+                    v = self.read(e.register, response_type=rt,
+                                  nregisters=nregisters(e), **kw)
+                    values[e.name] = decode_entry(e, v)
+        return values
 
     def get_temp_and_power(self, verbose=False, **kw):
     #        if 'verbose' in kw and kw['verbose']:
@@ -392,10 +526,58 @@ class WatlowEZZone(CoreDevice):
             t, p = args
 
         else:
-            t = self.read_process_value(1, **kw)
-            p = self.read_heat_power(**kw)
-
-        #        print self.simulation
+            values = self.read_registers(('process_value', 'heat_power'),
+                                         verbose=verbose, **kw)
+            t, p = values.get('process_value'), values.get('heat_power')
+
+        return self._temp_and_power_record(t, p, **kw)
+
+    def get_temp_and_power_async(self, verbose=False, **kw):
+        '''
+            non-blocking get_temp_and_power for async modbus communicators.
+            returns a Future of the PlotRecord
+        '''
+        comm = self._communicator
+        if self.memory_blocks_enabled:
+            f = comm.read_async(self._process_working_address,
+                                nregisters=self._process_memory_len,
+                                verbose=verbose)
+            func = lambda args: self._temp_and_power_block_record(args, **kw)
+        else:
+            es = [register_map['process_value'], register_map['heat_power']]
+            f = gather([comm.read_async(e.register, nregisters=nregisters(e),
+                                        verbose=verbose) for e in es])
+
+            def func(args):
+                t, p = [decode_entry(e, a) for e, a in zip(es, args)]
+                return self._temp_and_power_record(t, p, **kw)
+
+        return chain(f, func)
+
+    def queue_temp_and_power(self, verbose=False, **kw):
+        '''
+            queue the read on the bus scheduler and return a Future of the
+            PlotRecord. used to poll several controllers on a shared bus
+            without waiting for each reply in turn
+        '''
+        comm = self._communicator
+        if self.memory_blocks_enabled and comm is not None:
+            f = comm.queue_read(self._process_working_address,
+                                nregisters=self._process_memory_len,
+                                verbose=verbose)
+            return chain(f, lambda args: self._temp_and_power_block_record(args, **kw))
+
+        f = Future()
+        f.set_result(self.get_temp_and_power(verbose=verbose, **kw))
+        return f
+
+    def _temp_and_power_block_record(self, args, **kw):
+        if not args or not isinstance(args, (tuple, list)):
+            args = None, None
+        t, p = args
+        return self._temp_and_power_record(t, p, **kw)
+
+    def _temp_and_power_record(self, t, p, **kw):
         if self.simulation:
         #            t = 4 + self.closed_loop_setpoint
             t = self.get_random_value() + self.closed_loop_setpoint
@@ -484,7 +666,7 @@ class WatlowEZZone(CoreDevice):
         r = self.read(2494, response_type='int')
         print 'nonvolative save', r
 
-    def set_assembly_definition_address(self, working_address, target_address, **kw):
+    def set_assembly_definition_address(self, working_address, target_address, check=False, **kw):
         ada = working_address - 160
 
         self.info('setting {} to {}'.format(ada, target_address))
@@ -492,12 +674,10 @@ class WatlowEZZone(CoreDevice):
 
         self.write(ada, (target_address, target_address + 1), nregisters=2, **kw)
         #        self.info('setting {} to {}'.format(ada, target_address))
-        check = False
         if check:
-            r = self.read(ada, response_type='int')
+            r = self.read(ada, response_type='registers', nregisters=2)
             self.info('register {} pointing to {}'.format(ada, r))
-            r = self.read(ada + 1, response_type='int')
-            self.info('register {} pointing to {}'.format(ada + 1, r))
+            return r is not None and list(r) == [target_address, target_address + 1]
 
     def read_baudrate(self, port=1):
         """
@@ -828,8 +1008,7 @@ class WatlowEZZone(CoreDevice):
         return units_map[rid] if rid in units_map else None
 
     def read_control_mode(self, **kw):
-        rid = self.read(1880, response_type='int', **kw)
-        return 'closed' if rid == 10 else 'open'
+        return self.read_registers(('control_mode',), **kw).get('control_mode')
 
     def read_heat_algorithm(self, **kw):
         rid = str(self.read(1884, response_type='int', **kw))
@@ -872,8 +1051,8 @@ class WatlowEZZone(CoreDevice):
         return r
 
     def read_autotune_aggressiveness(self, **kw):
-        rid = str(self.read(1884, response_type='int', **kw))
-        return heat_algorithm_map[rid] if rid in heat_algorithm_map else None
+        return self.read_registers(('autotune_aggressiveness',),
+                                   **kw).get('autotune_aggressiveness')
 
     def read_tru_tune_enabled(self, **kw):
         r = self.read(1910, response_type='int', **kw)
@@ -37,6 +37,10 @@ class HasCommunicator(ConfigLoadable):
 
             class_key = '{}Communicator'.format(communicator_type.capitalize())
             module_path = 'pychron.hardware.core.communicators.{}_communicator'.format(communicator_type.lower())
+            if communicator_type.lower().startswith('async_'):
+                # e.g. async_modbus -> async_communicator.AsyncModbusCommunicator
+                class_key = 'Async{}Communicator'.format(communicator_type[6:].capitalize())
+                module_path = 'pychron.hardware.core.communicators.async_communicator'
             classlist = [class_key]
 
             class_factory = __import__(module_path, fromlist=classlist)
@@ -23,23 +23,131 @@ from data_manager import DataManager
 import csv
 from numpy import loadtxt
 
-# import time
+import time
+from threading import Lock
 # from matplotlib.dates import num2date
 import os
 #============= local library imports  ==========================
+from pychron.core.helpers.csv_loader import load_csv_array
+from pychron.core.helpers.archive_index import unindex_file
+
+FSYNC_NEVER = 'never'
+FSYNC_FLUSH = 'flush'
+FSYNC_CLOSE = 'close'
+
+
+class FrameWriter(object):
+    '''
+        one open handle per frame. rows are formatted into a buffer and
+        written when flush_rows rows are pending, when the oldest pending
+        row is older than max_unflushed_time or on close.
+
+        fsync: never, flush (every buffer write) or close
+    '''
+
+    def __init__(self, path, mode='a', format_str='{:0.6f}',
+                 flush_rows=100, max_unflushed_time=5, fsync=FSYNC_CLOSE):
+        self.path = path
+        self.format_str = format_str
+        self.flush_rows = flush_rows
+        self.max_unflushed_time = max_unflushed_time
+        self.fsync = fsync
+
+        self._file = open(path, mode)
+        self._buf = []
+        self._nrows = 0
+        self._first = None
+        self._row_fmts = dict()
+        self._lock = Lock()
+        # csv.writer writes through self.write into the buffer
+        self._writer = csv.writer(self)
+
+    def write(self, s):
+        self._buf.append(s)
+
+    def writerow(self, datum):
+        with self._lock:
+            try:
+                # one format call per row of numbers
+                self._buf.append(self._get_row_fmt(len(datum)).format(*datum))
+            except (ValueError, TypeError, IndexError):
+                self._writer.writerow(datum)
+            self._pending(1)
+
+    def writerows(self, data):
+        with self._lock:
+            self._writer.writerows(data)
+            self._pending(len(data))
+
+    def flush(self):
+        with self._lock:
+            self._flush(self.fsync == FSYNC_FLUSH)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._flush(self.fsync in (FSYNC_FLUSH, FSYNC_CLOSE))
+                self._file.close()
+                self._file = None
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def _get_row_fmt(self, n):
+        try:
+            return self._row_fmts[n]
+        except KeyError:
+            # match csv.writer line terminator
+            fmt = self._row_fmts[n] = ','.join([self.format_str] * n) + '\r\n'
+            return fmt
+
+    def _pending(self, n):
+        now = time.time()
+        if self._first is None:
+            self._first = now
+
+        self._nrows += n
+        if self._nrows >= self.flush_rows or \
+                now - self._first >= self.max_unflushed_time:
+            self._flush(self.fsync == FSYNC_FLUSH)
+
+    def _flush(self, sync=False):
+        if self._file is None:
+            return
+
+        if self._buf:
+            self._file.write(''.join(self._buf))
+            self._buf = []
+        self._nrows = 0
+        self._first = None
+
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+
 class CSVDataManager(DataManager):
     '''
+        stream=True keeps one FrameWriter open per frame until close_file.
+        stream=False opens and closes the file for every write
     '''
 
     format_str = '{:0.6f}'
-    _writer = None
-    _file = None
+    stream = True
+    flush_rows = 100
+    max_unflushed_time = 5
+    fsync = FSYNC_CLOSE
+
+    _writers = None
+
     def load(self, frame_key=None):
         if frame_key is None:
             frame_key = self._current_frame
 
         frame = self._get_frame(frame_key)
         if frame is not None:
+            self._flush_writer(frame)
 #            from pylab import datestr2num
 #            converters = {0:datestr2num}
 #            return loadtxt(frame, converters=converters, delimiter=',')
@@ -66,6 +174,14 @@ class CSVDataManager(DataManager):
         '''
 
         '''
+        if self.stream:
+            writer = self._get_writer(p, append)
+            if isinstance(datum[0], (list, tuple)):
+                writer.writerows(datum)
+            else:
+                writer.writerow(datum)
+            return
+
         mode = 'w'
         if append:
             mode = 'a'
@@ -83,21 +199,76 @@ class CSVDataManager(DataManager):
 
                 writer.writerow(datum)
 
+    def flush(self):
+        if self._writers:
+            for w in self._writers.itervalues():
+                w.flush()
+
+    def close_file(self):
+        if self._writers:
+            for w in self._writers.itervalues():
+                w.close()
+        self._writers = None
+        self._index_frames()
+
+    def delete_frame(self):
+        p = self.get_current_path()
+        self._close_writer(p)
+        unindex_file(p)
+        try:
+            os.remove(p)
+        except Exception, e:
+            print e
+
     def get_current_path(self):
         return self.frames[self._current_frame]
 
-    def read_data(self, path=None):
+    def read_data(self, path=None, columns=None, start=0, stop=None, step=1,
+                  cache=False):
+        '''
+            return a list of column arrays. non numeric fields are nan
+
+            see pychron.core.helpers.csv_loader
+        '''
         if path is None:
             path = self.get_current_path()
 
         if not os.path.isfile(path):
             return
 
-        with open(path, 'r') as f:
-            reader = csv.reader(f)
+        self._flush_writer(path)
+        data = load_csv_array(path, columns=columns,
+                              start=start, stop=stop, step=step,
+                              cache=cache)
+        return list(data.transpose())
+
+    def _get_writer(self, p, append=True):
+        if self._writers is None:
+            self._writers = dict()
+
+        w = self._writers.get(p)
+        if w is not None and not append:
+            w.close()
+            w = None
+
+        if w is None:
+            w = FrameWriter(p, 'a' if append else 'w',
+                            format_str=self.format_str,
+                            flush_rows=self.flush_rows,
+                            max_unflushed_time=self.max_unflushed_time,
+                            fsync=self.fsync)
+            self._writers[p] = w
+        return w
+
+    def _flush_writer(self, p):
+        if self._writers and p in self._writers:
+            self._writers[p].flush()
 
-            data = [row for row in reader]
-            return zip(*data)
+    def _close_writer(self, p):
+        if self._writers:
+            w = self._writers.pop(p, None)
+            if w is not None:
+                w.close()
 
 
 #    @property
@@ -27,6 +27,7 @@ from pychron.paths import paths
 from pychron.core.helpers.filetools import unique_path
 from pychron.managers.manager import Manager
 from pychron.core.helpers.datetime_tools import generate_datetimestamp, time_generator
+from pychron.core.helpers.archive_index import index_file
 
 
 class DataManager(Manager):
@@ -42,6 +43,19 @@ class DataManager(Manager):
     def close_file(self):
         pass
 
+    def flush(self):
+        '''
+            write any buffered data
+        '''
+        pass
+
+    def _index_frames(self):
+        '''
+            update the archive index entry of every frame
+        '''
+        for p in self.frames.itervalues():
+            index_file(p)
+
     def new_frame(self, *args, **kw):
         """
         """
@@ -51,6 +65,7 @@ class DataManager(Manager):
         self.frames[name] = p
 
         self._current_frame = name
+        index_file(p)
         return name
 
     def _new_frame_path(self, path=None, directory='scans',
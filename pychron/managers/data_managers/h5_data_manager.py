@@ -20,12 +20,19 @@
 from traits.api import Any
 #============= standard library imports ========================
 from tables import openFile, Filters
+from numpy import empty, float64
 #============= local library imports  ==========================
 from data_manager import DataManager
 from table_descriptions import table_description_factory
+from wide_frame import create_wide_table, read_wide, is_wide, get_wide_keys
+from pychron.core.helpers.archive_index import index_file, unindex_file
 import os
+import time
 import weakref
 
+EPOCH = 'epoch'
+ELAPSED = 'elapsed'
+
 
 def get_table(name, group, frame):
     try:
@@ -73,6 +80,72 @@ class FileCTX(object):
         del self._parent
 
 
+class TableRecorder(object):
+    '''
+        accumulates rows for one table in a preallocated record array and
+        writes them with Table.append in chunks.
+
+        columns sets the order of the values passed to append
+    '''
+
+    def __init__(self, table, nrows=1024, columns=None):
+        self.table = table
+        self.nrows = nrows
+        self._buf = empty(nrows, dtype=table.dtype)
+        self._n = 0
+
+        names = table.dtype.names
+        self._defaults = table.coldflts
+        if columns is None:
+            columns = names
+        self.columns = columns
+        # position in the record of each value passed to append
+        self._order = [columns.index(ni) if ni in columns else None for ni in names]
+
+    def __len__(self):
+        return self._n
+
+    def append(self, *values):
+        '''
+            returns True if the buffer was written to the table
+        '''
+        row = tuple([values[i] if i is not None else 0 for i in self._order])
+        self._buf[self._n] = row
+        self._n += 1
+        if self._n == self.nrows:
+            self.flush()
+            return True
+
+    def extend(self, **columns):
+        '''
+            columns: name=array of values. all arrays the same length
+        '''
+        n = len(columns.itervalues().next())
+        i = 0
+        wrote = False
+        while i < n:
+            m = min(n - i, self.nrows - self._n)
+            buf = self._buf[self._n:self._n + m]
+            for k in buf.dtype.names:
+                if k in columns:
+                    buf[k] = columns[k][i:i + m]
+                else:
+                    buf[k] = self._defaults[k]
+
+            self._n += m
+            i += m
+            if self._n == self.nrows:
+                self.flush()
+                wrote = True
+        return wrote
+
+    def flush(self):
+        if self._n:
+            self.table.append(self._buf[:self._n])
+            self.table.flush()
+            self._n = 0
+
+
 class H5DataManager(DataManager):
     '''
     '''
@@ -82,6 +155,16 @@ class H5DataManager(DataManager):
     workspace_root = None
     compression_level = 5
 
+    # buffered recording
+    # rows held per table before writing
+    recorder_rows = 1024
+    # maximum seconds of data held in memory before all recorders are written
+    max_unflushed_time = 30
+    # rows per hdf5 chunk for append heavy time series tables
+    append_chunk_rows = 4096
+    _recorders = None
+    _last_recorder_flush = 0
+
     def set_group_attribute(self, group, key, value):
         f = self._frame
 
@@ -112,6 +195,50 @@ class H5DataManager(DataManager):
         nr.append()
         ptable.flush()
 
+    def get_recorder(self, name, group, columns=None):
+        '''
+            return a TableRecorder for the table. table handles are resolved
+            once and cached until the file is closed
+        '''
+        if self._recorders is None:
+            self._recorders = dict()
+            self._last_recorder_flush = time.time()
+
+        key = (name, group if isinstance(group, str) else group._v_pathname)
+        try:
+            return self._recorders[key]
+        except KeyError:
+            table = self.get_table(name, group)
+            if table is None:
+                return
+
+            rec = TableRecorder(table, self.recorder_rows, columns)
+            self._recorders[key] = rec
+            return rec
+
+    def record_rows(self, name, group, columns=None, **values):
+        '''
+            buffer rows for table name. values are columns of equal length.
+            all recorders are written if max_unflushed_time has elapsed
+        '''
+        rec = self.get_recorder(name, group, columns)
+        if rec is not None:
+            rec.extend(**values)
+            self.check_recorders()
+
+    def flush(self):
+        self.flush_recorders()
+
+    def check_recorders(self):
+        if time.time() - self._last_recorder_flush > self.max_unflushed_time:
+            self.flush_recorders()
+
+    def flush_recorders(self):
+        if self._recorders:
+            for rec in self._recorders.itervalues():
+                rec.flush()
+        self._last_recorder_flush = time.time()
+
     def get_current_path(self):
         if self._frame is not None:
         #            for d in dir(self._frame):
@@ -125,6 +252,7 @@ class H5DataManager(DataManager):
 
     def delete_frame(self):
         p = self.get_current_path()
+        unindex_file(p)
         try:
             os.remove(p)
         except Exception, e:
@@ -144,6 +272,7 @@ class H5DataManager(DataManager):
             self._frame = openFile(p, mode='w',
                                    #                                    filters=Filters(complevel=self.compression_level)
             )
+            index_file(p)
             #             self._frame = openFile(p, mode='w',
             #                                    filters=Filters(complevel=self.compression_level))
             return self._frame
@@ -167,18 +296,124 @@ class H5DataManager(DataManager):
 
         return grp
 
-    def new_table(self, group, table_name, table_style='TimeSeries'):
+    def new_table(self, group, table_name, table_style='TimeSeries',
+                  append_heavy=False, expectedrows=10000, time_base=None):
         '''
             if table already exists return it otherwise create a new table
+
+            append_heavy tables use fixed size chunks and a fast shuffle+blosc
+            filter suited to many appends of a few columns
+
+            time_base EPOCH or ELAPSED (s from the run start) is stored in the
+            table attributes. Epoch styles default to EPOCH
         '''
         tab = self.get_table(table_name, group)
         if tab is None:
+            kw = dict()
+            if append_heavy:
+                kw = dict(filters=Filters(complevel=self.compression_level,
+                                          complib='blosc', shuffle=True),
+                          chunkshape=(self.append_chunk_rows,),
+                          expectedrows=expectedrows)
+
             tab = self._frame.createTable(group, table_name,
-                                          table_description_factory(table_style))
+                                          table_description_factory(table_style),
+                                          **kw)
+            if time_base is None and table_style.startswith('Epoch'):
+                time_base = EPOCH
+            if time_base is not None:
+                tab.attrs.time_base = time_base
 
         tab.flush()
         return tab
 
+    def new_wide_table(self, keys, channels, expectedrows=10000,
+                       time_base=EPOCH):
+        '''
+            create the shared time, one column per (key, channel) table.
+            see wide_frame
+        '''
+        tab = create_wide_table(self._frame, keys, channels,
+                                expectedrows=expectedrows,
+                                chunk_rows=self.append_chunk_rows,
+                                complevel=self.compression_level)
+        tab.attrs.time_base = time_base
+        return tab
+
+    def set_run_start(self, t=None):
+        '''
+            store the start of the run (s since epoch) in the root attributes.
+            tables with an elapsed time base are relative to it
+        '''
+        if t is None:
+            t = time.time()
+        self._frame.root._v_attrs.run_start = float(t)
+        return t
+
+    def get_run_start(self):
+        return getattr(self._frame.root._v_attrs, 'run_start', None)
+
+    def get_time_base(self, group, table):
+        '''
+            return EPOCH, ELAPSED or None if unknown (older files)
+        '''
+        tab = get_table(table, group, self._frame)
+        if tab is not None:
+            return getattr(tab.attrs, 'time_base', None)
+
+    def read_time_series(self, group, table, field='value', **kw):
+        '''
+            return time, field of group/table with time in s since epoch.
+            elapsed times are offset by the run start.
+
+            kw are passed to read_columns
+        '''
+        cols = self.read_columns(group, table, fields=('time', field), **kw)
+        if cols is None:
+            return
+
+        t = cols['time'].astype(float64)
+        if self.get_time_base(group, table) == ELAPSED:
+            rs = self.get_run_start()
+            if rs is not None:
+                t += rs
+        return t, cols[field]
+
+    def is_wide(self):
+        return self._frame is not None and is_wide(self._frame)
+
+    def get_wide_keys(self):
+        '''
+            return keys, channels of a wide file
+        '''
+        return get_wide_keys(self._frame)
+
+    def read_wide(self, columns=None, start=None, stop=None, step=None):
+        '''
+            return a dict of column name: array from a wide file
+        '''
+        return read_wide(self._frame, columns, start, stop, step)
+
+    def read_columns(self, group, table, fields=('time', 'value'),
+                     start=None, stop=None, step=None, condition=None):
+        '''
+            bulk read fields of group/table into numpy arrays.
+
+            one Table.read per field, or one read_where if a condition
+            e.g. '(time>=t0) & (time<t1)' is given.
+
+            returns a dict of field: array or None if the table does not exist
+        '''
+        tab = get_table(table, group, self._frame)
+        if tab is None:
+            return
+
+        if condition is not None:
+            rows = tab.readWhere(condition, start=start, stop=stop, step=step)
+            return dict((f, rows[f]) for f in fields)
+
+        return dict((f, tab.read(start, stop, step, field=f)) for f in fields)
+
     def new_array(self, group, name, data):
         self._frame.createArray(group, name, data)
 
@@ -235,12 +470,17 @@ class H5DataManager(DataManager):
         try:
             self.debug('flush and close file {}'.format(self._frame.filename))
 
+            self.flush_recorders()
+            self._recorders = None
+
             for node in self._frame.walkNodes('/', 'Table'):
                 node.flush()
 
+            p = self._frame.filename
             self._frame.flush()
             self._frame.close()
             self._frame = None
+            index_file(p)
         #             del self._frame
 
         except Exception, e:
@@ -0,0 +1,264 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+import os
+import json
+import time
+import zlib
+import struct
+from threading import Lock
+import numpy as np
+from tables import openFile
+#============= local library imports  ==========================
+from table_descriptions import table_description_factory
+from wide_frame import create_wide_table, column_name, is_wide, \
+    SAMPLES_TABLE
+
+'''
+    append only write ahead journal for sample recordings.
+
+    file layout
+
+        MAGIC
+        uint32 header length
+        json header. frame path, keys, layout, group attributes and
+        whether pressure is recorded
+        fixed size records (time, key, temp, heat, pressure, latency, crc)
+
+    records are appended in the order the rows are written to the frame
+    so after a crash the frame is completed with the records past the
+    rows it already has. a torn record at the end fails its crc and is
+    dropped
+'''
+
+MAGIC = 'PJL1'
+JOURNAL_EXT = '.pjl'
+
+RECORD = struct.Struct('<dHffff')
+CRC = struct.Struct('<I')
+RECORD_SIZE = RECORD.size + CRC.size
+RECORD_DTYPE = np.dtype([('time', '<f8'), ('key', '<u2'),
+                         ('temp', '<f4'), ('heat', '<f4'),
+                         ('pressure', '<f4'), ('latency', '<f4'),
+                         ('crc', '<u4')])
+
+# recorded for every run. pressure only if the header says so
+CHANNELS = ('temp', 'heat', 'latency')
+
+
+class Journal(object):
+    '''
+        records are buffered by the file object and fsync'ed at most every
+        sync_interval seconds
+    '''
+
+    def __init__(self, path, frame, keys, layout='tables', attrs=None,
+                 pressure=False, sync_interval=5):
+        self.path = path
+        self.keys = list(keys)
+        self.sync_interval = sync_interval
+
+        self._key_index = dict((k, i) for i, k in enumerate(self.keys))
+        self._lock = Lock()
+        self._last_sync = time.time()
+
+        header = json.dumps(dict(frame=frame, keys=self.keys,
+                                 layout=layout, attrs=attrs or dict(),
+                                 pressure=bool(pressure)))
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._file.write(struct.pack('<I', len(header)))
+        self._file.write(header)
+        self._sync()
+
+    def extend(self, key, rows):
+        '''
+            rows: iterable of (time, temp, heat, pressure, latency)
+        '''
+        k = self._key_index[key]
+        pack, crc = RECORD.pack, CRC.pack
+        buf = []
+        for t, temp, heat, pressure, latency in rows:
+            r = pack(t, k, temp, heat, pressure, latency)
+            buf.append(r)
+            buf.append(crc(zlib.crc32(r) & 0xffffffff))
+
+        with self._lock:
+            if self._file is not None:
+                self._file.write(''.join(buf))
+
+    def sync(self, force=False):
+        with self._lock:
+            if self._file is not None and \
+                    (force or time.time() - self._last_sync >= self.sync_interval):
+                self._sync()
+
+    def close(self, remove=False):
+        '''
+            remove=True once the frame has been closed cleanly
+        '''
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+        if remove and os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.time()
+
+
+def read_journal(path):
+    '''
+        return header, records. records is a structured array of the
+        valid records
+    '''
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a journal'.format(path))
+
+        n = struct.unpack('<I', f.read(4))[0]
+        header = json.loads(f.read(n))
+        body = f.read()
+
+    n = len(body) / RECORD_SIZE
+    # drop records at the end that were not completely written
+    while n:
+        s = (n - 1) * RECORD_SIZE
+        r = body[s:s + RECORD.size]
+        if CRC.unpack(body[s + RECORD.size:s + RECORD_SIZE])[0] == \
+                zlib.crc32(r) & 0xffffffff:
+            break
+        n -= 1
+
+    records = np.frombuffer(body[:n * RECORD_SIZE], dtype=RECORD_DTYPE)
+    return header, records
+
+
+def replay_journal(path):
+    '''
+        complete the frame of journal path. if the frame cannot be opened
+        it is moved to <frame>.corrupt and rebuilt from the journal in
+        the wide layout.
+
+        returns the number of rows added
+    '''
+    header, records = read_journal(path)
+    frame = header['frame']
+    keys = header['keys']
+    attrs = header.get('attrs', dict())
+    channels = CHANNELS
+    if header.get('pressure'):
+        channels += ('pressure',)
+
+    per_key = [records[records['key'] == i] for i in range(len(keys))]
+
+    try:
+        f = openFile(frame, 'a')
+    except Exception:
+        if os.path.isfile(frame):
+            os.rename(frame, frame + '.corrupt')
+        f = openFile(frame, 'w')
+        tab = create_wide_table(f, keys, channels, expectedrows=max(1, len(records)))
+        tab.attrs.time_base = 'epoch'
+        _set_attrs(f, keys, attrs)
+
+    try:
+        if is_wide(f):
+            n = _replay_wide(f, keys, per_key)
+        else:
+            n = _replay_tables(f, keys, attrs, per_key, 'pressure' in channels)
+        f.flush()
+    finally:
+        f.close()
+    return n
+
+
+def find_journals(root):
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, p) for p in os.listdir(root)
+            if p.endswith(JOURNAL_EXT)]
+
+
+def _set_attrs(f, keys, attrs):
+    for k in keys:
+        try:
+            g = getattr(f.root, k)
+        except AttributeError:
+            g = f.createGroup(f.root, k)
+        for a, v in attrs.get(k, dict()).iteritems():
+            setattr(g._v_attrs, a, v)
+
+
+def _replay_wide(f, keys, per_key):
+    tab = getattr(f.root, SAMPLES_TABLE)
+    start = tab.nrows
+    stop = min([len(r) for r in per_key]) if per_key else 0
+    if stop <= start:
+        return 0
+
+    rows = np.empty(stop - start, dtype=tab.dtype)
+    rows['time'] = per_key[0]['time'][start:stop]
+    for k, recs in zip(keys, per_key):
+        for c in CHANNELS + ('pressure',):
+            name = column_name(k, c)
+            if name in tab.colnames:
+                rows[name] = recs[c][start:stop]
+
+    tab.append(rows)
+    return stop - start
+
+
+def _replay_tables(f, keys, attrs, per_key, pressure=False):
+    descs = dict(temp=table_description_factory('EpochSample'),
+                 heat=table_description_factory('EpochSample'),
+                 pressure=table_description_factory('Epoch'))
+    n = 0
+    for k, recs in zip(keys, per_key):
+        try:
+            g = getattr(f.root, k)
+        except AttributeError:
+            _set_attrs(f, [k], attrs)
+            g = getattr(f.root, k)
+
+        for c in ('temp', 'heat', 'pressure'):
+            try:
+                tab = getattr(g, c)
+            except AttributeError:
+                if c == 'pressure' and not pressure:
+                    continue
+                tab = f.createTable(g, c, descs[c])
+                tab.attrs.time_base = 'epoch'
+
+            new = recs[tab.nrows:]
+            if len(new):
+                rows = np.empty(len(new), dtype=tab.dtype)
+                rows['time'] = new['time']
+                rows['value'] = new[c]
+                if 'latency' in tab.colnames:
+                    rows['latency'] = new['latency']
+                tab.append(rows)
+                n += len(new)
+    return n
+
+#============= EOF =============================================
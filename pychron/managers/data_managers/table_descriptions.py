@@ -21,7 +21,7 @@
 #============= enthought library imports =======================
 
 #============= standard library imports ========================
-from tables import Float32Col, StringCol, IsDescription
+from tables import Float32Col, Float64Col, StringCol, IsDescription
 #============= local library imports  ==========================
 
 class TimeSeriesTableDescription(IsDescription):
@@ -29,6 +29,35 @@ class TimeSeriesTableDescription(IsDescription):
     value = Float32Col()
 
 
+class SampleTableDescription(IsDescription):
+    '''
+        time is the scheduled sample time. latency is the time in s
+        from the scheduled time to when the value was acquired.
+        the scheduled time is a wall clock time so use Float64
+    '''
+    time = Float64Col()
+    value = Float32Col()
+    latency = Float32Col()
+
+
+class EpochTableDescription(IsDescription):
+    '''
+        time is s since the epoch. Float32 cannot resolve current epoch
+        times to better than ~2 min so use Float64
+    '''
+    time = Float64Col()
+    value = Float32Col()
+
+
+class EpochSampleTableDescription(IsDescription):
+    '''
+        SampleTableDescription with the scheduled time in s since the epoch
+    '''
+    time = Float64Col()
+    value = Float32Col()
+    latency = Float32Col()
+
+
 class CameraScanTableDescription(IsDescription):
     """
     """
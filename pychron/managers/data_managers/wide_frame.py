@@ -0,0 +1,232 @@
+#===============================================================================
+# Copyright 2014 Jake Ross
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#===============================================================================
+
+#============= enthought library imports =======================
+#============= standard library imports ========================
+from tables import Float64Col, Float32Col, openFile, Filters
+from numpy import empty, nan, array_equal
+#============= local library imports  ==========================
+
+'''
+    wide row hdf5 layout
+
+    all channels sampled together share one Float64 time column:
+
+        /samples            table  time, <key>_<channel>, ...
+        /<key>              group  per key metadata as attributes
+
+    the root node has layout='wide' and the table has an attribute
+    ``keys`` and ``channels`` so the column names can be rebuilt.
+
+    a channel is read as a whole array with Table.col/Table.read so
+    loading a long run is one read per channel
+'''
+
+WIDE_LAYOUT = 'wide'
+SAMPLES_TABLE = 'samples'
+
+class MisalignedFrameError(ValueError):
+    '''
+        the keys/channels of a frame do not share one time column so it
+        cannot be converted to the wide layout without losing samples
+    '''
+    pass
+
+
+# channels of a tables layout frame in column order. latency is a column
+# of the temp/heat tables, the others are time/value tables
+TABLES_CHANNELS = ('temp', 'heat', 'pressure', 'latency')
+
+
+def column_name(key, channel):
+    return '{}_{}'.format(key, channel)
+
+
+def wide_description(keys, channels):
+    '''
+        return a table description dict.
+
+        column order is time followed by each channel of each key
+    '''
+    d = dict(time=Float64Col(pos=0))
+    i = 1
+    for k in keys:
+        for c in channels:
+            d[column_name(k, c)] = Float32Col(pos=i, dflt=nan)
+            i += 1
+    return d
+
+
+def is_wide(frame):
+    return getattr(frame.root._v_attrs, 'layout', None) == WIDE_LAYOUT
+
+
+def create_wide_table(frame, keys, channels, expectedrows=10000,
+                      chunk_rows=4096, complevel=5):
+    '''
+        create /samples in frame and mark the file as wide
+    '''
+    filters = Filters(complevel=complevel, complib='blosc', shuffle=True)
+    tab = frame.createTable(frame.root, SAMPLES_TABLE,
+                            wide_description(keys, channels),
+                            filters=filters,
+                            chunkshape=(chunk_rows,),
+                            expectedrows=expectedrows)
+
+    tab.attrs.keys = list(keys)
+    tab.attrs.channels = list(channels)
+    frame.root._v_attrs.layout = WIDE_LAYOUT
+    return tab
+
+
+def read_wide(frame, columns=None, start=None, stop=None, step=None):
+    '''
+        return dict of column name: array. time is always included
+    '''
+    tab = getattr(frame.root, SAMPLES_TABLE)
+    if columns is None:
+        columns = tab.colnames
+
+    names = ['time'] + [c for c in columns if c != 'time']
+    return dict((c, tab.read(start, stop, step, field=c)) for c in names)
+
+
+def get_wide_keys(frame):
+    tab = getattr(frame.root, SAMPLES_TABLE)
+    return list(tab.attrs.keys), list(tab.attrs.channels)
+
+
+def get_tables_channels(frame):
+    '''
+        return channels, other for a frame with a group per key.
+
+        channels: the TABLES_CHANNELS found in any group
+        other: names of nodes a wide frame cannot hold
+    '''
+    found = set()
+    other = set()
+    for g in frame.walkGroups():
+        if g == frame.root:
+            continue
+
+        for leaf in g._f_iterNodes('Leaf'):
+            name = leaf._v_name
+            cols = getattr(leaf, 'colnames', ())
+            if name in TABLES_CHANNELS and 'time' in cols and 'value' in cols:
+                found.add(name)
+                if 'latency' in cols:
+                    found.add('latency')
+            else:
+                other.add(name)
+
+    return [c for c in TABLES_CHANNELS if c in found], sorted(other)
+
+
+def _get_channel(g, c):
+    '''
+        return table, field holding channel c of group g
+    '''
+    if c == 'latency':
+        for n in ('temp', 'heat'):
+            t = _get_child(g, n)
+            if t is not None and 'latency' in t.colnames:
+                return t, 'latency'
+        return None, None
+
+    return _get_child(g, c), 'value'
+
+
+def _get_child(g, name):
+    try:
+        return getattr(g, name)
+    except AttributeError:
+        pass
+
+
+def convert_to_wide(src, dst, channels=None, attrs=None, complevel=5):
+    '''
+        convert a file with a group per key and a time/value table per
+        channel into the wide layout.
+
+        every channel of every key must have the same time column. raises
+        MisalignedFrameError otherwise and dst is not written
+
+        channels: None to convert every channel found. see
+        get_tables_channels
+        attrs: names of group attributes to copy
+    '''
+    sf = openFile(src, 'r')
+    try:
+        if channels is None:
+            channels, _ = get_tables_channels(sf)
+
+        groups = [g for g in sf.walkGroups() if g != sf.root]
+        keys = [g._v_name for g in groups]
+
+        # one vectorized read per (key, channel)
+        cols = dict()
+        times = None
+        time_base = None
+        for g in groups:
+            for c in channels:
+                t, field = _get_channel(g, c)
+                if t is None:
+                    continue
+
+                ti = t.read(field='time')
+                if times is None:
+                    times = ti
+                    time_base = getattr(t.attrs, 'time_base', None)
+                elif not array_equal(ti, times):
+                    raise MisalignedFrameError('{}/{} time column differs from '
+                                               'the first channel'.format(g._v_name, c))
+                cols[column_name(g._v_name, c)] = t.read(field=field)
+
+        n = 0 if times is None else len(times)
+        df = openFile(dst, 'w')
+        try:
+            tab = create_wide_table(df, keys, channels,
+                                    expectedrows=max(n, 1),
+                                    complevel=complevel)
+            if time_base is not None:
+                tab.attrs.time_base = time_base
+            run_start = getattr(sf.root._v_attrs, 'run_start', None)
+            if run_start is not None:
+                df.root._v_attrs.run_start = run_start
+
+            if n:
+                rows = empty(n, dtype=tab.dtype)
+                rows['time'] = times
+                for name in tab.colnames[1:]:
+                    v = cols.get(name)
+                    rows[name] = nan if v is None else v
+
+                tab.append(rows)
+                tab.flush()
+
+            for g in groups:
+                ng = df.createGroup(df.root, g._v_name)
+                names = attrs if attrs is not None else g._v_attrs._f_list('user')
+                for a in names:
+                    if hasattr(g._v_attrs, a):
+                        setattr(ng._v_attrs, a, getattr(g._v_attrs, a))
+            df.flush()
+        finally:
+            df.close()
+    finally:
+        sf.close()
+
+#============= EOF =============================================
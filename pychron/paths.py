@@ -293,6 +293,7 @@ class Paths():
         #=======================================================================
         self.backup_recovery_file = join(self.hidden_dir, 'backup_recovery')
         self.last_experiment=join(self.hidden_dir, 'last_experiment')
+        self.memory_block_cache = join(self.hidden_dir, 'memory_block_cache')
         self.set_search_paths()
 
 